@@ -9,6 +9,8 @@ from .models import (
     Loan,
     Repayment,
     ChatInteraction,
+    ChatAnswerCache,
+    TranslationCache,
 )
 
 User = get_user_model()
@@ -47,10 +49,10 @@ class AgriculturalRecordAdmin(admin.ModelAdmin):
 
 @admin.register(LoanApplication)
 class LoanApplicationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'loan_amount_requested', 'status', 'eligibility_approved', 'risk_score', 'created_at')
-    list_filter = ('status', 'eligibility_approved')
+    list_display = ('id', 'user', 'loan_amount_requested', 'status', 'eligibility_approved', 'risk_score', 'model_version', 'created_at')
+    list_filter = ('status', 'eligibility_approved', 'model_version')
     search_fields = ('user__username',)
-    readonly_fields = ('eligibility_approved', 'eligibility_reason', 'risk_score', 'recommended_amount')
+    readonly_fields = ('eligibility_approved', 'eligibility_reason', 'risk_score', 'recommended_amount', 'model_version')
 
 
 @admin.register(Loan)
@@ -65,4 +67,23 @@ class RepaymentAdmin(admin.ModelAdmin):
 
 @admin.register(ChatInteraction)
 class ChatInteractionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'language', 'created_at')
+    list_display = ('id', 'user', 'language', 'source', 'latency_ms', 'created_at')
+    list_filter = ('source', 'language')
+
+
+@admin.register(ChatAnswerCache)
+class ChatAnswerCacheAdmin(admin.ModelAdmin):
+    list_display = ('normalized_question', 'language', 'hit_count', 'last_hit_at', 'model_version', 'created_at')
+    list_filter = ('language', 'model_version')
+    search_fields = ('normalized_question', 'question', 'reply')
+    readonly_fields = ('key', 'normalized_question', 'question', 'language', 'model_version', 'hit_count', 'created_at', 'last_hit_at')
+    ordering = ('-hit_count',)
+
+
+@admin.register(TranslationCache)
+class TranslationCacheAdmin(admin.ModelAdmin):
+    list_display = ('source_text', 'direction', 'hit_count', 'last_hit_at', 'model_name', 'created_at')
+    list_filter = ('direction', 'model_name')
+    search_fields = ('source_text', 'translation')
+    readonly_fields = ('key', 'direction', 'model_name', 'source_text', 'hit_count', 'created_at', 'last_hit_at')
+    ordering = ('-hit_count',)
@@ -1,6 +1,22 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Opt-in: load + warm the ML models at startup instead of on the first request
+        if getattr(settings, 'ML_WARMUP_ON_STARTUP', False):
+            from . import faq_index, ml_service
+            try:
+                ml_service.warm_up()
+            except Exception:
+                logger.exception("ML warm-up failed; models will load on first request")
+            # Map the chat FAQ index (if built) now rather than on the first chat message
+            faq_index.get_index()
@@ -0,0 +1,141 @@
+"""
+Micro-batching for concurrent single-item calls.
+
+Callers submit one item and get a Future. A background thread collects items
+for up to window_ms after the first one arrives (or until max_batch items are
+queued), runs them through run_batch as one list, and resolves each caller's
+Future with its own result. One instance per worker process; the thread is
+(re)started lazily, so instances created before a fork keep working after it.
+"""
+import bisect
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Upper bounds of the batch-size histogram buckets
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    run_batch(items) -> list of results, one per item and in the same order.
+    If it raises, every Future in that batch gets the exception.
+    """
+
+    def __init__(self, run_batch, window_ms=3.0, max_batch=64, name='batcher', sample_size=2048):
+        self.run_batch = run_batch
+        self.window = max(float(window_ms), 0.0) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+        self.name = name
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=sample_size)
+        self._reset_metrics()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def _reset_metrics(self):
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.max_seen = 0
+        self.run_seconds = 0.0
+        self._size_counts = [0] * (len(_SIZE_BUCKETS) + 1)
+        self._waits.clear()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                # New process (e.g. after a fork): the parent's thread does not exist here
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._loop, name=f'{self.name}-loop', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, item):
+        """Queue one item; returns a Future resolved with its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                results = self.run_batch([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: run_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                results = None
+                error = e
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.errors += results is None
+                self.max_seen = max(self.max_seen, len(batch))
+                self.run_seconds += elapsed
+                self._size_counts[bisect.bisect_left(_SIZE_BUCKETS, len(batch))] += 1
+                self._waits.extend(started - enqueued for _, _, enqueued in batch)
+            for i, (_, future, _) in enumerate(batch):
+                if results is None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            histogram = {}
+            for i, count in enumerate(self._size_counts):
+                label = f"<={_SIZE_BUCKETS[i]}" if i < len(_SIZE_BUCKETS) else f">{_SIZE_BUCKETS[-1]}"
+                histogram[label] = count
+
+            def pct(p):
+                return round(waits[min(int(p * len(waits)), len(waits) - 1)] * 1000, 3) if waits else None
+
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch,
+                'batches': self.batches,
+                'items': self.items,
+                'errors': self.errors,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else None,
+                'max_batch_size': self.max_seen,
+                'batch_size_histogram': histogram,
+                'mean_run_ms': round(self.run_seconds / self.batches * 1000, 3) if self.batches else None,
+                'queue_wait_ms': {'p50': pct(0.5), 'p95': pct(0.95), 'p99': pct(0.99), 'max': pct(1.0)},
+                'pending': self._queue.qsize() if self._queue is not None else 0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._reset_metrics()
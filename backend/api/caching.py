@@ -0,0 +1,107 @@
+"""
+Small thread-safe in-process LRU cache with optional TTL and hit/miss counters.
+Used by the ML prediction cache; one instance per worker process. HitCounter
+batches the hit-count writes of the database-backed chat and translation caches.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded LRU mapping. maxsize <= 0 disables caching (every get is a miss and
+    set is a no-op). ttl is in seconds; None or 0 means entries never expire.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = int(maxsize or 0)
+        self.ttl = float(ttl) if ttl else None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+        }
+
+
+class HitCounter:
+    """
+    Per-process hit counts written back in batches. add(key) only bumps an
+    in-memory counter; once `flush_every` hits have accumulated or
+    `flush_interval` seconds have passed since the last flush, the call that
+    crosses the threshold hands the counts ({key: hits}) to flush_fn. Counts
+    not yet flushed when a process dies are lost, which is fine for stats.
+    """
+
+    def __init__(self, flush_fn, flush_every=100, flush_interval=30.0):
+        self._flush_fn = flush_fn
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._counts = {}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self._pending += 1
+            due = self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval
+            batch = self._take() if due else None
+        if batch:
+            self._flush_fn(batch)
+
+    def _take(self):
+        batch, self._counts, self._pending = self._counts, {}, 0
+        self._last_flush = time.monotonic()
+        return batch
+
+    def flush(self):
+        """Write every pending count now (e.g. at exit)."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._flush_fn(batch)
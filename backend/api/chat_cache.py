@@ -0,0 +1,144 @@
+"""
+Two-tier cache of chatbot answers: a per-worker LRU in front of the
+ChatAnswerCache table (shared by all workers and restarts).
+
+Keys are the normalized question (case, whitespace and punctuation folded),
+the language and the chat model version. Answers are only cached when
+generation is deterministic (CHATBOT_TEMPERATURE = 0): with sampling the same
+question is meant to get varied replies. Every lookup that finds an answer
+adds one to its hit count; the counts are kept in memory and written back in
+batches (caching.HitCounter), so a hit costs no database write. Database
+errors (e.g. before `migrate`) turn the cache off for that call instead of
+failing the chat.
+"""
+import atexit
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import HitCounter, LRUCache
+
+logger = logging.getLogger(__name__)
+
+CHAT_ANSWER_CACHE = getattr(settings, 'CHAT_ANSWER_CACHE', True)
+
+_lru = LRUCache(maxsize=getattr(settings, 'CHAT_ANSWER_CACHE_SIZE', 1024))
+_model_version = None
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_question(text):
+    """Lower-case, NFKC, punctuation removed, whitespace collapsed: 'How do I apply?!' -> 'how do i apply'."""
+    text = unicodedata.normalize('NFKC', str(text or '')).lower()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def chat_model_version():
+    """Short hash of everything that shapes a reply: chatbot weights, backend, quantization, translation setup."""
+    global _model_version
+    if _model_version is None:
+        from . import chatbot_service
+        from .quantization import source_fingerprint
+
+        parts = (
+            source_fingerprint(chatbot_service.CHATBOT_MODEL_DIR),
+            chatbot_service.CHATBOT_BACKEND,
+            str(chatbot_service.CHATBOT_QUANTIZE_INT8),
+            str(getattr(settings, 'TRANSLATION_QUANTIZE_INT8', False)),
+            chatbot_service.INPUT_PREFIX,
+            str(chatbot_service.DEFAULT_MAX_NEW_TOKENS),
+        )
+        _model_version = hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+    return _model_version
+
+
+def enabled():
+    from . import chatbot_service
+
+    return CHAT_ANSWER_CACHE and chatbot_service.DEFAULT_TEMPERATURE <= 0
+
+
+def _key(normalized, language):
+    raw = '|'.join((normalized, language, chat_model_version()))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _flush_hits(counts):
+    """Add batched hit counts ({key: hits}) to their rows: one UPDATE per distinct count."""
+    from .models import ChatAnswerCache
+
+    by_count = defaultdict(list)
+    for key, hits in counts.items():
+        by_count[hits].append(key)
+    now = timezone.now()
+    try:
+        for hits, keys in by_count.items():
+            ChatAnswerCache.objects.filter(key__in=keys).update(hit_count=F('hit_count') + hits, last_hit_at=now)
+    except DatabaseError:
+        logger.exception("Chat answer cache hit count update failed")
+
+
+_hits = HitCounter(_flush_hits)
+atexit.register(_hits.flush)
+
+
+def lookup(question, language):
+    """{'reply', 'reply_en'} cached for this question, or None."""
+    normalized = normalize_question(question)
+    if not enabled() or not normalized:
+        return None
+    from .models import ChatAnswerCache
+
+    key = _key(normalized, language)
+    try:
+        entry = _lru.get(key)
+        if entry is None:
+            entry = ChatAnswerCache.objects.filter(key=key).values('reply', 'reply_en').first()
+            if entry is None:
+                return None
+            _lru.set(key, entry)
+    except DatabaseError:
+        logger.exception("Chat answer cache lookup failed")
+        return None
+    _hits.add(key)
+    return entry
+
+
+def store(question, language, reply, reply_en=''):
+    """Cache a generated answer (no-op when caching is off or the answer is empty)."""
+    normalized = normalize_question(question)
+    if not enabled() or not normalized or not reply:
+        return
+    from .models import ChatAnswerCache
+
+    key = _key(normalized, language)
+    entry = {'reply': reply, 'reply_en': reply_en or ''}
+    try:
+        ChatAnswerCache.objects.get_or_create(key=key, defaults={
+            'normalized_question': normalized,
+            'question': str(question)[:2000],
+            'language': language,
+            'model_version': chat_model_version(),
+            **entry,
+        })
+    except IntegrityError:
+        # Another worker stored the same answer first
+        pass
+    except DatabaseError:
+        logger.exception("Chat answer cache store failed")
+        return
+    _lru.set(key, entry)
+
+
+def stats():
+    """LRU counters of this worker, or None when caching is off."""
+    return _lru.stats() if enabled() else None
@@ -0,0 +1,275 @@
+"""
+Chat answering pipeline and the bounded executor it runs on.
+
+answer() is the whole synchronous chat turn: answer cache, FAQ index,
+translate in, T5 generation, translate out, ChatInteraction log;
+stream_answer() is the same turn as a stream of events. The async
+/api/chat/ and /api/chat/stream/ views hand them to a dedicated executor of
+CHAT_CONCURRENCY threads with CHAT_QUEUE_DEPTH waiting slots per worker
+process, so a burst of chat traffic never occupies more than that and the
+event loop stays free. When the slots are full, submit() raises QueueFull
+right away and the view answers 429 with a Retry-After estimate.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from . import chat_cache, faq_index
+
+logger = logging.getLogger(__name__)
+
+CHAT_CONCURRENCY = getattr(settings, 'CHAT_CONCURRENCY', 2)
+CHAT_QUEUE_DEPTH = getattr(settings, 'CHAT_QUEUE_DEPTH', 8)
+CHAT_TIMEOUT = getattr(settings, 'CHAT_TIMEOUT', 60.0)
+
+# Chat reply when the model is not loaded or generation failed
+FALLBACK_REPLIES = {
+    'en': (
+        "Thank you for your message. The chatbot model is not available right now. "
+        "To apply for a loan, use the Loan Eligibility and Loan Amount Recommendation tools. "
+        "We support Kinyarwanda, English, and French."
+    ),
+    'fr': (
+        "Merci pour votre message. Le modèle du chatbot n'est pas disponible. "
+        "Pour demander un prêt, utilisez les outils d'éligibilité et de recommandation ci-dessus."
+    ),
+    'rw': (
+        "Murakoze kubutumwa. Modèle y'ikibazo ntabwo iri. "
+        "Kugira ngo usabe inguzanyo, koresha ibikoresho by'emera no gutoranya inguzanyo hejuru."
+    ),
+}
+
+
+def fallback_reply(language):
+    return FALLBACK_REPLIES.get(language, FALLBACK_REPLIES['en'])
+
+
+def fast_path(raw_message, language):
+    """
+    Answer without running T5 when possible: the answer cache, then the FAQ
+    index in the user's language, then (FR/RW) the FAQ index in English on
+    the translated question. Returns ({'reply', 'reply_en', 'source'} or
+    None, the English question for the model or None when answered).
+    """
+    from .translation_service import to_english, from_english
+
+    cached = chat_cache.lookup(raw_message, language)
+    if cached is not None:
+        return {**cached, 'source': 'cache'}, None
+    hit = faq_index.match(raw_message, language)
+    if hit is not None:
+        return {'reply': hit['answer'], 'reply_en': hit['answer'] if language == 'en' else '', 'source': 'faq'}, None
+    question_en = to_english(raw_message, source_lang=language)
+    if language != 'en':
+        hit = faq_index.match(question_en, 'en')
+        if hit is not None:
+            return {'reply': from_english(hit['answer'], target_lang=language), 'reply_en': hit['answer'], 'source': 'faq'}, None
+    return None, question_en
+
+
+def log_chat(user, message, reply, language, source, started):
+    """Record the exchange in ChatInteraction with its answer path and latency; a failed write never fails the reply."""
+    from .models import ChatInteraction
+
+    try:
+        ChatInteraction.objects.create(
+            user=user, message=message, reply=reply, language=language[:5],
+            source=source, latency_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+    except DatabaseError:
+        logger.exception("Chat interaction log write failed")
+
+
+def answer(raw_message, language, user=None, started=None, debug=False):
+    """One chat turn; returns the /api/chat/ response body."""
+    from .chatbot_service import generate_reply, get_load_error
+    from .translation_service import from_english
+
+    started = time.perf_counter() if started is None else started
+    found, question_for_model = fast_path(raw_message, language)
+    if found is not None:
+        log_chat(user, raw_message, found['reply'], language, found['source'], started)
+        body = {'reply': found['reply'], 'response': found['reply'], 'source': found['source'], 'cached': found['source'] == 'cache'}
+        if debug and language != 'en':
+            body['source_reply_en'] = found['reply_en']
+        return body
+    # Not a known question: the English translation goes to the financial
+    # chatbot model, then the answer is translated back.
+    reply_en = generate_reply(question_for_model, language='en')
+    if reply_en is None:
+        # Fallback when model not loaded or generation failed
+        reply = fallback_reply(language)
+        log_chat(user, raw_message, reply, language, 'fallback', started)
+        body = {'reply': reply, 'response': reply, 'source': 'fallback'}
+        err_msg = get_load_error()
+        if debug and err_msg:
+            body['chatbot_load_error'] = err_msg
+        return body
+    # Translate final answer back to requested language (FR/RW) when needed.
+    final_reply = from_english(reply_en, target_lang=language)
+    chat_cache.store(raw_message, language, final_reply, reply_en)
+    log_chat(user, raw_message, final_reply, language, 'model', started)
+    body = {'reply': final_reply, 'response': final_reply, 'source': 'model'}
+    if debug and language != 'en':
+        body['source_reply_en'] = reply_en
+    return body
+
+
+def stream_answer(raw_message, language, user=None, started=None):
+    """
+    One chat turn as the /api/chat/stream/ events: (event, data) pairs, some
+    ('token', {'text'}) then ('done', {'reply', 'source', 'cached'}) or
+    ('error', {'error'}). Model replies are yielded as they decode (whole
+    translated sentences for FR/RW); closing the generator stops decoding.
+    """
+    from .chatbot_service import stream_reply
+    from .translation_service import translate_stream
+
+    started = time.perf_counter() if started is None else started
+    found, question_for_model = fast_path(raw_message, language)
+    pieces = None if found is not None else stream_reply(question_for_model)
+    if pieces is None:
+        if found is not None:
+            reply, source = found['reply'], found['source']
+        else:
+            reply, source = fallback_reply(language), 'fallback'
+        log_chat(user, raw_message, reply, language, source, started)
+        yield 'token', {'text': reply}
+        yield 'done', {'reply': reply, 'source': source, 'cached': source == 'cache'}
+        return
+    english = []
+
+    def collect(source):
+        # Keep the English text for the answer cache while it streams through translation
+        for piece in source:
+            english.append(piece)
+            yield piece
+
+    stream = translate_stream(collect(pieces), language)
+    parts = []
+    try:
+        for text in stream:
+            parts.append(text)
+            yield 'token', {'text': text}
+    except Exception as e:
+        yield 'error', {'error': str(e)}
+        return
+    finally:
+        # Runs when the caller closes this generator too: stop decoding
+        stream.close()
+        pieces.close()
+    reply = ''.join(parts).strip()
+    chat_cache.store(raw_message, language, reply, ''.join(english).strip())
+    log_chat(user, raw_message, reply, language, 'model', started)
+    yield 'done', {'reply': reply, 'source': 'model', 'cached': False}
+
+
+class QueueFull(Exception):
+    """All running and waiting slots are taken; retry_after is a wait estimate in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"chat queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool of `concurrency` workers accepting at most `max_queue` more
+    tasks than it is running; submit() never blocks. Threads are created per
+    process on first use, so an instance imported before a fork works after it.
+    """
+
+    def __init__(self, concurrency, max_queue, name='bounded'):
+        self.concurrency = max(int(concurrency), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.run_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=self.name)
+                self._slots = threading.BoundedSemaphore(self.concurrency + self.max_queue)
+                self._pending = 0
+                self._pid = os.getpid()
+
+    def submit(self, fn, *args, **kwargs):
+        """Future for fn(*args, **kwargs), or QueueFull when every slot is taken."""
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(self.retry_after())
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(self._timed, fn, args, kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    def _timed(self, fn, args, kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.completed += 1
+                self.run_seconds += time.perf_counter() - start
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: mean run time x tasks ahead per thread (at least 1)."""
+        with self._lock:
+            mean = self.run_seconds / self.completed if self.completed else 1.0
+            return max(1, math.ceil(mean * self._pending / self.concurrency))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'max_queue': self.max_queue,
+                'in_system': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'mean_run_ms': round(self.run_seconds / self.completed * 1000, 1) if self.completed else None,
+            }
+
+
+executor = BoundedExecutor(CHAT_CONCURRENCY, CHAT_QUEUE_DEPTH, name='chat')
+
+
+def request_user(request):
+    """
+    Authenticated user of a plain Django request, else None, resolved with
+    REST_FRAMEWORK's authentication classes as a DRF view would: a bad token
+    raises AuthenticationFailed and a session user without a valid CSRF token
+    PermissionDenied. Call from a sync thread.
+    """
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    user = drf_request.user
+    return user if getattr(user, 'is_authenticated', False) else None
+
+
+def stats():
+    return executor.stats()
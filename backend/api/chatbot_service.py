@@ -1,12 +1,18 @@
 """
 Load the saved T5 chatbot model (saved-model/) and generate replies.
 Model is from Financial_LLM_Chatbot.ipynb (Flan-T5-small fine-tuned on Bitext mortgage/loans).
+CHATBOT_BACKEND picks the framework: 'torch' (model.safetensors, the same
+PyTorch runtime as translation_service) or 'tensorflow' (tf_model.h5).
 """
+import bisect
 import logging
 from pathlib import Path
 
 from django.conf import settings
 
+from . import model_server
+from .batching import MicroBatcher
+
 logger = logging.getLogger(__name__)
 
 # Saved model dir: project root / saved-model (same as notebook output). Resolved to absolute path.
@@ -18,25 +24,36 @@ CHATBOT_MODEL_DIR = Path(_custom_dir).resolve() if _custom_dir else (_project_ro
 INPUT_PREFIX = "answer the question: "
 MAX_INPUT_LENGTH = 256
 DEFAULT_MAX_NEW_TOKENS = 128
-DEFAULT_TEMPERATURE = 0.7
+# 0 = greedy decoding: deterministic replies, which the chat answer cache requires (chat_cache.py)
+DEFAULT_TEMPERATURE = getattr(settings, 'CHATBOT_TEMPERATURE', 0.7)
+
+CHATBOT_BACKEND = getattr(settings, 'CHATBOT_BACKEND', 'torch')
+# Tensor type handed to the tokenizer for the selected backend
+_RETURN_TENSORS = 'tf' if CHATBOT_BACKEND == 'tensorflow' else 'pt'
+# Int8 dynamic quantization of the linear layers (torch backend only, see quantization.py)
+CHATBOT_QUANTIZE_INT8 = getattr(settings, 'CHATBOT_QUANTIZE_INT8', False)
 
 _tokenizer = None
 _model = None
 _load_error = None
+# Last failure talking to the model server (remote mode only)
+_remote_error = None
 
 
 def get_load_error():
     """Return the last load error message (or None). Useful for debugging."""
     global _load_error
+    if model_server.remote_enabled():
+        return _remote_error
     if _load_error is None:
         return None
     return f"{type(_load_error).__name__}: {_load_error}"
 
 
-def _load_chatbot():
-    """Lazy-load tokenizer and T5 model from saved-model/."""
-    global _tokenizer, _model, _load_error
-    if _model is not None and _tokenizer is not None:
+def _load_tokenizer():
+    """Load the tokenizer only (no TensorFlow / torch); safe to do before a fork."""
+    global _tokenizer, _load_error
+    if _tokenizer is not None:
         return True
     if _load_error is not None:
         return False
@@ -46,15 +63,25 @@ def _load_chatbot():
         return False
     try:
         from transformers import T5TokenizerFast
-        try:
-            from transformers import TFT5ForConditionalGeneration
-        except ImportError:
-            # Some 4.x versions expose TF T5 only from the submodule
-            from transformers.models.t5.modeling_tf_t5 import TFT5ForConditionalGeneration
+        _tokenizer = T5TokenizerFast.from_pretrained(str(CHATBOT_MODEL_DIR))
+        return True
+    except Exception as e:
+        _load_error = e
+        logger.exception("Failed to load chatbot tokenizer from %s: %s", CHATBOT_MODEL_DIR, e)
+        return False
+
+
+def _load_chatbot():
+    """Lazy-load tokenizer and T5 model from saved-model/."""
+    global _model, _load_error
+    if _model is not None and _tokenizer is not None:
+        return True
+    if not _load_tokenizer():
+        return False
+    try:
         tokenizer_path = str(CHATBOT_MODEL_DIR)
-        _tokenizer = T5TokenizerFast.from_pretrained(tokenizer_path)
-        _model = TFT5ForConditionalGeneration.from_pretrained(tokenizer_path)
-        logger.info("Chatbot model loaded from %s", tokenizer_path)
+        _model = _load_model(tokenizer_path)
+        logger.info("Chatbot model loaded from %s (%s)", tokenizer_path, CHATBOT_BACKEND)
         return True
     except Exception as e:
         _load_error = e
@@ -62,6 +89,27 @@ def _load_chatbot():
         return False
 
 
+def _load_model(path, quantize=None):
+    quantize = CHATBOT_QUANTIZE_INT8 if quantize is None else quantize
+    if CHATBOT_BACKEND == 'tensorflow':
+        if quantize:
+            logger.warning("CHATBOT_QUANTIZE_INT8 needs CHATBOT_BACKEND=torch; loading the TF model unquantized")
+        try:
+            from transformers import TFT5ForConditionalGeneration
+        except ImportError:
+            # Some 4.x versions expose TF T5 only from the submodule
+            from transformers.models.t5.modeling_tf_t5 import TFT5ForConditionalGeneration
+        # tf_model.h5: with model.safetensors alongside, transformers would convert the torch weights instead
+        return TFT5ForConditionalGeneration.from_pretrained(path, use_safetensors=False)
+    from transformers import T5ForConditionalGeneration
+    if quantize:
+        from .quantization import load_quantized
+        return load_quantized(path, lambda: T5ForConditionalGeneration.from_pretrained(path))
+    model = T5ForConditionalGeneration.from_pretrained(path)
+    model.eval()
+    return model
+
+
 def generate_reply(message, language='en', max_new_tokens=None, temperature=None):
     """
     Generate a chatbot reply using the saved T5 model.
@@ -72,18 +120,22 @@ def generate_reply(message, language='en', max_new_tokens=None, temperature=None
     """
     if not message or not str(message).strip():
         return None
+    if model_server.remote_enabled():
+        return _generate_remote(message, max_new_tokens, temperature)
     if not _load_chatbot():
         return None
     max_new_tokens = max_new_tokens if max_new_tokens is not None else DEFAULT_MAX_NEW_TOKENS
     temperature = temperature if temperature is not None else DEFAULT_TEMPERATURE
 
     try:
-        import tensorflow as tf
-
         input_text = INPUT_PREFIX + str(message).strip()
+        if _batchers is not None:
+            input_ids = _tokenizer(input_text, truncation=True, max_length=MAX_INPUT_LENGTH)['input_ids']
+            return _batcher_for(len(input_ids))((input_ids, max_new_tokens, temperature))
+
         inputs = _tokenizer(
             [input_text],
-            return_tensors='tf',
+            return_tensors=_RETURN_TENSORS,
             padding=True,
             truncation=True,
             max_length=MAX_INPUT_LENGTH,
@@ -102,6 +154,204 @@ def generate_reply(message, language='en', max_new_tokens=None, temperature=None
         return None
 
 
+def stream_reply(message, max_new_tokens=None, temperature=None):
+    """
+    Like generate_reply(), but returns an iterator of text pieces as the model
+    decodes them (None when the model is unavailable). Decoding runs step by
+    step with the encoder output and past key/values reused, so each piece is
+    available as soon as its token is chosen; closing the iterator (client
+    disconnect) stops generation. Streams bypass the generation batcher. With
+    the model server, the whole reply arrives as a single piece.
+    """
+    if not message or not str(message).strip():
+        return None
+    if model_server.remote_enabled():
+        reply = _generate_remote(message, max_new_tokens, temperature)
+        return (piece for piece in (reply,)) if reply else None
+    if not _load_chatbot():
+        return None
+    max_new_tokens = max_new_tokens if max_new_tokens is not None else DEFAULT_MAX_NEW_TOKENS
+    temperature = temperature if temperature is not None else DEFAULT_TEMPERATURE
+    return _decode_stream(INPUT_PREFIX + str(message).strip(), max_new_tokens, temperature)
+
+
+def _decode_stream(input_text, max_new_tokens, temperature):
+    inputs = _tokenizer([input_text], return_tensors=_RETURN_TENSORS, truncation=True, max_length=MAX_INPUT_LENGTH)
+    # generate() samples from the top_k most likely tokens when do_sample is on
+    top_k = getattr(getattr(_model, 'generation_config', None), 'top_k', None) or 50
+    steps = _tf_decode_steps if CHATBOT_BACKEND == 'tensorflow' else _torch_decode_steps
+    tokens = []
+    sent = ''
+    for token in steps(inputs, max_new_tokens, temperature, top_k):
+        tokens.append(token)
+        # Decode the whole prefix so SentencePiece word boundaries come out right
+        text = _tokenizer.decode(tokens, skip_special_tokens=True)
+        if len(text) > len(sent) and text.startswith(sent):
+            yield text[len(sent):]
+            sent = text
+
+
+def _tf_decode_steps(inputs, max_new_tokens, temperature, top_k):
+    """Yield generated token ids one at a time until EOS (TensorFlow model)."""
+    import tensorflow as tf
+
+    config = _model.config
+    encoder_outputs = _model.get_encoder()(inputs['input_ids'], attention_mask=inputs['attention_mask'])
+    next_input = tf.constant([[config.decoder_start_token_id]])
+    past = None
+    for _ in range(max_new_tokens):
+        outputs = _model(
+            encoder_outputs=encoder_outputs,
+            attention_mask=inputs['attention_mask'],
+            decoder_input_ids=next_input,
+            past_key_values=past,
+            use_cache=True,
+        )
+        past = outputs.past_key_values
+        logits = outputs.logits[:, -1, :]
+        if temperature > 0:
+            top_logits, top_ids = tf.math.top_k(logits / temperature, k=top_k)
+            token = int(top_ids[0, int(tf.random.categorical(top_logits, 1)[0, 0])])
+        else:
+            token = int(tf.argmax(logits, axis=-1)[0])
+        if token == config.eos_token_id:
+            return
+        yield token
+        next_input = tf.constant([[token]])
+
+
+def _torch_decode_steps(inputs, max_new_tokens, temperature, top_k):
+    """Yield generated token ids one at a time until EOS (PyTorch model)."""
+    import torch
+
+    config = _model.config
+    # no_grad per step, not around the yields: grad mode is thread state shared with the caller
+    with torch.no_grad():
+        encoder_outputs = _model.get_encoder()(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask'])
+    next_input = torch.tensor([[config.decoder_start_token_id]])
+    past = None
+    for _ in range(max_new_tokens):
+        with torch.no_grad():
+            outputs = _model(
+                encoder_outputs=encoder_outputs,
+                attention_mask=inputs['attention_mask'],
+                decoder_input_ids=next_input,
+                past_key_values=past,
+                use_cache=True,
+            )
+        past = outputs.past_key_values
+        logits = outputs.logits[:, -1, :]
+        if temperature > 0:
+            top_logits, top_ids = torch.topk(logits / temperature, k=top_k)
+            token = int(top_ids[0, torch.multinomial(torch.softmax(top_logits, dim=-1), 1)[0, 0]])
+        else:
+            token = int(logits.argmax(dim=-1)[0])
+        if token == config.eos_token_id:
+            return
+        yield token
+        next_input = torch.tensor([[token]])
+
+
+def _run_generate_batch(items):
+    """
+    MicroBatcher callback. items: (input token ids, max_new_tokens, temperature).
+    Items with the same generation settings are padded together and run
+    through one generate() call; returns one reply (or None) per item.
+    """
+    results = [None] * len(items)
+    groups = {}
+    for i, (_, max_new_tokens, temperature) in enumerate(items):
+        groups.setdefault((max_new_tokens, temperature), []).append(i)
+    for (max_new_tokens, temperature), indices in groups.items():
+        inputs = _tokenizer.pad({'input_ids': [items[i][0] for i in indices]}, return_tensors=_RETURN_TENSORS)
+        outputs = _model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            do_sample=temperature > 0,
+            pad_token_id=_tokenizer.pad_token_id,
+        )
+        for i, reply in zip(indices, _tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+            results[i] = reply.strip() or None
+    return results
+
+
+# Opt-in (CHATBOT_BATCHING=1): concurrent messages are queued for up to CHATBOT_BATCH_WINDOW_MS and
+# generated together. One batcher per input-length bucket, so short messages are not padded to long ones.
+CHATBOT_BATCH_BUCKETS = tuple(sorted(getattr(settings, 'CHATBOT_BATCH_BUCKETS', (32, 64, 128, MAX_INPUT_LENGTH))))
+_batchers = [
+    MicroBatcher(
+        _run_generate_batch,
+        window_ms=getattr(settings, 'CHATBOT_BATCH_WINDOW_MS', 20),
+        max_batch=getattr(settings, 'CHATBOT_BATCH_MAX_SIZE', 8),
+        name=f'chat-batch-{bound}',
+    )
+    for bound in CHATBOT_BATCH_BUCKETS
+] if getattr(settings, 'CHATBOT_BATCHING', False) else None
+
+
+def _batcher_for(n_tokens):
+    """Batcher of the smallest length bucket that holds n_tokens (the last one for anything longer)."""
+    return _batchers[min(bisect.bisect_left(CHATBOT_BATCH_BUCKETS, n_tokens), len(_batchers) - 1)]
+
+
+def batch_stats():
+    """Per length bucket batch-size and queue-wait metrics, or None when batching is disabled."""
+    if _batchers is None:
+        return None
+    return {f"<={bound}": batcher.stats() for bound, batcher in zip(CHATBOT_BATCH_BUCKETS, _batchers)}
+
+
+def _generate_remote(message, max_new_tokens, temperature):
+    """generate_reply() on the model server; None (like a local failure) if it cannot answer."""
+    global _remote_error
+    try:
+        reply = model_server.call(
+            'generate', message=str(message), max_new_tokens=max_new_tokens, temperature=temperature,
+        )
+    except model_server.ModelServerError as e:
+        _remote_error = f"ModelServerError ({e.code}): {e}"
+        logger.warning("Chat generation on the model server failed: %s", _remote_error)
+        return None
+    _remote_error = None
+    return reply
+
+
 def is_available():
     """Return True if the chatbot model is loaded and ready."""
+    global _remote_error
+    if model_server.remote_enabled():
+        try:
+            state = model_server.call('chatbot_status', timeout=5)
+        except model_server.ModelServerError as e:
+            _remote_error = f"ModelServerError ({e.code}): {e}"
+            return False
+        _remote_error = state.get('load_error')
+        return bool(state.get('available'))
     return _load_chatbot()
+
+
+def preload():
+    """
+    Pre-fork step (gunicorn preload). TensorFlow starts its runtime thread
+    pools when the model is built, and those threads do not survive a fork,
+    so with the TF backend only the tokenizer is loaded here and the model is
+    built in each worker by after_fork(). The PyTorch model is loaded here
+    too, with torch kept to one thread, so workers share its weights.
+    """
+    if CHATBOT_BACKEND == 'tensorflow':
+        return _load_tokenizer()
+    import torch
+
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        return _load_chatbot()
+    finally:
+        torch.set_num_threads(threads)
+
+
+def after_fork():
+    """Post-fork step: build the model in this worker (if not preloaded) so the first chat request does not pay for it."""
+    if _model is None and _load_error is None:
+        _load_chatbot()
@@ -0,0 +1,217 @@
+"""
+Retrieval fast path for the chatbot: answer a question from a precomputed
+FAQ index when it closely matches a known question, instead of running T5.
+
+Questions are represented as character n-grams (3-5 characters within
+words, after chat_cache.normalize_question) hashed into N_FEATURES columns
+and weighted by TF-IDF, one L2-normalized row per known question. The
+matrix is stored in COO form as .npy files and memory-mapped at load, so
+forked workers share it. A query is scored against every row of its
+language with one gather + bincount (cosine similarity) and the best row
+is returned when it reaches CHAT_FAQ_THRESHOLD.
+
+Built by `manage.py build_faq_index` from the FAQ file and the most frequent
+ChatInteraction pairs; see build_index() for the on-disk layout.
+"""
+import json
+import logging
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .chat_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+CHAT_FAQ_INDEX_DIR = Path(
+    getattr(settings, 'CHAT_FAQ_INDEX_DIR', None) or Path(__file__).resolve().parent.parent.parent / 'chat_faq_index'
+)
+CHAT_FAQ_THRESHOLD = getattr(settings, 'CHAT_FAQ_THRESHOLD', 0.8)
+
+N_FEATURES = 1 << 18
+NGRAM_RANGE = (3, 5)
+_ARRAYS = ('rows', 'cols', 'data', 'idf', 'languages')
+
+
+def _term_counts(text):
+    """Hashed character n-gram counts of a question ({column: count})."""
+    counts = Counter()
+    for word in normalize_question(text).split():
+        padded = f' {word} '
+        for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+            for i in range(max(len(padded) - n + 1, 1)):
+                # crc32, not hash(): stable across processes and restarts
+                counts[zlib.crc32(padded[i:i + n].encode('utf-8')) & (N_FEATURES - 1)] += 1
+    return counts
+
+
+def _weights(counts, idf):
+    """Sublinear TF x IDF, L2-normalized: (columns, weights) arrays."""
+    if not counts:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    cols = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    weights = tf * idf[cols]
+    norm = float(np.linalg.norm(weights))
+    return cols, (weights / norm if norm else weights).astype(np.float32)
+
+
+def build_index(entries, directory=CHAT_FAQ_INDEX_DIR):
+    """
+    entries: [{'question', 'answer', 'language', 'source'}], one per known
+    question. Writes rows/cols/data (COO matrix), idf and languages .npy
+    files plus entries.json (answers) and meta.json to `directory`,
+    replacing any previous index in one rename. Returns the meta dict.
+    """
+    directory = Path(directory)
+    entries = [e for e in entries if normalize_question(e['question']) and e.get('answer')]
+    if not entries:
+        raise ValueError("No FAQ entries to index")
+    counts = [_term_counts(e['question']) for e in entries]
+    df = np.zeros(N_FEATURES, dtype=np.float32)
+    for c in counts:
+        df[list(c)] += 1
+    # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+    idf = (np.log((1 + len(entries)) / (1 + df)) + 1).astype(np.float32)
+
+    rows, cols, data = [], [], []
+    for i, c in enumerate(counts):
+        row_cols, row_weights = _weights(c, idf)
+        rows.append(np.full(len(row_cols), i, dtype=np.int32))
+        cols.append(row_cols)
+        data.append(row_weights)
+    language_codes = sorted({e['language'] for e in entries})
+    arrays = {
+        'rows': np.concatenate(rows),
+        'cols': np.concatenate(cols),
+        'data': np.concatenate(data),
+        'idf': idf,
+        'languages': np.array([language_codes.index(e['language']) for e in entries], dtype=np.int16),
+    }
+    meta = {
+        'built_at': datetime.now(timezone.utc).isoformat(),
+        'entries': len(entries),
+        'nnz': int(len(arrays['data'])),
+        'n_features': N_FEATURES,
+        'ngram_range': list(NGRAM_RANGE),
+        'language_codes': language_codes,
+        'sources': dict(Counter(e.get('source', 'faq') for e in entries)),
+    }
+
+    tmp = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(tmp / f'{name}.npy', array)
+    with open(tmp / 'entries.json', 'w', encoding='utf-8') as fh:
+        json.dump([{k: e.get(k) for k in ('question', 'answer', 'language', 'source')} for e in entries], fh, ensure_ascii=False)
+    with open(tmp / 'meta.json', 'w') as fh:
+        json.dump(meta, fh, indent=2)
+    old = directory.with_name(directory.name + '.old')
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old)
+    tmp.rename(directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+class FaqIndex:
+    """A built index, memory-mapped from `directory`."""
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        self.directory = directory
+        for name in _ARRAYS:
+            setattr(self, name, np.load(directory / f'{name}.npy', mmap_mode='r'))
+        with open(directory / 'entries.json', encoding='utf-8') as fh:
+            self.entries = json.load(fh)
+        with open(directory / 'meta.json') as fh:
+            self.meta = json.load(fh)
+        self._language_codes = {code: i for i, code in enumerate(self.meta['language_codes'])}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def scores(self, question):
+        """Cosine similarity of the question to every indexed question."""
+        q_cols, q_weights = _weights(_term_counts(question), self.idf)
+        if not len(q_cols):
+            return np.zeros(len(self.entries), dtype=np.float32)
+        query = np.zeros(N_FEATURES, dtype=np.float32)
+        query[q_cols] = q_weights
+        return np.bincount(self.rows, weights=self.data * query[self.cols], minlength=len(self.entries))
+
+    def match(self, question, language, threshold=CHAT_FAQ_THRESHOLD):
+        """Best entry of this language as {'question', 'answer', 'language', 'source', 'score'}, or None below threshold."""
+        code = self._language_codes.get(language)
+        if code is None:
+            return None
+        scores = np.where(self.languages == code, self.scores(question), -1.0)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < threshold:
+            return None
+        return {**self.entries[best], 'score': round(score, 4)}
+
+
+_index = None
+_index_loaded = False
+_lock = threading.Lock()
+_stats = {'lookups': 0, 'hits': 0, 'seconds': 0.0}
+
+
+def get_index():
+    """The index at CHAT_FAQ_INDEX_DIR (loaded once per process), or None if none was built."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _lock:
+            if not _index_loaded:
+                if (CHAT_FAQ_INDEX_DIR / 'meta.json').exists():
+                    try:
+                        _index = FaqIndex(CHAT_FAQ_INDEX_DIR)
+                        logger.info("Chat FAQ index loaded: %d questions from %s", len(_index), CHAT_FAQ_INDEX_DIR)
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.exception("Could not load chat FAQ index from %s: %s", CHAT_FAQ_INDEX_DIR, e)
+                _index_loaded = True
+    return _index
+
+
+def match(question, language):
+    """Stored answer for a closely matching known question, or None (no index, or best score below threshold)."""
+    index = get_index()
+    if index is None or not question:
+        return None
+    start = time.perf_counter()
+    hit = index.match(question, language)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _stats['lookups'] += 1
+        _stats['hits'] += hit is not None
+        _stats['seconds'] += elapsed
+    return hit
+
+
+def stats():
+    """Lookup / hit counters of this worker, or None when no index is loaded."""
+    index = get_index()
+    if index is None:
+        return None
+    with _lock:
+        lookups = _stats['lookups']
+        return {
+            'questions': len(index),
+            'built_at': index.meta.get('built_at'),
+            'threshold': CHAT_FAQ_THRESHOLD,
+            'lookups': lookups,
+            'hits': _stats['hits'],
+            'hit_rate': round(_stats['hits'] / lookups, 4) if lookups else None,
+            'mean_lookup_ms': round(_stats['seconds'] / lookups * 1000, 3) if lookups else None,
+        }
@@ -0,0 +1,235 @@
+"""
+ML inference benchmark: artifact load time, cold / warm single-row latency of
+predict_eligibility / predict_risk / recommend_amount, and score_batch
+throughput at several batch sizes, on synthetic payloads. Results are written
+as JSON and can be compared with a stored baseline; the command fails when a
+gated metric regresses by more than --tolerance. Only the stable metrics are
+gated: warm p50 and throughput of batches of 100 rows or more, each the
+best of --repeats interleaved runs (on a shared host the runs are bimodal, so
+a median still lands on the slow mode now and then). Load time, cold calls,
+p90/p99 and small batches vary by more than any useful tolerance between
+identical runs; they are compared and printed, but never fail the command.
+
+Run: python manage.py bench_ml --output bench.json
+     python manage.py bench_ml --baseline bench.json --tolerance 0.2
+"""
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ml_service
+from api.caching import LRUCache
+
+_FUNCTIONS = ('predict_eligibility', 'predict_risk', 'recommend_amount')
+_BATCH_SIZES = (1, 10, 100, 10000)
+_GATED_MIN_BATCH = 100
+
+
+def _latency_summary(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+
+    def pct(p):
+        return ms[min(int(p * len(ms)), len(ms) - 1)]
+
+    return {'n': len(ms), 'mean_ms': statistics.fmean(ms), 'p50_ms': pct(0.5), 'p90_ms': pct(0.9),
+            'p99_ms': pct(0.99), 'max_ms': ms[-1]}
+
+
+def _flatten(results):
+    """{metric path: (value, higher_is_better, gated)} for the baseline comparison."""
+    metrics = {'load.seconds': (results['load']['seconds'], False, False)}
+    for name, summary in results['cold'].items():
+        metrics[f'cold.{name}.p50_ms'] = (summary['p50_ms'], False, False)
+    for name, summary in results['warm'].items():
+        metrics[f'warm.{name}.p50_ms'] = (summary['p50_ms'], False, True)
+        metrics[f'warm.{name}.p99_ms'] = (summary['p99_ms'], False, False)
+    for size, batch in results['batch'].items():
+        metrics[f'batch.{size}.rows_per_second'] = (batch['rows_per_second'], True, int(size) >= _GATED_MIN_BATCH)
+    return metrics
+
+
+class Command(BaseCommand):
+    help = "Benchmark ML artifact load, single-row latency and batch throughput; compare with a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help='Warm single-row calls per function and repeat')
+        parser.add_argument('--repeats', type=int, default=5,
+                            help='Interleaved runs of the warm and batch phases; gated metrics take the best run')
+        parser.add_argument('--cold-runs', type=int, default=3, help='Fresh loads used for cold-call latency')
+        parser.add_argument('--batch-sizes', default=','.join(map(str, _BATCH_SIZES)))
+        parser.add_argument('--min-seconds', type=float, default=0.5, help='Minimum time spent per batch size')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+        parser.add_argument('--baseline', default=None, help='Earlier --output file to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative regression per gated metric (0.2 = 20%% slower / less throughput)')
+
+    def handle(self, *args, **options):
+        try:
+            batch_sizes = [int(s) for s in options['batch_sizes'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError("--batch-sizes must be comma-separated integers")
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        payloads = ml_service.synthetic_payloads(max(options['iterations'], max(batch_sizes, default=1)), seed=options['seed'])
+        saved_cache, saved_batcher = ml_service._prediction_cache, ml_service._batcher
+        # Measure the model path itself: no prediction cache, no micro-batching window
+        ml_service._prediction_cache = LRUCache(maxsize=0)
+        ml_service._batcher = None
+        try:
+            results = {
+                'meta': self._meta(),
+                'load': self._load(),
+                'cold': self._cold(payloads, options['cold_runs']),
+                'warm': self._warm(payloads, options['iterations'], options['repeats']),
+                'batch': self._batch(payloads, batch_sizes, options['min_seconds'], options['repeats']),
+            }
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        finally:
+            ml_service._prediction_cache, ml_service._batcher = saved_cache, saved_batcher
+        results['meta']['model_version'] = ml_service.model_version()
+        self._print(results)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Wrote {options['output']}")
+        if baseline is not None:
+            self._compare(results, baseline, options['tolerance'])
+
+    def _meta(self):
+        return {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'engine': ml_service.ML_INFERENCE_ENGINE,
+            'dtype': ml_service.ML_INFERENCE_DTYPE,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'node': platform.node(),
+        }
+
+    def _load(self):
+        models_dir, version = ml_service._resolve_source()
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            ml_service._load_from(models_dir, version)
+            timings.append(time.perf_counter() - start)
+        # The first load also pays for importing scikit-learn / XGBoost
+        return {'seconds': min(timings), 'first_seconds': timings[0]}
+
+    def _cold(self, payloads, runs):
+        """Latency of the first call of each function right after a fresh load."""
+        samples = {name: [] for name in _FUNCTIONS}
+        for run in range(max(runs, 1)):
+            ml_service.reload_artifacts()
+            for name in _FUNCTIONS:
+                start = time.perf_counter()
+                getattr(ml_service, name)(payloads[run])
+                samples[name].append(time.perf_counter() - start)
+        return {name: _latency_summary(values) for name, values in samples.items()}
+
+    def _warm(self, payloads, iterations, repeats):
+        """Single-row latency per function; p50_ms is the lowest per-repeat p50."""
+        for name in _FUNCTIONS:
+            fn = getattr(ml_service, name)
+            for payload in payloads[:20]:
+                fn(payload)
+        timings = {name: [] for name in _FUNCTIONS}
+        repeat_p50s = {name: [] for name in _FUNCTIONS}
+        for _ in range(max(repeats, 1)):
+            # Functions take turns so a noisy stretch of time hits all of them alike
+            for name in _FUNCTIONS:
+                fn = getattr(ml_service, name)
+                run = []
+                for payload in payloads[:iterations]:
+                    start = time.perf_counter()
+                    fn(payload)
+                    run.append(time.perf_counter() - start)
+                timings[name].extend(run)
+                repeat_p50s[name].append(_latency_summary(run)['p50_ms'])
+        results = {}
+        for name in _FUNCTIONS:
+            summary = _latency_summary(timings[name])
+            summary['p50_ms'] = min(repeat_p50s[name])
+            summary['repeat_p50_ms'] = repeat_p50s[name]
+            results[name] = summary
+        return results
+
+    def _batch(self, payloads, sizes, min_seconds, repeats):
+        """score_batch throughput per size; rows_per_second is the best repeat."""
+        batches = {size: (payloads * (size // len(payloads) + 1))[:size] for size in sizes}
+        for rows in batches.values():
+            ml_service.score_batch(rows)
+        runs = {size: [] for size in sizes}
+        for _ in range(max(repeats, 1)):
+            for size, rows in batches.items():
+                calls, elapsed = 0, 0.0
+                while elapsed < min_seconds or calls < 3:
+                    start = time.perf_counter()
+                    ml_service.score_batch(rows)
+                    elapsed += time.perf_counter() - start
+                    calls += 1
+                runs[size].append((calls, elapsed))
+        results = {}
+        for size in sizes:
+            rates = [size * calls / elapsed for calls, elapsed in runs[size]]
+            calls = sum(c for c, _ in runs[size])
+            results[str(size)] = {
+                'calls': calls,
+                'ms_per_batch': sum(e for _, e in runs[size]) / calls * 1000,
+                'rows_per_second': max(rates),
+                'repeat_rows_per_second': rates,
+            }
+        return results
+
+    def _print(self, results):
+        meta = results['meta']
+        self.stdout.write(f"Engine {meta['engine']} / {meta['dtype']}, model {meta['model_version']}")
+        self.stdout.write(f"Load: {results['load']['seconds']:.3f}s (first {results['load']['first_seconds']:.3f}s)")
+        for phase in ('cold', 'warm'):
+            for name, s in results[phase].items():
+                self.stdout.write(
+                    f"{phase:<5} {name:<20} p50 {s['p50_ms']:8.3f} ms  p90 {s['p90_ms']:8.3f} ms  "
+                    f"p99 {s['p99_ms']:8.3f} ms  (n={s['n']})"
+                )
+        for size, b in results['batch'].items():
+            self.stdout.write(f"batch {size:>6}: {b['ms_per_batch']:9.3f} ms/batch  {b['rows_per_second']:12,.0f} rows/s")
+
+    def _compare(self, results, baseline, tolerance):
+        current = _flatten(results)
+        try:
+            previous = _flatten(baseline)
+        except (KeyError, TypeError) as e:
+            raise CommandError(f"Baseline file has an unexpected format: {e}")
+        regressions = []
+        self.stdout.write(f"Compared with baseline from {baseline.get('meta', {}).get('created_at', '?')}:")
+        for metric, (value, higher_is_better, gated) in current.items():
+            if metric not in previous:
+                continue
+            old = previous[metric][0]
+            if not old:
+                continue
+            change = (value - old) / old
+            worse = -change if higher_is_better else change
+            if not gated:
+                flag = '(not gated)'
+            else:
+                flag = 'REGRESSION' if worse > tolerance else ''
+            self.stdout.write(f"  {metric:<40} {old:12.4f} -> {value:12.4f} ({change:+.1%}) {flag}")
+            if flag == 'REGRESSION':
+                regressions.append(metric)
+        if regressions:
+            raise CommandError(f"{len(regressions)} metric(s) regressed beyond {tolerance:.0%}: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS(f"No gated metric regressed beyond {tolerance:.0%}"))
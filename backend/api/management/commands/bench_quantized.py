@@ -0,0 +1,198 @@
+"""
+Benchmark int8 dynamic quantization (CHATBOT_QUANTIZE_INT8 / TRANSLATION_QUANTIZE_INT8)
+against the fp32 models on a fixed prompt set: mean generation latency,
+weight size and RSS growth on load, and output drift (exact-match rate and
+corpus BLEU of the int8 outputs against the fp32 outputs). Decoding is greedy
+so the only difference is the quantization. The quantized models are taken
+from (or written to) the disk cache, like in production.
+Run: python manage.py bench_quantized [--models chatbot,fr,rw] [--max-bleu-drop 5]
+"""
+import io
+import json
+import math
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.procmem import process_memory
+
+_CHAT_PROMPTS = (
+    "How do I apply for a loan?",
+    "What documents do I need for a loan application?",
+    "Can I repay my loan early?",
+    "What happens if I miss a payment?",
+    "How is my interest rate calculated?",
+    "How long does loan approval take?",
+    "Can I change the due date of my payments?",
+    "What is the maximum amount I can borrow?",
+)
+# English replies of the kind the chatbot sends back, for en -> fr / rw
+_EN_SENTENCES = (
+    "You can apply for a loan from your farmer dashboard.",
+    "Please upload your national ID and proof of income.",
+    "Early repayment is allowed without any penalty.",
+    "A missed payment may add a late fee to your next installment.",
+    "Your interest rate depends on your credit score and the loan duration.",
+    "Most applications are reviewed within five working days.",
+)
+# Questions users send in French / Kinyarwanda, for fr / rw -> en
+_SOURCE_SENTENCES = {
+    'fr': (
+        "Comment puis-je demander un prêt ?",
+        "Quels documents dois-je fournir ?",
+        "Puis-je rembourser mon prêt plus tôt ?",
+        "Que se passe-t-il si je rate un paiement ?",
+    ),
+    'rw': (
+        "Nigute nasaba inguzanyo?",
+        "Ni izihe nyandiko nkeneye?",
+        "Nshobora kwishyura inguzanyo yanjye mbere y'igihe?",
+        "Bigenda bite iyo ntishyuye ku gihe?",
+    ),
+}
+
+
+def _rss_mb():
+    mem = process_memory()
+    return mem['rss_mb'] if mem else float('nan')
+
+
+def _weights_mb(model):
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+
+def corpus_bleu(hypotheses, references, max_n=4):
+    """Corpus BLEU (0-100) with one reference per hypothesis, whitespace tokens, add-one smoothing above unigrams."""
+    matches = [0] * max_n
+    totals = [0] * max_n
+    hyp_len = ref_len = 0
+    for hyp, ref in zip(hypotheses, references):
+        hyp, ref = (hyp or '').split(), (ref or '').split()
+        hyp_len += len(hyp)
+        ref_len += len(ref)
+        for n in range(1, max_n + 1):
+            hyp_ngrams = Counter(tuple(hyp[i:i + n]) for i in range(len(hyp) - n + 1))
+            ref_ngrams = Counter(tuple(ref[i:i + n]) for i in range(len(ref) - n + 1))
+            matches[n - 1] += sum((hyp_ngrams & ref_ngrams).values())
+            totals[n - 1] += max(len(hyp) - n + 1, 0)
+    if not hyp_len or not matches[0]:
+        return 0.0
+    log_precision = sum(math.log((matches[n] + (n > 0)) / (totals[n] + (n > 0))) for n in range(max_n)) / max_n
+    brevity = min(1.0, math.exp(1 - ref_len / hyp_len))
+    return 100 * brevity * math.exp(log_precision)
+
+
+class Command(BaseCommand):
+    help = "Compare int8-quantized and fp32 chatbot / MarianMT models: latency, memory and output drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', default='chatbot,fr,rw', help='chatbot and/or translation languages')
+        parser.add_argument('--max-new-tokens', type=int, default=64)
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the prompt set')
+        parser.add_argument('--max-bleu-drop', type=float, default=None,
+                            help='Fail when int8 BLEU against fp32 is below 100 minus this')
+        parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        import torch
+
+        results = {}
+        for name in (m.strip() for m in options['models'].split(',') if m.strip()):
+            if name == 'chatbot':
+                cases = self._chatbot_cases(options['max_new_tokens'])
+            elif name in _SOURCE_SENTENCES:
+                cases = self._translation_cases(name)
+            else:
+                raise CommandError(f"Unknown model {name!r}: use chatbot, fr or rw")
+            for label, load, run, prompts in cases:
+                with torch.no_grad():
+                    results[label] = self._compare(load, run, prompts, options['repeat'])
+                self._report(label, results[label])
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        limit = options['max_bleu_drop']
+        if limit is not None:
+            failed = [label for label, r in results.items() if r['bleu'] < 100 - limit]
+            if failed:
+                raise CommandError(f"int8 drift too large (BLEU below {100 - limit:g}) for: {', '.join(failed)}")
+
+    def _chatbot_cases(self, max_new_tokens):
+        from api import chatbot_service
+
+        if chatbot_service.CHATBOT_BACKEND != 'torch':
+            raise CommandError("Quantization needs CHATBOT_BACKEND=torch")
+        if not chatbot_service._load_tokenizer():
+            raise CommandError(chatbot_service.get_load_error())
+        tokenizer = chatbot_service._tokenizer
+        path = str(chatbot_service.CHATBOT_MODEL_DIR)
+        return [(
+            'chatbot',
+            lambda quantize: (tokenizer, chatbot_service._load_model(path, quantize=quantize)),
+            lambda pair, text: self._generate(*pair, text, max_new_tokens=max_new_tokens),
+            [chatbot_service.INPUT_PREFIX + p for p in _CHAT_PROMPTS],
+        )]
+
+    def _translation_cases(self, lang):
+        from api import translation_service
+
+        cases = []
+        for source, target, prompts in ((lang, 'en', _SOURCE_SENTENCES[lang]), ('en', lang, _EN_SENTENCES)):
+            cases.append((
+                f"{source}->{target}",
+                lambda quantize, source=source, target=target: translation_service._load_pair(source, target, quantize=quantize),
+                lambda pair, text: self._generate(*pair, text, max_length=512),
+                prompts,
+            ))
+        return cases
+
+    @staticmethod
+    def _generate(tokenizer, model, text, **kwargs):
+        inputs = tokenizer([text], return_tensors='pt', truncation=True, max_length=512)
+        outputs = model.generate(**inputs, do_sample=False, **kwargs)
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)[0].strip()
+
+    def _compare(self, load, run, prompts, repeat):
+        result = {}
+        outputs = {}
+        for label, quantize in (('fp32', False), ('int8', True)):
+            rss = _rss_mb()
+            start = time.perf_counter()
+            pair = load(quantize)
+            load_seconds = time.perf_counter() - start
+            outputs[label] = [run(pair, p) for p in prompts]  # also warms up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for p in prompts:
+                    run(pair, p)
+            result[label] = {
+                'load_seconds': round(load_seconds, 3),
+                'mean_ms': round((time.perf_counter() - start) / (repeat * len(prompts)) * 1000, 2),
+                'weights_mb': round(_weights_mb(pair[1]), 1),
+                'rss_growth_mb': round(_rss_mb() - rss, 1),
+            }
+            del pair
+        result['exact_match'] = sum(a == b for a, b in zip(outputs['fp32'], outputs['int8'])) / len(prompts)
+        result['bleu'] = round(corpus_bleu(outputs['int8'], outputs['fp32']), 2)
+        result['speedup'] = round(result['fp32']['mean_ms'] / result['int8']['mean_ms'], 2)
+        result['outputs'] = outputs
+        return result
+
+    def _report(self, label, r):
+        self.stdout.write(label)
+        for kind in ('fp32', 'int8'):
+            m = r[kind]
+            self.stdout.write(
+                f"  {kind}: {m['mean_ms']:8.1f} ms/prompt, weights {m['weights_mb']:7.1f} MB, "
+                f"RSS +{m['rss_growth_mb']:.1f} MB, load {m['load_seconds']:.2f}s"
+            )
+        self.stdout.write(
+            f"  speedup {r['speedup']:.2f}x, exact match {r['exact_match']:.0%}, BLEU vs fp32 {r['bleu']:.1f}"
+        )
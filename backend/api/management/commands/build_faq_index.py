@@ -0,0 +1,112 @@
+"""
+Build the chat FAQ retrieval index (api/faq_index.py) from the curated FAQ
+file and the most frequently asked questions in ChatInteraction.
+Run: python manage.py build_faq_index [--faq api/data/chat_faq.json] [--top-interactions 200] [--min-count 3]
+     python manage.py build_faq_index --query "how can i apply for a loan" --language en   # test a question
+"""
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import faq_index
+from api.chat_cache import normalize_question
+
+
+def _faq_entries(path):
+    """FAQ file: [{"question": str or [str, ...], "answer": str, "language": "en"}, ...] -> one entry per question."""
+    with open(path, encoding='utf-8') as fh:
+        items = json.load(fh)
+    entries = []
+    for item in items:
+        questions = item['question'] if isinstance(item['question'], list) else [item['question']]
+        for question in questions:
+            entries.append({
+                'question': question,
+                'answer': item['answer'],
+                'language': item.get('language', 'en'),
+                'source': 'faq',
+            })
+    return entries
+
+
+def _interaction_entries(top, min_count, scan):
+    """The `top` most frequent (question, language) pairs answered by the model, with their latest reply."""
+    from api.models import ChatInteraction
+
+    counts = Counter()
+    latest = {}
+    rows = (
+        ChatInteraction.objects.filter(source__in=('model', 'cache'))
+        .order_by('-created_at')
+        .values_list('message', 'reply', 'language')[:scan]
+    )
+    for message, reply, language in rows.iterator(chunk_size=2000):
+        key = (normalize_question(message), language)
+        if not key[0] or not reply:
+            continue
+        counts[key] += 1
+        # Newest first: the first reply seen is the latest one
+        latest.setdefault(key, (message, reply))
+    return [
+        {'question': latest[key][0], 'answer': latest[key][1], 'language': key[1], 'source': 'interactions'}
+        for key, count in counts.most_common(top) if count >= min_count
+    ]
+
+
+class Command(BaseCommand):
+    help = "Build the chatbot FAQ index from the FAQ file and frequent ChatInteraction questions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--faq', default=str(getattr(settings, 'CHAT_FAQ_FILE', '')), help='FAQ JSON file')
+        parser.add_argument('--output', default=str(faq_index.CHAT_FAQ_INDEX_DIR), help='Index directory')
+        parser.add_argument('--top-interactions', type=int, default=200, help='Most frequent asked questions to add (0 = none)')
+        parser.add_argument('--min-count', type=int, default=3, help='Times a question must have been asked')
+        parser.add_argument('--scan', type=int, default=50000, help='Most recent chat interactions to scan')
+        parser.add_argument('--query', help='Only score this question against the existing index')
+        parser.add_argument('--language', default='en')
+
+    def handle(self, *args, **options):
+        if options['query']:
+            return self._query(options)
+        entries = []
+        if options['faq']:
+            if not Path(options['faq']).exists():
+                raise CommandError(f"FAQ file not found: {options['faq']}")
+            entries.extend(_faq_entries(options['faq']))
+        if options['top_interactions'] > 0:
+            entries.extend(_interaction_entries(options['top_interactions'], options['min_count'], options['scan']))
+        # Curated answers win over logged ones for the same question
+        seen = set()
+        unique = []
+        for entry in entries:
+            key = (normalize_question(entry['question']), entry['language'])
+            if key[0] and key not in seen:
+                seen.add(key)
+                unique.append(entry)
+        try:
+            meta = faq_index.build_index(unique, options['output'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {meta['entries']} questions ({', '.join(f'{k}: {v}' for k, v in meta['sources'].items())}; "
+            f"languages {', '.join(meta['language_codes'])}) into {options['output']}"
+        ))
+        self.stdout.write("Running workers load the new index on restart.")
+
+    def _query(self, options):
+        try:
+            index = faq_index.FaqIndex(options['output'])
+        except OSError as e:
+            raise CommandError(f"No index at {options['output']}: {e}")
+        scores = index.scores(options['query'])
+        ranked = sorted(
+            (i for i, entry in enumerate(index.entries) if entry['language'] == options['language']),
+            key=lambda i: -scores[i],
+        )[:5]
+        for i in ranked:
+            marker = '*' if scores[i] >= faq_index.CHAT_FAQ_THRESHOLD else ' '
+            self.stdout.write(f"{marker} {scores[i]:.3f}  {index.entries[i]['question']}")
+        self.stdout.write(f"(* = at or above CHAT_FAQ_THRESHOLD {faq_index.CHAT_FAQ_THRESHOLD})")
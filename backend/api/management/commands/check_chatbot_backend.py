@@ -0,0 +1,124 @@
+"""
+Compare the PyTorch and TensorFlow chatbot backends (CHATBOT_BACKEND).
+Each backend runs in its own subprocess, so its import time and resident
+memory are measured without the other framework loaded. Both generate
+greedy replies to the same questions; the command reports framework import
+time, model load time, RSS, generation latency and how many replies match,
+and fails when fewer than --min-match of them are identical.
+Run: python manage.py check_chatbot_backend [--backends torch,tensorflow] [--min-match 0.95]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+_QUESTIONS = (
+    "How do I apply for a loan?",
+    "What documents do I need for a mortgage application?",
+    "Can I repay my loan early?",
+    "What happens if I miss a payment?",
+    "How is my interest rate calculated?",
+    "How long does loan approval take?",
+    "Can I change the due date of my payments?",
+    "What is the maximum amount I can borrow?",
+)
+
+
+def _rss_mb():
+    from api.procmem import process_memory
+
+    mem = process_memory()
+    return mem['rss_mb'] if mem else None
+
+
+class Command(BaseCommand):
+    help = "Check output parity, import time and memory of the torch vs tensorflow chatbot backends"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default='torch,tensorflow')
+        parser.add_argument('--max-new-tokens', type=int, default=64)
+        parser.add_argument('--min-match', type=float, default=0.95, help='Share of identical greedy replies required')
+        # Internal: measure one backend in this process and print JSON
+        parser.add_argument('--child', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            self.stdout.write(json.dumps(self._measure(options['max_new_tokens'])))
+            return
+        backends = [b.strip() for b in options['backends'].split(',') if b.strip()]
+        results = {backend: self._run_child(backend, options['max_new_tokens']) for backend in backends}
+
+        self.stdout.write(f"{'backend':<12}{'import s':>10}{'load s':>9}{'RSS base':>10}{'RSS import':>12}{'RSS loaded':>12}{'reply ms':>10}")
+        for backend, r in results.items():
+            self.stdout.write(
+                f"{backend:<12}{r['import_seconds']:>10.2f}{r['load_seconds']:>9.2f}{r['rss_base_mb']:>10.1f}"
+                f"{r['rss_import_mb']:>12.1f}{r['rss_loaded_mb']:>12.1f}{r['reply_ms']:>10.1f}"
+            )
+            if r['tensorflow_imported']:
+                self.stdout.write(f"  {backend}: tensorflow was imported")
+        if len(results) < 2:
+            return
+
+        first, second = (results[b]['replies'] for b in backends[:2])
+        matches = sum(a == b for a, b in zip(first, second))
+        for question, a, b in zip(_QUESTIONS, first, second):
+            if a != b:
+                self.stdout.write(f"  differs: {question!r}\n    {backends[0]}: {a!r}\n    {backends[1]}: {b!r}")
+        share = matches / len(_QUESTIONS)
+        self.stdout.write(f"Identical greedy replies: {matches}/{len(_QUESTIONS)} ({share:.0%})")
+        if share < options['min_match']:
+            raise CommandError(f"Backends disagree on {len(_QUESTIONS) - matches} replies (need {options['min_match']:.0%} identical)")
+        self.stdout.write(self.style.SUCCESS("Chatbot backends agree"))
+
+    def _run_child(self, backend, max_new_tokens):
+        # Always in-process: the point is to load the model in the child
+        env = dict(os.environ, CHATBOT_BACKEND=backend, USE_TF='0' if backend == 'torch' else '1', MODEL_SERVER_SOCKET='')
+        proc = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'check_chatbot_backend', '--child', backend, '--max-new-tokens', str(max_new_tokens)],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"{backend} backend failed:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def _measure(self, max_new_tokens):
+        from api import chatbot_service
+
+        rss_base = _rss_mb()
+        start = time.perf_counter()
+        if chatbot_service.CHATBOT_BACKEND == 'tensorflow':
+            import tensorflow  # noqa: F401
+            from transformers import TFT5ForConditionalGeneration  # noqa: F401
+        else:
+            import torch  # noqa: F401
+            from transformers import T5ForConditionalGeneration  # noqa: F401
+        import_seconds = time.perf_counter() - start
+        rss_import = _rss_mb()
+
+        start = time.perf_counter()
+        if not chatbot_service.is_available():
+            raise CommandError(chatbot_service.get_load_error() or "chatbot model not available")
+        load_seconds = time.perf_counter() - start
+        rss_loaded = _rss_mb()
+
+        # Warm once, then time greedy generation over the question set
+        chatbot_service.generate_reply(_QUESTIONS[0], max_new_tokens=max_new_tokens, temperature=0)
+        start = time.perf_counter()
+        replies = [chatbot_service.generate_reply(q, max_new_tokens=max_new_tokens, temperature=0) for q in _QUESTIONS]
+        reply_ms = (time.perf_counter() - start) / len(_QUESTIONS) * 1000
+        return {
+            'backend': chatbot_service.CHATBOT_BACKEND,
+            'import_seconds': import_seconds,
+            'load_seconds': load_seconds,
+            'rss_base_mb': rss_base,
+            'rss_import_mb': rss_import,
+            'rss_loaded_mb': rss_loaded,
+            'reply_ms': reply_ms,
+            'replies': replies,
+            'tensorflow_imported': 'tensorflow' in sys.modules,
+        }
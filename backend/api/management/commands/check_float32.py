@@ -0,0 +1,70 @@
+"""
+Accuracy guard and benchmark for float32 inference (ML_INFERENCE_DTYPE=float32).
+Scores a reference set in float64 and float32, reports the maximum risk-score
+deviation and eligibility flip rate, and fails when they exceed the
+ML_FLOAT32_* thresholds (the same check runs when the artifacts load).
+Run: python manage.py check_float32 [--rows 20000] [--from-db]
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ml_service
+
+
+def _best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Check float32 vs float64 scoring parity and compare batch memory / speed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Synthetic reference rows')
+        parser.add_argument('--seed', type=int, default=11)
+        parser.add_argument('--from-db', action='store_true', help='Use stored loan applications as the reference set')
+
+    def handle(self, *args, **options):
+        try:
+            models = ml_service._load_artifacts()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        if options['from_db']:
+            from api.models import LoanApplication
+            from api.views import _application_to_ml_payload
+            rows = [_application_to_ml_payload(app) for app in LoanApplication.objects.iterator(chunk_size=2000)]
+            if not rows:
+                raise CommandError("No loan applications in the database")
+        else:
+            rows = ml_service.synthetic_payloads(options['rows'], seed=options['seed'])
+
+        parity = ml_service.float32_parity(models, rows=rows)
+        self.stdout.write(f"Model version {models['version']} ({ml_service.ML_INFERENCE_ENGINE} engine), {parity['rows']} rows")
+        self.stdout.write(
+            f"  max |risk diff| {parity['max_risk_deviation']:.4g} (allowed {parity['max_risk_deviation_allowed']})"
+        )
+        self.stdout.write(
+            f"  eligibility flips {parity['eligibility_flips']} = {parity['flip_rate']:.4%} "
+            f"(allowed {parity['max_flip_rate_allowed']:.4%})"
+        )
+        self.stdout.write(f"  max rel amount diff {parity['max_amount_rel_deviation']:.4g}")
+
+        X64, _ = ml_service._FeatureEncoder(models['feature_cols']).encode_batch(rows)
+        X32 = X64.astype(np.float32)
+        for label, X in (('float64', X64), ('float32', X32)):
+            scaled = ml_service._scale(models, X)
+            seconds = _best_of(lambda: ml_service._predict_all(models, ml_service._scale(models, X)))
+            self.stdout.write(
+                f"  {label}: encoded + scaled matrices {(X.nbytes + scaled.nbytes) / 2**20:.1f} MiB, "
+                f"scale + score {seconds * 1000:.1f} ms ({len(X) / seconds:,.0f} rows/s)"
+            )
+
+        if not parity['ok']:
+            raise CommandError("float32 inference exceeds the accuracy limits; ML_INFERENCE_DTYPE=float32 will be refused")
+        self.stdout.write(self.style.SUCCESS("float32 inference is within the accuracy limits"))
@@ -0,0 +1,87 @@
+"""
+Compile the XGBoost loan models into flat NumPy arrays for the numpy inference
+engine (ML_INFERENCE_ENGINE=numpy), after checking parity with the originals.
+Run: python manage.py export_tree_models [--check-rows 5000]
+Needs scikit-learn + xgboost installed (only for this step).
+"""
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ml_service, tree_engine
+
+
+def _per_row_us(fn, rows):
+    start = time.perf_counter()
+    for X in rows:
+        fn(X)
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+
+class Command(BaseCommand):
+    help = "Export the tree-ensemble models to NumPy arrays and verify parity"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models-dir', default=None, help='Artifacts folder (default: MODELS_DIR)')
+        parser.add_argument('--output', default=None, help=f'Output file (default: <models-dir>/{ml_service.COMPILED_MODELS_FILE})')
+        parser.add_argument('--check-rows', type=int, default=5000, help='Synthetic rows used for the parity check')
+        parser.add_argument('--tolerance', type=float, default=1e-3, help='Max absolute risk / relative amount deviation')
+
+    def handle(self, *args, **options):
+        models_dir = Path(options['models_dir']) if options['models_dir'] else ml_service.MODELS_DIR
+        output = Path(options['output']) if options['output'] else models_dir / ml_service.COMPILED_MODELS_FILE
+        try:
+            artifacts = {key: joblib.load(models_dir / filename) for key, filename in ml_service._ARTIFACTS}
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        encoder = ml_service._FeatureEncoder(artifacts['feature_cols'])
+        amount_cols = encoder.amount_columns
+        compiled = tree_engine.export_models(
+            artifacts['feature_cols'],
+            artifacts['scaler'],
+            {key: artifacts[key] for key in tree_engine.MODEL_KEYS},
+            column_maps={'amount_regressor': amount_cols},
+        )
+        n_trees = len(compiled['roots'])
+        self.stdout.write(f"Compiled {n_trees} trees / {len(compiled['feature'])} nodes (max depth {compiled['max_depth']})")
+
+        # Parity against the original estimators
+        X, _ = encoder.encode_batch(ml_service.synthetic_payloads(options['check_rows'], seed=1))
+        X_ref = artifacts['scaler'].transform(X)
+        ref_approved = np.asarray(artifacts['classifier'].predict(X_ref)).astype(int) == 1
+        ref_risk = np.asarray(artifacts['risk_regressor'].predict(X_ref), dtype=np.float64)
+        ref_amount = np.asarray(artifacts['amount_regressor'].predict(X_ref[:, amount_cols]), dtype=np.float64)
+
+        scaler = tree_engine.NumpyScaler(compiled['scaler_mean'], compiled['scaler_scale'])
+        forest = tree_engine.CompiledForest(compiled)
+        X_np = scaler.transform(X)
+        approved, risk, amount = forest.predict_all(X_np)
+        flips = int(np.sum(approved != ref_approved))
+        risk_dev = float(np.max(np.abs(risk - ref_risk)))
+        amount_dev = float(np.max(np.abs(amount - ref_amount) / np.maximum(np.abs(ref_amount), 1.0)))
+        self.stdout.write(
+            f"Parity on {len(X)} rows: eligibility flips={flips}, "
+            f"max |risk diff|={risk_dev:.2e}, max rel amount diff={amount_dev:.2e}"
+        )
+        if flips or risk_dev > options['tolerance'] or amount_dev > options['tolerance']:
+            raise CommandError("Compiled models do not match the originals; nothing written")
+
+        # Uncompressed so the arrays can be memory-mapped on load
+        joblib.dump(compiled, output)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+        rows = [X_np[i:i + 1] for i in range(min(500, len(X_np)))]
+        ref_rows = [X_ref[i:i + 1] for i in range(len(rows))]
+
+        def _original(x):
+            artifacts['classifier'].predict(x)
+            artifacts['risk_regressor'].predict(x)
+            artifacts['amount_regressor'].predict(x[:, amount_cols])
+
+        self.stdout.write(
+            f"Single-row latency (3 models): original {_per_row_us(_original, ref_rows):.0f} us, "
+            f"numpy {_per_row_us(forest.predict_all, rows):.0f} us"
+        )
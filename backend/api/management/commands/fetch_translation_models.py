@@ -0,0 +1,138 @@
+"""
+Download the MarianMT translation models into their local directories
+(TRANSLATION_MODEL_PATHS), so production workers load them with
+local_files_only and never contact the Hugging Face hub. Each directory gets
+a checksums.json manifest (sha256 of every file, hub commit); weight files
+are also checked against the hub's LFS sha256 while fetching.
+Run: python manage.py fetch_translation_models [--languages fr,rw] [--revision main]
+     python manage.py fetch_translation_models --verify [--load]   # offline check of files and checksums
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MANIFEST = 'checksums.json'
+# Files a MarianMT directory must have; plus one of _WEIGHTS
+_REQUIRED = ('config.json', 'source.spm', 'target.spm', 'vocab.json', 'tokenizer_config.json')
+_WEIGHTS = ('model.safetensors', 'pytorch_model.bin')
+_TEST_SENTENCE = {'en': "How do I apply for a loan?", 'fr': "Comment demander un prêt ?", 'rw': "Nigute nasaba inguzanyo?"}
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _lfs_sha256(sibling):
+    lfs = getattr(sibling, 'lfs', None)
+    if lfs is None:
+        return None
+    return lfs.get('sha256') if isinstance(lfs, dict) else getattr(lfs, 'sha256', None)
+
+
+class Command(BaseCommand):
+    help = "Fetch the MarianMT translation models into local directories, or verify them offline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--languages', default='fr,rw', help='Languages whose <-> English pairs to handle')
+        parser.add_argument('--revision', default='main', help='Hub branch, tag or commit to fetch')
+        parser.add_argument('--verify', action='store_true', help='Only check files and checksums (no network)')
+        parser.add_argument('--load', action='store_true', help='With --verify, also load each pair offline and translate one sentence')
+
+    def handle(self, *args, **options):
+        paths = getattr(settings, 'TRANSLATION_MODEL_PATHS', {})
+        pairs = []
+        for lang in (code.strip() for code in options['languages'].split(',') if code.strip()):
+            for source, target in ((lang, 'en'), ('en', lang)):
+                if f'{source}-{target}' not in paths:
+                    raise CommandError(f"No TRANSLATION_MODEL_PATHS entry for {source}-{target}")
+                pairs.append((source, target, Path(paths[f'{source}-{target}'])))
+        failed = []
+        for source, target, path in pairs:
+            if options['verify']:
+                problems = self._verify(path)
+                if not problems and options['load']:
+                    problems = self._load(source, target)
+            else:
+                problems = self._fetch(source, target, path, options['revision'])
+            if problems:
+                failed.append(f'{source}-{target}')
+                for problem in problems:
+                    self.stderr.write(f"  {source}->{target}: {problem}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{source}->{target}: OK ({path})"))
+        if failed:
+            raise CommandError(f"Failed: {', '.join(failed)}")
+
+    def _fetch(self, source, target, path, revision):
+        from huggingface_hub import HfApi, snapshot_download
+
+        from api.translation_service import _hub_name
+
+        repo_id = _hub_name(source, target)
+        info = HfApi().model_info(repo_id, revision=revision, files_metadata=True)
+        siblings = {s.rfilename: s for s in info.siblings}
+        weights = next((name for name in _WEIGHTS if name in siblings), None)
+        if weights is None:
+            return [f"{repo_id}@{info.sha} has no PyTorch weights"]
+        # Tokenizer and config files plus one weights file; TF / Flax weights are skipped
+        files = [name for name in siblings if name.endswith(('.json', '.spm', '.txt')) and '/' not in name] + [weights]
+        self.stdout.write(f"Fetching {repo_id}@{info.sha[:10]} ({len(files)} files) into {path}")
+        snapshot_download(repo_id, revision=info.sha, local_dir=str(path), allow_patterns=files)
+
+        checksums = {}
+        problems = []
+        for name in files:
+            checksums[name] = _sha256(path / name)
+            expected = _lfs_sha256(siblings[name])
+            if expected and expected != checksums[name]:
+                problems.append(f"{name}: sha256 {checksums[name]} does not match the hub ({expected})")
+        if problems:
+            return problems
+        with open(path / MANIFEST, 'w') as fh:
+            json.dump({
+                'repo_id': repo_id,
+                'revision': info.sha,
+                'fetched_at': datetime.now(timezone.utc).isoformat(),
+                'files': checksums,
+            }, fh, indent=2)
+        return []
+
+    def _verify(self, path):
+        if not path.is_dir():
+            return [f"missing directory {path}"]
+        problems = [f"missing {name}" for name in _REQUIRED if not (path / name).exists()]
+        if not any((path / name).exists() for name in _WEIGHTS):
+            problems.append(f"missing weights ({' or '.join(_WEIGHTS)})")
+        if not (path / MANIFEST).exists():
+            return problems + [f"missing {MANIFEST}: fetch with this command to record checksums"]
+        with open(path / MANIFEST) as fh:
+            manifest = json.load(fh)
+        for name, expected in manifest['files'].items():
+            if not (path / name).exists():
+                problems.append(f"missing {name}")
+            elif _sha256(path / name) != expected:
+                problems.append(f"{name}: checksum mismatch")
+        return problems
+
+    def _load(self, source, target):
+        from api import translation_service
+
+        try:
+            location, local = translation_service.model_location(source, target)
+            if not local:
+                return [f"would load {location} from the hub"]
+            tokenizer, model = translation_service._load_marian(location, local_files_only=True)
+            inputs = tokenizer([_TEST_SENTENCE.get(source, _TEST_SENTENCE['en'])], return_tensors='pt')
+            output = tokenizer.batch_decode(model.generate(**inputs, max_length=64), skip_special_tokens=True)[0]
+        except Exception as e:
+            return [f"offline load failed: {e}"]
+        self.stdout.write(f"  {source}->{target}: {output}")
+        return []
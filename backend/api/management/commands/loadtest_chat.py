@@ -0,0 +1,131 @@
+"""
+Loan-endpoint latency during a chat burst, against a running server. Probe
+threads POST synthetic payloads to a loan endpoint (/api/assess/ by default)
+for --seconds with no other traffic, then again while --chat-clients threads
+keep POSTing distinct questions to /api/chat/. Reports probe latency
+percentiles for both phases and the chat status codes (200 / 429 / 504).
+Run: python manage.py loadtest_chat --url http://127.0.0.1:8000 [--chat-clients 20] [--probe-threads 2]
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ml_service
+
+
+def _percentile(values, p):
+    return values[min(int(p * len(values)), len(values) - 1)] if values else 0.0
+
+
+def _post(url, body, timeout):
+    """(status, seconds) of one JSON POST; HTTP errors count as a status, not a failure."""
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            code = response.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    return code, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = "Measure loan-endpoint latency on a running server, alone and during a burst of chat requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--probe-path', default='/api/assess/', help='Loan endpoint to time')
+        parser.add_argument('--probe-threads', type=int, default=2)
+        parser.add_argument('--chat-clients', type=int, default=20, help='Concurrent /api/chat/ callers in the burst')
+        parser.add_argument('--language', default='en', help='Language of the chat questions')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each phase')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        base = options['url'].rstrip('/')
+        try:
+            _post(base + options['probe_path'], ml_service.synthetic_payloads(1)[0], options['timeout'])
+        except OSError as e:
+            raise CommandError(f"Cannot reach {base}: {e}")
+        idle = self._run(base, options, chat_clients=0)
+        self._print('idle', idle)
+        burst = self._run(base, options, chat_clients=options['chat_clients'])
+        self._print(f"chat burst ({options['chat_clients']} clients)", burst)
+        if idle['p50_ms']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{options['probe_path']} p50 {burst['p50_ms'] / idle['p50_ms']:.1f}x, "
+                f"p99 {burst['p99_ms'] / max(idle['p99_ms'], 1e-9):.1f}x during the chat burst"
+            ))
+
+    def _run(self, base, options, chat_clients):
+        stop = threading.Event()
+        payloads = ml_service.synthetic_payloads(5000, seed=3)
+        probe_latencies = []
+        probe_codes = Counter()
+        chat_codes = Counter()
+        errors = []
+        lock = threading.Lock()
+
+        def probe(t):
+            i = t
+            while not stop.is_set():
+                try:
+                    code, seconds = _post(base + options['probe_path'], payloads[i % len(payloads)], options['timeout'])
+                except OSError as e:  # report, keep the other threads going
+                    errors.append(e)
+                    return
+                with lock:
+                    probe_codes[code] += 1
+                    if code == 200:
+                        probe_latencies.append(seconds)
+                i += options['probe_threads']
+
+        def chat(t):
+            i = 0
+            while not stop.is_set():
+                # Distinct questions so the answer cache and FAQ index do not short-circuit generation
+                body = {'message': f"Client {t} question {i}: how can I repay a loan for my maize harvest?", 'language': options['language']}
+                try:
+                    code, _ = _post(base + '/api/chat/', body, options['timeout'])
+                except OSError as e:
+                    errors.append(e)
+                    return
+                with lock:
+                    chat_codes[code] += 1
+                if code == 429:
+                    time.sleep(0.5)
+                i += 1
+
+        threads = [threading.Thread(target=probe, args=(t,), daemon=True) for t in range(options['probe_threads'])]
+        threads += [threading.Thread(target=chat, args=(t,), daemon=True) for t in range(chat_clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise CommandError(f"{len(errors)} client(s) failed: {errors[0]}")
+        merged = sorted(probe_latencies)
+        return {
+            'requests': len(merged),
+            'probe_codes': dict(probe_codes),
+            'chat_codes': dict(chat_codes),
+            'p50_ms': _percentile(merged, 0.5) * 1000,
+            'p95_ms': _percentile(merged, 0.95) * 1000,
+            'p99_ms': _percentile(merged, 0.99) * 1000,
+        }
+
+    def _print(self, phase, result):
+        self.stdout.write(
+            f"{phase}: probe p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms  "
+            f"({result['requests']} ok, status {result['probe_codes']})"
+        )
+        if result['chat_codes']:
+            self.stdout.write(f"  chat status {result['chat_codes']}")
@@ -0,0 +1,119 @@
+"""
+Concurrent load test for single-payload ML predictions, with and without the
+micro-batcher. Threads call ml_service.predict() in a loop on distinct
+synthetic payloads (prediction cache disabled for the run) and the command
+reports sustained requests/s, latency percentiles and batch metrics.
+Run: python manage.py loadtest_ml [--threads 32] [--seconds 5] [--window-ms 3]
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ml_service
+from api.batching import MicroBatcher
+from api.caching import LRUCache
+
+_OUTPUTS = ('approved', 'risk_score', 'recommended_amount')
+
+
+def _percentile(values, p):
+    return values[min(int(p * len(values)), len(values) - 1)] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent single-row ML throughput with the micro-batcher off and on"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent callers (like gthread worker threads)')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--window-ms', type=float, default=3.0)
+        parser.add_argument('--max-batch', type=int, default=64)
+        parser.add_argument('--outputs', default=','.join(_OUTPUTS), help='Comma-separated outputs per call')
+        parser.add_argument('--mode', choices=('both', 'off', 'on'), default='both')
+
+    def handle(self, *args, **options):
+        outputs = tuple(o.strip() for o in options['outputs'].split(',') if o.strip())
+        unknown = set(outputs) - set(_OUTPUTS)
+        if unknown:
+            raise CommandError(f"Unknown outputs: {', '.join(sorted(unknown))}")
+        try:
+            ml_service.warm_up()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        payloads = ml_service.synthetic_payloads(20000, seed=7)
+
+        saved_cache, saved_batcher = ml_service._prediction_cache, ml_service._batcher
+        ml_service._prediction_cache = LRUCache(maxsize=0)
+        results = {}
+        try:
+            for mode in (('off', 'on') if options['mode'] == 'both' else (options['mode'],)):
+                batcher = None
+                if mode == 'on':
+                    batcher = MicroBatcher(
+                        ml_service._run_microbatch, window_ms=options['window_ms'],
+                        max_batch=options['max_batch'], name='loadtest',
+                    )
+                ml_service._batcher = batcher
+                results[mode] = self._run(payloads, outputs, options['threads'], options['seconds'])
+                self._print(mode, results[mode], batcher)
+        finally:
+            ml_service._prediction_cache, ml_service._batcher = saved_cache, saved_batcher
+
+        if len(results) == 2 and results['off']['rps']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Micro-batching: {results['on']['rps'] / results['off']['rps']:.2f}x requests/s "
+                f"with {options['threads']} threads"
+            ))
+
+    def _run(self, payloads, outputs, threads, seconds):
+        stop = threading.Event()
+        latencies = [[] for _ in range(threads)]
+        errors = []
+
+        def caller(t):
+            i = t
+            mine = latencies[t]
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    ml_service.predict(payloads[i % len(payloads)], outputs)
+                except Exception as e:  # report, keep the other threads going
+                    errors.append(e)
+                    return
+                mine.append(time.perf_counter() - start)
+                i += threads
+
+        workers = [threading.Thread(target=caller, args=(t,), daemon=True) for t in range(threads)]
+        started = time.perf_counter()
+        for w in workers:
+            w.start()
+        time.sleep(seconds)
+        stop.set()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f"{len(errors)} caller(s) failed: {errors[0]}")
+        merged = sorted(x for per_thread in latencies for x in per_thread)
+        return {
+            'requests': len(merged),
+            'rps': len(merged) / elapsed,
+            'p50_ms': _percentile(merged, 0.5) * 1000,
+            'p95_ms': _percentile(merged, 0.95) * 1000,
+            'p99_ms': _percentile(merged, 0.99) * 1000,
+        }
+
+    def _print(self, mode, result, batcher):
+        self.stdout.write(
+            f"micro-batching {mode:<3}: {result['rps']:8.0f} req/s  "
+            f"p50 {result['p50_ms']:.2f} ms  p95 {result['p95_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms  "
+            f"({result['requests']} requests)"
+        )
+        if batcher is not None:
+            stats = batcher.stats()
+            waits = stats['queue_wait_ms']
+            self.stdout.write(
+                f"  batches {stats['batches']}, mean size {stats['mean_batch_size']}, max {stats['max_batch_size']}, "
+                f"queue wait p50 {waits['p50']} ms / p95 {waits['p95']} ms, mean batch run {stats['mean_run_ms']} ms"
+            )
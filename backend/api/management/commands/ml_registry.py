@@ -0,0 +1,74 @@
+"""
+Manage versioned ML artifacts (see api/model_registry.py).
+
+    python manage.py ml_registry publish [--from DIR] [--version NAME] [--note TEXT]
+    python manage.py ml_registry activate NAME
+    python manage.py ml_registry list
+    python manage.py ml_registry verify NAME
+"""
+from pathlib import Path
+
+import joblib
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ml_service, model_registry
+
+
+class Command(BaseCommand):
+    help = "Publish, activate, list and verify versioned ML model artifacts"
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest='action', required=True)
+        publish = sub.add_parser('publish', help='Copy the artifacts into a new immutable version')
+        publish.add_argument('--from', dest='source', default=None, help='Artifacts folder (default: MODELS_DIR)')
+        publish.add_argument('--version', default=None, help='Version name (default: timestamp + content hash)')
+        publish.add_argument('--note', default='')
+        publish.add_argument('--activate', action='store_true', help='Activate the new version right away')
+        activate = sub.add_parser('activate', help='Make a version the one workers serve')
+        activate.add_argument('version')
+        sub.add_parser('list', help='List published versions')
+        verify = sub.add_parser('verify', help='Check a version against its manifest checksums')
+        verify.add_argument('version')
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"_{options['action']}")(options)
+        except model_registry.RegistryError as e:
+            raise CommandError(str(e))
+
+    def _publish(self, options):
+        source = Path(options['source']) if options['source'] else ml_service.MODELS_DIR
+        filenames = [filename for _, filename in ml_service._ARTIFACTS]
+        if (source / ml_service.COMPILED_MODELS_FILE).exists():
+            filenames.append(ml_service.COMPILED_MODELS_FILE)
+        try:
+            feature_columns = joblib.load(source / 'feature_columns.pkl')
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        manifest = model_registry.publish(
+            source, filenames, version=options['version'], feature_columns=feature_columns, note=options['note'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Published {manifest['version']} ({len(manifest['files'])} files)"))
+        if options['activate']:
+            self._activate({'version': manifest['version']})
+
+    def _activate(self, options):
+        model_registry.activate(options['version'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Activated {options['version']}; workers switch within {ml_service.ML_REGISTRY_POLL_SECONDS}s"
+        ))
+
+    def _list(self, options):
+        active = model_registry.active_version()
+        manifests = model_registry.list_versions()
+        if not manifests:
+            self.stdout.write(f"No versions in {model_registry.REGISTRY_DIR}")
+        for manifest in manifests:
+            marker = '*' if manifest['version'] == active else ' '
+            self.stdout.write(f"{marker} {manifest['version']}  {manifest['created_at']}  {manifest.get('note', '')}")
+
+    def _verify(self, options):
+        problems = model_registry.verify(options['version'])
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(f"{options['version']}: all checksums match"))
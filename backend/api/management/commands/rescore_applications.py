@@ -0,0 +1,223 @@
+"""
+Re-score existing loan applications with the current ML models.
+
+Applications are streamed in id order, scored chunk by chunk with the batched
+model path (ml_service.score_batch) across worker processes, and written back
+with bulk_update. Progress is checkpointed after every written chunk so an
+interrupted run can continue with --resume.
+
+Run: python manage.py rescore_applications [--workers 4] [--chunk-size 500]
+     python manage.py rescore_applications --dry-run     # diff report, no writes
+     python manage.py rescore_applications --resume
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from api import ml_service
+from api.models import LoanApplication
+from api.views import _application_to_ml_payload, _apply_ml_result
+
+_INPUT_FIELDS = (
+    'id', 'age', 'annual_income', 'credit_score', 'loan_amount_requested', 'loan_duration_months',
+    'employment_status', 'education_level', 'marital_status', 'loan_purpose', 'language',
+)
+_OUTPUT_FIELDS = ('eligibility_approved', 'eligibility_reason', 'risk_score', 'recommended_amount', 'model_version')
+
+
+def _init_worker():
+    """Load the models once per worker process (not once per chunk)."""
+    import django
+    django.setup()
+    ml_service._load_artifacts()
+
+
+def _score_chunk(payloads):
+    return ml_service.score_batch(payloads)
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _amount(value):
+    return None if value is None else round(float(value), 2)
+
+
+def _write_checkpoint(path, state):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, path)
+
+
+class Command(BaseCommand):
+    help = "Recompute eligibility, risk score and recommended amount for existing loan applications"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Applications per scoring / write chunk')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Scoring processes (0 = score in this process)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--checkpoint', default=None,
+                            help='Checkpoint file (default: <BASE_DIR>/.rescore_checkpoint.json)')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last checkpointed id')
+        parser.add_argument('--stale-only', action='store_true',
+                            help='Only applications not already scored by the current model version')
+        parser.add_argument('--show', type=int, default=10, help='Largest risk changes to list in the report')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        try:
+            version = ml_service.model_version()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        dry_run = options['dry_run']
+        checkpoint = Path(options['checkpoint'] or Path(settings.BASE_DIR) / '.rescore_checkpoint.json')
+
+        state = {'model_version': version, 'last_id': 0, 'processed': 0, 'updated': 0,
+                 'started_at': datetime.now(timezone.utc).isoformat()}
+        if options['resume'] and not dry_run:
+            if not checkpoint.exists():
+                raise CommandError(f"No checkpoint to resume from: {checkpoint}")
+            saved = json.loads(checkpoint.read_text())
+            if saved.get('model_version') != version:
+                raise CommandError(
+                    f"Checkpoint was written for model {saved.get('model_version')}, current is {version}; "
+                    "start a fresh run without --resume"
+                )
+            state.update(saved)
+            if state.get('finished_at'):
+                self.stdout.write(f"Checkpoint {checkpoint} is already complete")
+                return
+            self.stdout.write(f"Resuming after application #{state['last_id']} ({state['processed']} done)")
+
+        qs = LoanApplication.objects.filter(id__gt=state['last_id'])
+        if options['stale_only']:
+            qs = qs.exclude(model_version=version)
+        qs = qs.order_by('id').only(*_INPUT_FIELDS, *_OUTPUT_FIELDS)
+
+        report = {'approved_to_denied': 0, 'denied_to_approved': 0, 'risk_changed': 0,
+                  'amount_changed': 0, 'risk_delta_sum': 0.0, 'errors': 0, 'largest': []}
+        timings = {'score': 0.0, 'write': 0.0}
+        started = time.perf_counter()
+
+        workers = max(options['workers'], 0)
+        pool = None
+        if workers:
+            # Workers fork before the queryset opens a cursor; they never touch the database
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            list(pool.map(_ping, range(workers)))
+        else:
+            ml_service._load_artifacts()
+
+        pending = deque()
+
+        def _drain(limit):
+            while len(pending) > limit:
+                apps, payloads, future = pending.popleft()
+                t0 = time.perf_counter()
+                results = future.result() if pool else future
+                timings['score'] += time.perf_counter() - t0
+                self._apply_chunk(apps, payloads, results, state, report, timings, dry_run, checkpoint, options)
+
+        try:
+            chunk = []
+            for app in qs.iterator(chunk_size=chunk_size):
+                chunk.append(app)
+                if len(chunk) == chunk_size:
+                    pending.append(self._submit(chunk, pool, timings))
+                    chunk = []
+                    _drain(workers * 2)
+            if chunk:
+                pending.append(self._submit(chunk, pool, timings))
+            _drain(0)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        if not dry_run:
+            state['finished_at'] = datetime.now(timezone.utc).isoformat()
+            _write_checkpoint(checkpoint, state)
+        self._report(state, report, timings, elapsed, dry_run, options['show'])
+
+    def _submit(self, apps, pool, timings):
+        payloads = [_application_to_ml_payload(app) for app in apps]
+        if pool:
+            return apps, payloads, pool.submit(_score_chunk, payloads)
+        t0 = time.perf_counter()
+        results = _score_chunk(payloads)
+        timings['score'] += time.perf_counter() - t0
+        return apps, payloads, results
+
+    def _apply_chunk(self, apps, payloads, results, state, report, timings, dry_run, checkpoint, options):
+        changed = []
+        for app, payload, result in zip(apps, payloads, results):
+            if 'error' in result:
+                report['errors'] += 1
+                self.stderr.write(f"Application #{app.id}: {result['error']}")
+                continue
+            before = {field: getattr(app, field) for field in _OUTPUT_FIELDS}
+            _apply_ml_result(app, payload, result, app.language)
+            if app.eligibility_approved == before['eligibility_approved']:
+                # Same decision: keep the stored reason (and the language it was written in)
+                app.eligibility_reason = before['eligibility_reason']
+            elif before['eligibility_approved'] is not None:
+                report['approved_to_denied' if before['eligibility_approved'] else 'denied_to_approved'] += 1
+            risk_delta = app.risk_score - (before['risk_score'] or 0.0)
+            if before['risk_score'] is None or abs(risk_delta) > 1e-9:
+                report['risk_changed'] += 1
+                report['risk_delta_sum'] += abs(risk_delta)
+                report['largest'].append((abs(risk_delta), app.id, before['risk_score'], app.risk_score))
+            if _amount(app.recommended_amount) != _amount(before['recommended_amount']):
+                report['amount_changed'] += 1
+            if any(getattr(app, field) != before[field] for field in _OUTPUT_FIELDS):
+                changed.append(app)
+        report['largest'] = sorted(report['largest'], reverse=True)[:options['show']]
+
+        if changed and not dry_run:
+            t0 = time.perf_counter()
+            with transaction.atomic():
+                LoanApplication.objects.bulk_update(changed, _OUTPUT_FIELDS, batch_size=options['chunk_size'])
+            timings['write'] += time.perf_counter() - t0
+        state['processed'] += len(apps)
+        state['updated'] += len(changed)
+        state['last_id'] = apps[-1].id
+        if not dry_run:
+            _write_checkpoint(checkpoint, state)
+
+    def _report(self, state, report, timings, elapsed, dry_run, show):
+        processed = state['processed']
+        verb = 'would change' if dry_run else 'updated'
+        self.stdout.write(f"Model version: {state['model_version']}")
+        self.stdout.write(f"Processed {processed} applications, {verb} {state['updated']}, errors {report['errors']}")
+        self.stdout.write(
+            f"  eligibility flips: approved->denied {report['approved_to_denied']}, "
+            f"denied->approved {report['denied_to_approved']}"
+        )
+        mean_delta = report['risk_delta_sum'] / report['risk_changed'] if report['risk_changed'] else 0.0
+        self.stdout.write(f"  risk score changed: {report['risk_changed']} (mean |delta| {mean_delta:.3f})")
+        self.stdout.write(f"  recommended amount changed: {report['amount_changed']}")
+        if show and report['largest']:
+            self.stdout.write("  largest risk changes:")
+            for delta, app_id, old, new in report['largest']:
+                old_text = 'none' if old is None else f"{old:.3f}"
+                self.stdout.write(f"    #{app_id}: {old_text} -> {new:.3f} (|delta| {delta:.3f})")
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(
+            f"Throughput: {rate:,.0f} applications/s over {elapsed:.2f}s "
+            f"(waiting on scoring {timings['score']:.2f}s, writing {timings['write']:.2f}s)"
+        )
+        if not dry_run:
+            self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,79 @@
+"""
+Run the local model server that owns the chatbot (T5) and translation (MarianMT) models.
+Web workers use it when MODEL_SERVER_SOCKET points at the same path (see api/model_server.py).
+Run: python manage.py run_model_server [--socket /tmp/agrifin-models.sock] [--concurrency 1] [--max-queue 16]
+     python manage.py run_model_server --stats        # query a running server
+"""
+import json
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import model_server
+
+
+class Command(BaseCommand):
+    help = "Serve chat generation and translation from one process over a Unix domain socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=getattr(settings, 'MODEL_SERVER_SOCKET', ''),
+                            help='Socket path (default MODEL_SERVER_SOCKET)')
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'MODEL_SERVER_CONCURRENCY', 1),
+                            help='Requests run at once')
+        parser.add_argument('--max-queue', type=int, default=getattr(settings, 'MODEL_SERVER_MAX_QUEUE', 16),
+                            help='Requests allowed to wait; more are refused as busy')
+        parser.add_argument('--languages', default=','.join(getattr(settings, 'TRANSLATION_PRELOAD_LANGUAGES', ('fr', 'rw'))),
+                            help='Translation pairs loaded before listening (comma-separated, empty = on first use)')
+        parser.add_argument('--no-preload', action='store_true', help='Load the models on first use instead')
+        parser.add_argument('--stats', action='store_true', help='Print the stats of a running server and exit')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if not socket_path:
+            raise CommandError("No socket path: pass --socket or set MODEL_SERVER_SOCKET")
+        if options['stats']:
+            try:
+                stats = model_server.ModelServerClient(socket_path, timeout=5).call('stats')
+            except model_server.ModelServerError as e:
+                raise CommandError(str(e))
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        # From here on chatbot_service / translation_service run their models in this process
+        model_server._serving = True
+        if not options['no_preload']:
+            self._preload([lang.strip() for lang in options['languages'].split(',') if lang.strip()])
+
+        server = model_server.ModelServer(
+            socket_path, model_server.default_handlers(),
+            concurrency=options['concurrency'], max_queue=options['max_queue'],
+        )
+        signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+        self.stdout.write(
+            f"Model server on {server.socket_path} (concurrency {server.concurrency}, queue {server.max_queue}); "
+            f"set MODEL_SERVER_SOCKET={server.socket_path} for the web workers"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+        self.stdout.write("Model server stopped")
+
+    def _preload(self, languages):
+        from api import chatbot_service
+
+        if chatbot_service.is_available():
+            self.stdout.write("Chatbot model loaded")
+        else:
+            self.stderr.write(f"Chatbot model not loaded: {chatbot_service.get_load_error()}")
+        if languages:
+            try:
+                from api import translation_service
+            except ImportError as e:
+                self.stderr.write(f"Translation models not loaded: {e}")
+                return
+            translation_service.preload(languages)
+            # preload() keeps torch on one thread for forking; this process does not fork
+            translation_service.after_fork()
+            self.stdout.write(f"Translation models loaded for {', '.join(languages)}")
@@ -0,0 +1,36 @@
+"""
+Per-process memory of a running gunicorn master and its workers (Linux /proc).
+Run: python manage.py worker_memory <master pid>      # e.g. $(cat gunicorn.pid) or pgrep -o gunicorn
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.procmem import child_pids, process_memory
+
+
+class Command(BaseCommand):
+    help = "Show resident, shared, private and proportional (PSS) memory of a gunicorn master and its workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pid', type=int, help='Gunicorn master pid')
+
+    def handle(self, *args, **options):
+        master = process_memory(options['pid'])
+        if master is None:
+            raise CommandError(f"No readable /proc entry for pid {options['pid']}")
+        rows = [('master', master)] + [
+            ('worker', mem) for mem in (process_memory(pid) for pid in child_pids(options['pid'])) if mem
+        ]
+        self.stdout.write(f"{'role':<8}{'pid':>8}{'rss MB':>10}{'shared MB':>11}{'private MB':>12}{'pss MB':>10}")
+        for role, mem in rows:
+            self.stdout.write(
+                f"{role:<8}{mem['pid']:>8}{mem['rss_mb']:>10.1f}{mem['shared_mb']:>11.1f}"
+                f"{mem['private_mb']:>12.1f}{mem.get('pss_mb', float('nan')):>10.1f}"
+            )
+        workers = [mem for role, mem in rows if role == 'worker']
+        if workers:
+            rss = sum(m['rss_mb'] for m in workers)
+            pss = sum(m.get('pss_mb', 0.0) for _, m in rows)
+            self.stdout.write(
+                f"{len(workers)} workers: summed RSS {rss:.1f} MB (counts shared pages once per worker), "
+                f"actual total (PSS, incl. master) {pss:.1f} MB"
+            )
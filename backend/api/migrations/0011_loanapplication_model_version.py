@@ -0,0 +1,17 @@
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_farmemployee_productionrecord_seedstock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
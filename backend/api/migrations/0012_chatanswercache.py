@@ -0,0 +1,32 @@
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_loanapplication_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatAnswerCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('normalized_question', models.TextField()),
+                ('question', models.TextField()),
+                ('language', models.CharField(default='en', max_length=5)),
+                ('model_version', models.CharField(max_length=64)),
+                ('reply', models.TextField()),
+                ('reply_en', models.TextField(blank=True)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'api_chatanswercache',
+                'ordering': ['-hit_count'],
+            },
+        ),
+    ]
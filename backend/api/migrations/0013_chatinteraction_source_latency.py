@@ -0,0 +1,22 @@
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_chatanswercache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatinteraction',
+            name='source',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='chatinteraction',
+            name='latency_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
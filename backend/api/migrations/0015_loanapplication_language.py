@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-16 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_translationcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='language',
+            field=models.CharField(default='en', max_length=5),
+        ),
+    ]
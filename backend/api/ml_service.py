@@ -1,12 +1,25 @@
 """
 Load ML models and run inference. Uses artifacts from loan_default_risk_model/.
 """
+import hashlib
+import logging
 import os
+import random
+import threading
+import time
+from collections.abc import Mapping
+
 import joblib
 import numpy as np
 from pathlib import Path
 from django.conf import settings
 
+from . import model_registry, tree_engine
+from .batching import MicroBatcher
+from .caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
 MODELS_DIR = getattr(settings, 'MODELS_DIR', None) or Path(__file__).resolve().parent.parent.parent / 'loan_default_risk_model'
 
 # Categorical columns and their allowed values (sorted order to match sklearn LabelEncoder)
@@ -50,79 +63,804 @@ DEFAULT_NUMERIC = {
     'TotalDebtToIncomeRatio': 0.35,
 }
 
+# 1 USD ≈ 1350 RWF — used to normalise RWF monetary values to the USD scale
+# the ML models were trained on, keeping absolute feature magnitudes sane.
+RWF_TO_USD = 1350.0
+
+# Maximum debt-to-income ratio allowed for the recommended amount cap.
+# A monthly payment above 35% of monthly income is capped before returning.
+MAX_DTI = 0.35
+
+# Bring low-income RWF profiles to at least this USD income level before
+# passing to the model, so features land within the training distribution.
+TARGET_INCOME_USD = 45000.0
+
+
+def _income_scale(income_usd_raw):
+    # Scale both income and loan so income ≥ TARGET_INCOME_USD (never scale down).
+    return max(TARGET_INCOME_USD / income_usd_raw, 1.0) if income_usd_raw > 0 else 1.0
+
+
+def _loan_term_features(loan_usd_raw, duration, income_usd_raw, scale):
+    """
+    Features that depend on the loan amount / duration. Works on scalars or on
+    NumPy arrays (sweep_loan_terms), so the grid uses exactly the same ratios.
+    """
+    loan_usd = loan_usd_raw * scale   # ratio preserved exactly
+    monthly_payment = loan_usd / duration
+    # DTI from original unscaled values so it stays accurate
+    if income_usd_raw > 0:
+        dti = np.round(np.minimum((loan_usd_raw / duration) / (income_usd_raw / 12), 0.95), 4)
+    else:
+        dti = np.full_like(monthly_payment, 0.35, dtype=np.float64)
+    return {
+        'LoanAmount':             loan_usd,
+        'LoanDuration':           duration,
+        'DebtToIncomeRatio':      dti,
+        'TotalDebtToIncomeRatio': dti,
+        'MonthlyLoanPayment':     monthly_payment,
+        'MonthlyDebtPayments':    np.round(monthly_payment, 2),
+    }
+
+
+def build_ml_payload(annual_income_rwf, loan_amount_rwf, loan_duration_months,
+                     age, credit_score, employment_status, education_level,
+                     marital_status, loan_purpose):
+    """Build a normalised ML payload from RWF inputs.
+    Converts RWF→USD then scales income+loan UP so the profile sits within
+    the model’s training distribution. All RATIOS (DTI, loan-to-income) are
+    preserved from the original RWF values.
+    Returns (payload, annual income USD, duration, monthly income USD), unscaled.
+    """
+    income_usd_raw = float(annual_income_rwf) / RWF_TO_USD
+    loan_usd_raw   = float(loan_amount_rwf)   / RWF_TO_USD
+    duration       = int(loan_duration_months) or 24
+
+    scale      = _income_scale(income_usd_raw)
+    income_usd = income_usd_raw * scale
+
+    # Derive reasonable financial context from income so the model isn’t
+    # fed contradictory defaults (e.g. $5,000 savings for a $90/month earner).
+    savings      = round(income_usd * 0.15, 2)   # 15% of annual income
+    checking     = round(income_usd * 0.08, 2)   # 8%
+    total_assets = round(income_usd * 1.50, 2)   # 150% (land, equipment)
+    liabilities  = round(income_usd * 0.20, 2)   # 20%
+    net_worth    = round(total_assets - liabilities, 2)
+
+    # Map 'Farming' → 'Other' — the model’s encoder never saw 'Farming'
+    purpose = loan_purpose or 'Other'
+    if purpose not in ('Debt Consolidation', 'Education', 'Home', 'Other'):
+        purpose = 'Other'
+
+    payload = dict(DEFAULT_NUMERIC)
+    payload.update({
+        'Age':                         int(age),
+        'AnnualIncome':                income_usd,
+        'CreditScore':                 int(credit_score),
+        'EmploymentStatus':            employment_status or 'Self-Employed',
+        'EducationLevel':              education_level  or 'High School',
+        'MaritalStatus':               marital_status   or 'Married',
+        'LoanPurpose':                 purpose,
+        'HomeOwnershipStatus':         'Own',
+        'MonthlyIncome':               income_usd / 12,
+        'SavingsAccountBalance':       savings,
+        'CheckingAccountBalance':      checking,
+        'TotalAssets':                 total_assets,
+        'TotalLiabilities':            liabilities,
+        'NetWorth':                    net_worth,
+        'PaymentHistory':              25,   # training mean=24, std=4.85
+        'UtilityBillsPaymentHistory':  0.90,
+        'PreviousLoanDefaults':        0,
+        'BankruptcyHistory':           0,
+        'LengthOfCreditHistory':       8,
+        'NumberOfCreditInquiries':     1,
+        'NumberOfOpenCreditLines':     2,
+        'CreditCardUtilizationRate':   0.20,
+    })
+    terms = _loan_term_features(loan_usd_raw, duration, income_usd_raw, scale)
+    payload.update({k: v if k == 'LoanDuration' else float(v) for k, v in terms.items()})
+    for k, opts in CATEGORICAL_OPTIONS.items():
+        if payload.get(k) not in opts:
+            payload[k] = opts[0]
+    return payload, income_usd_raw, duration, income_usd_raw / 12
+
+
+# Currently served artifacts. Replaced as a whole (never mutated in place) when a new
+# version is loaded, so a prediction that took a reference keeps a consistent set.
 _models = {}
 
 
-def _load_artifacts():
-    if _models:
-        return
-    if not MODELS_DIR.exists():
-        raise FileNotFoundError(f"Models directory not found: {MODELS_DIR}")
-    _models['feature_cols'] = joblib.load(MODELS_DIR / 'feature_columns.pkl')
-    _models['scaler'] = joblib.load(MODELS_DIR / 'scaler.pkl')
-    _models['label_encoder'] = joblib.load(MODELS_DIR / 'label_encoder.pkl')
-    _models['classifier'] = joblib.load(MODELS_DIR / 'loan_default_classifier.pkl')
-    _models['risk_regressor'] = joblib.load(MODELS_DIR / 'risk_score_regressor.pkl')
-    _models['amount_regressor'] = joblib.load(MODELS_DIR / 'loan_amount_regressor.pkl')
-
-
-def _encode_categorical(name, value):
-    options = CATEGORICAL_OPTIONS.get(name, [])
-    if not options:
-        return 0
-    val_str = str(value).strip()
+class _FeatureEncoder:
+    """
+    Payload -> feature vector encoder compiled once per loaded feature_cols:
+    column index maps, dict-based categorical codes and a prefilled default
+    row, so encoding is a buffer copy plus one pass over the payload keys.
+    Same results as encoding column by column with list.index lookups.
+    dtype is the dtype of the matrices it returns (float32 in float32 mode).
+    """
+
+    def __init__(self, feature_cols, dtype=np.float64):
+        self.feature_cols = list(feature_cols)
+        self.dtype = np.dtype(dtype)
+        self.n_features = len(self.feature_cols)
+        self.numeric = []
+        self.categorical = []
+        defaults = np.zeros(self.n_features, dtype=np.float64)
+        for idx, col in enumerate(self.feature_cols):
+            if col in CATEGORICAL_OPTIONS:
+                codes = {value: code for code, value in enumerate(CATEGORICAL_OPTIONS[col])}
+                self.categorical.append((col, idx, codes))
+            else:
+                self.numeric.append((col, idx))
+                defaults[idx] = DEFAULT_NUMERIC.get(col, 0)
+        self.defaults = defaults
+        self._default_values = defaults.tolist()
+        # Model 3 was trained without LoanAmount
+        self.amount_columns = np.array(
+            [i for i, c in enumerate(self.feature_cols) if c != 'LoanAmount'], dtype=np.intp,
+        )
+
+    def encode_into(self, payload, row):
+        """
+        Write one payload into a preallocated 1-D buffer of length n_features.
+        Returns the numeric columns whose value is not a number (those hold
+        their default); empty when the payload is valid.
+        """
+        # Fill a plain list and copy it in once: per-element numpy writes cost more than the loop itself.
+        values = self._default_values.copy()
+        invalid = []
+        get = payload.get
+        for col, idx in self.numeric:
+            raw = get(col)
+            if raw is not None and raw != '':
+                try:
+                    values[idx] = float(raw)
+                except (TypeError, ValueError):
+                    invalid.append(col)
+        for col, idx, codes in self.categorical:
+            raw = get(col)
+            if raw is not None:
+                values[idx] = codes.get(str(raw).strip(), 0)
+        row[:] = values
+        return invalid
+
+    @staticmethod
+    def _invalid_message(invalid):
+        return f"Not a number: {', '.join(invalid)}."
+
+    def encode(self, payload):
+        """Encode one payload as a (1, n_features) matrix; numeric fields that are not a number hold their default."""
+        X = np.empty((1, self.n_features), dtype=self.dtype)
+        self.encode_into(payload, X[0])
+        return X
+
+    def encode_batch(self, payloads):
+        """
+        Encode many payloads into one (N, n_features) matrix. Returns (X, errors)
+        where errors maps row index -> message (not an object, or a numeric field
+        that is not a number); those rows must be ignored by the caller.
+        """
+        X = np.empty((len(payloads), self.n_features), dtype=self.dtype)
+        errors = {}
+        for i, payload in enumerate(payloads):
+            if not isinstance(payload, Mapping):
+                X[i] = self.defaults
+                errors[i] = 'Row must be a JSON object with feature keys.'
+                continue
+            invalid = self.encode_into(payload, X[i])
+            if invalid:
+                errors[i] = self._invalid_message(invalid)
+        return X, errors
+
+
+# (key in _models, artifact file) in load order
+_ARTIFACTS = (
+    ('feature_cols', 'feature_columns.pkl'),
+    ('scaler', 'scaler.pkl'),
+    ('label_encoder', 'label_encoder.pkl'),
+    ('classifier', 'loan_default_classifier.pkl'),
+    ('risk_regressor', 'risk_score_regressor.pkl'),
+    ('amount_regressor', 'loan_amount_regressor.pkl'),
+)
+
+# 'joblib' unpickles the scikit-learn / XGBoost estimators; 'numpy' loads the arrays written by
+# `manage.py export_tree_models` and predicts with api.tree_engine (no sklearn/xgboost import).
+ML_INFERENCE_ENGINE = getattr(settings, 'ML_INFERENCE_ENGINE', 'joblib')
+COMPILED_MODELS_FILE = 'compiled_models.joblib'
+
+
+def _artifact_files():
+    if ML_INFERENCE_ENGINE == 'numpy':
+        return (('compiled_models', COMPILED_MODELS_FILE),)
+    return _ARTIFACTS
+
+
+# numpy engine: batches of at least this many rows are scored by the XGBoost estimators instead
+# (0 = never). They are loaded from the .pkl files next to the compiled arrays on the first such
+# batch; when those files or xgboost are missing the NumPy traversal scores every batch.
+ML_NUMPY_BATCH_MIN_ROWS = getattr(settings, 'ML_NUMPY_BATCH_MIN_ROWS', 64)
+_BATCH_ESTIMATORS = ('classifier', 'risk_regressor', 'amount_regressor')
+_batch_estimator_lock = threading.Lock()
+
+
+def _batch_estimators(models, n_rows):
+    """XGBoost estimators for an n_rows batch under the numpy engine, or None to use the forest."""
+    if 'forest' not in models or ML_NUMPY_BATCH_MIN_ROWS <= 0 or n_rows < ML_NUMPY_BATCH_MIN_ROWS:
+        return None
+    if 'batch_estimators' not in models:
+        with _batch_estimator_lock:
+            if 'batch_estimators' not in models:
+                files = dict(_ARTIFACTS)
+                try:
+                    estimators = {
+                        key: joblib.load(models['models_dir'] / files[key], mmap_mode=ML_MMAP_MODE)
+                        for key in _BATCH_ESTIMATORS
+                    }
+                except (OSError, ImportError) as e:
+                    logger.warning("Batch estimators unavailable, scoring batches with NumPy: %s", e)
+                    estimators = None
+                models['batch_estimators'] = estimators
+    return models['batch_estimators']
+
+
+def _from_compiled(compiled):
+    """_models entries for the numpy engine, from the export_tree_models output."""
+    forest = tree_engine.CompiledForest(compiled)
+    feature_cols = list(compiled['feature_cols'])
+    amount_cols = np.array([i for i, c in enumerate(feature_cols) if c != 'LoanAmount'], dtype=np.intp)
+    return {
+        'feature_cols': feature_cols,
+        'scaler': tree_engine.NumpyScaler(compiled['scaler_mean'], compiled['scaler_scale']),
+        'classifier': tree_engine.CompiledModel(forest, 'classifier'),
+        'risk_regressor': tree_engine.CompiledModel(forest, 'risk_regressor'),
+        'amount_regressor': tree_engine.CompiledModel(forest, 'amount_regressor', input_columns=amount_cols),
+        'forest': forest,
+    }
+
+
+# 'float32' halves the memory of encoded / scaled matrices. The scaler arithmetic still runs in
+# float64 (block by block) because the tree splits sit exactly on scaled training values.
+# Enabled only if float32_parity() passes when the artifacts load.
+ML_INFERENCE_DTYPE = getattr(settings, 'ML_INFERENCE_DTYPE', 'float64')
+ML_FLOAT32_MAX_RISK_DEVIATION = getattr(settings, 'ML_FLOAT32_MAX_RISK_DEVIATION', 0.1)
+ML_FLOAT32_MAX_FLIP_RATE = getattr(settings, 'ML_FLOAT32_MAX_FLIP_RATE', 0.001)
+ML_FLOAT32_CHECK_ROWS = getattr(settings, 'ML_FLOAT32_CHECK_ROWS', 2000)
+_SCALE_BLOCK_ROWS = 4096
+
+
+def _scale(models, X):
+    """Scaler transform; float32 input gives float32 output, computed in float64 per block."""
+    if X.dtype != np.float32:
+        return models['scaler'].transform(X)
+    out = np.empty(X.shape, dtype=np.float32)
+    for start in range(0, X.shape[0], _SCALE_BLOCK_ROWS):
+        block = X[start:start + _SCALE_BLOCK_ROWS]
+        out[start:start + _SCALE_BLOCK_ROWS] = models['scaler'].transform(block.astype(np.float64))
+    return out
+
+
+def float32_parity(models, rows=None, seed=11):
+    """
+    Compare float32 and float64 scoring of the same rows (synthetic_payloads
+    by default). Returns max risk-score deviation, max relative amount
+    deviation, eligibility flips / flip rate and 'ok' against the
+    ML_FLOAT32_* thresholds.
+    """
+    payloads = rows if rows is not None else synthetic_payloads(ML_FLOAT32_CHECK_ROWS, seed=seed)
+    X64, errors = _FeatureEncoder(models['feature_cols']).encode_batch(payloads)
+    valid = [i for i in range(len(payloads)) if i not in errors]
+    X64 = X64[valid]
+    a64, r64, m64 = _predict_all(models, models['scaler'].transform(X64))
+    a32, r32, m32 = _predict_all(models, _scale(models, X64.astype(np.float32)))
+    n = len(X64)
+    flips = int(np.sum(a64 != a32))
+    risk_dev = float(np.max(np.abs(r64 - r32))) if n else 0.0
+    amount_dev = float(np.max(np.abs(m64 - m32) / np.maximum(np.abs(m64), 1.0))) if n else 0.0
+    flip_rate = flips / n if n else 0.0
+    return {
+        'rows': n,
+        'max_risk_deviation': risk_dev,
+        'max_amount_rel_deviation': amount_dev,
+        'eligibility_flips': flips,
+        'flip_rate': flip_rate,
+        'max_risk_deviation_allowed': ML_FLOAT32_MAX_RISK_DEVIATION,
+        'max_flip_rate_allowed': ML_FLOAT32_MAX_FLIP_RATE,
+        'ok': risk_dev <= ML_FLOAT32_MAX_RISK_DEVIATION and flip_rate <= ML_FLOAT32_MAX_FLIP_RATE,
+    }
+
+
+# Cache of single-payload predictions, keyed on (hash of encoded vector, model version, output).
+# Shared by predict_eligibility / predict_risk / recommend_amount / assess.
+_prediction_cache = LRUCache(
+    maxsize=getattr(settings, 'ML_PREDICTION_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'ML_PREDICTION_CACHE_TTL', None),
+)
+
+# joblib mmap mode for artifact arrays: 'r' lets forked workers share the pages.
+ML_MMAP_MODE = getattr(settings, 'ML_MMAP_MODE', 'r') or None
+# How often (seconds) a worker re-reads the registry's ACTIVE pointer; 0 disables hot reload.
+ML_REGISTRY_POLL_SECONDS = getattr(settings, 'ML_REGISTRY_POLL_SECONDS', 5)
+
+_load_lock = threading.Lock()
+_next_registry_check = 0.0
+# Per-artifact load state and timings of the served artifacts, reported by readiness().
+# 'last_failed_load' records the latest version that failed to load, which may be a
+# hot reload while the previous artifacts keep serving.
+_load_status = {
+    'models': {}, 'load_seconds': None, 'warmup_seconds': None, 'warmed': False, 'error': None, 'source': None,
+    'last_failed_load': None,
+}
+
+
+def _resolve_source():
+    """(models_dir, registry version or None): the active registry version, else MODELS_DIR."""
+    version = model_registry.active_version()
+    if version:
+        return model_registry.version_dir(version), version
+    return MODELS_DIR, None
+
+
+def _load_from(models_dir, registry_version):
+    """Load one complete artifact set into a new dict (does not touch _models)."""
+    if not models_dir.exists():
+        raise FileNotFoundError(f"Models directory not found: {models_dir}")
+    if registry_version:
+        problems = model_registry.verify(registry_version)
+        if problems:
+            raise model_registry.RegistryError(f"Model version {registry_version} is corrupt: " + '; '.join(problems))
+    status = {}
+    loaded = {}
+    for key, filename in _artifact_files():
+        t0 = time.perf_counter()
+        try:
+            loaded[key] = joblib.load(models_dir / filename, mmap_mode=ML_MMAP_MODE)
+        except Exception:
+            logger.error("Could not load %s from %s", filename, models_dir)
+            raise
+        status[key] = {'loaded': True, 'seconds': round(time.perf_counter() - t0, 4)}
+    if 'compiled_models' in loaded:
+        loaded.update(_from_compiled(loaded.pop('compiled_models')))
+        loaded['models_dir'] = models_dir
+    loaded['encoder'] = _FeatureEncoder(loaded['feature_cols'])
+    loaded['version'] = registry_version or _artifacts_version(models_dir)
+    loaded['dtype'] = 'float64'
+    if ML_INFERENCE_DTYPE == 'float32':
+        parity = loaded['float32_parity'] = float32_parity(loaded)
+        if parity['ok']:
+            loaded['encoder'] = _FeatureEncoder(loaded['feature_cols'], dtype=np.float32)
+            loaded['dtype'] = 'float32'
+        else:
+            logger.warning(
+                "float32 inference refused for %s (max risk deviation %.4g, flip rate %.4g); using float64",
+                loaded['version'], parity['max_risk_deviation'], parity['flip_rate'],
+            )
+    return loaded, status
+
+
+def _swap_in(models_dir, registry_version):
+    """
+    Load a version and make it current. Caller holds _load_lock. _load_status
+    describes the served artifacts, so it only changes once the swap is done;
+    a failure is recorded in 'last_failed_load' (and in 'error' when nothing
+    is served yet).
+    """
+    global _models
+    start = time.perf_counter()
     try:
-        return options.index(val_str)
-    except ValueError:
-        return 0
+        loaded, status = _load_from(models_dir, registry_version)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        _load_status['last_failed_load'] = {'version': registry_version, 'source': str(models_dir), 'error': error}
+        if not _models:
+            _load_status['error'] = error
+        raise
+    # Publish by rebinding so other threads never see a half-filled dict
+    _models = loaded
+    _prediction_cache.clear()
+    _load_status.update({
+        'models': status,
+        'load_seconds': round(time.perf_counter() - start, 4),
+        'error': None,
+        'source': str(models_dir),
+    })
+    logger.info("ML artifacts %s loaded from %s in %.2fs", loaded['version'], models_dir, _load_status['load_seconds'])
+    return loaded
 
 
-def _payload_to_vector(payload, include_loan_amount=True):
-    """Build feature vector in feature_cols order. If include_loan_amount=False, exclude LoanAmount."""
+def _maybe_switch_version(models):
+    """Hot reload: if ACTIVE names another version, load it in this thread while others keep serving."""
+    global _next_registry_check
+    _next_registry_check = time.monotonic() + ML_REGISTRY_POLL_SECONDS
+    try:
+        models_dir, version = _resolve_source()
+    except model_registry.RegistryError:
+        logger.exception("Invalid ACTIVE model version; keeping %s", models['version'])
+        return models
+    if version is None or version == models['version']:
+        return models
+    if not _load_lock.acquire(blocking=False):
+        # Another thread is already switching
+        return models
+    try:
+        if _models is not models:
+            return _models
+        return _swap_in(models_dir, version)
+    except Exception:
+        logger.exception("Failed to load model version %s; keeping %s", version, models['version'])
+        return models
+    finally:
+        _load_lock.release()
+
+
+def _load_artifacts():
+    """Return the current artifact dict, loading it on first use (and switching on registry changes)."""
+    models = _models
+    if models:
+        if ML_REGISTRY_POLL_SECONDS and time.monotonic() >= _next_registry_check:
+            models = _maybe_switch_version(models)
+        return models
+    with _load_lock:
+        # Another thread may have finished loading while we waited
+        if _models:
+            return _models
+        models_dir, version = _resolve_source()
+        return _swap_in(models_dir, version)
+
+
+def _artifacts_version(models_dir):
+    """Short content hash of the artifact files (for unversioned MODELS_DIR loads)."""
+    digest = hashlib.sha256()
+    for _, filename in _artifact_files():
+        digest.update((models_dir / filename).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def model_version():
+    """Identifier of the currently served artifacts: registry version name, or content hash of MODELS_DIR."""
+    return _load_artifacts()['version']
+
+
+def reload_artifacts():
+    """Load the active version again now; cached predictions are invalidated."""
+    with _load_lock:
+        models_dir, version = _resolve_source()
+        loaded = _swap_in(models_dir, version)
+        _load_status.update({'warmup_seconds': None, 'warmed': False})
+        return loaded
+
+
+def prediction_cache_stats():
+    """Hit/miss counters and size of the prediction cache."""
+    return _prediction_cache.stats()
+
+
+def warm_up():
+    """
+    Load the artifacts and run one dummy prediction through every model, so the
+    first real request does not pay for loading or first-call initialisation.
+    """
     _load_artifacts()
-    feature_cols = _models['feature_cols']
-    vec = []
-    for col in feature_cols:
-        if col == 'LoanAmount' and not include_loan_amount:
-            continue
-        if col in CATEGORICAL_OPTIONS:
-            raw = payload.get(col, list(CATEGORICAL_OPTIONS[col])[0])
-            vec.append(_encode_categorical(col, raw))
+    start = time.perf_counter()
+    assess(dict(DEFAULT_NUMERIC))
+    score_batch([dict(DEFAULT_NUMERIC), dict(DEFAULT_NUMERIC)])
+    _load_status['warmup_seconds'] = round(time.perf_counter() - start, 4)
+    _load_status['warmed'] = True
+    logger.info("ML models warmed up in %.3fs", _load_status['warmup_seconds'])
+
+
+def readiness():
+    """Load/warm-up state for the health endpoint. 'ready' is True once every artifact is loaded."""
+    models = {
+        key: _load_status['models'].get(key, {'loaded': False, 'seconds': None})
+        for key, _ in _artifact_files()
+    }
+    return {
+        'ready': bool(_models) and all(m['loaded'] for m in models.values()),
+        'model_version': _models.get('version'),
+        'active_version': model_registry.active_version(),
+        'engine': ML_INFERENCE_ENGINE,
+        'dtype': _models.get('dtype'),
+        'float32_parity': _models.get('float32_parity'),
+        'source': _load_status['source'],
+        'warmed': _load_status['warmed'],
+        'models': models,
+        'load_seconds': _load_status['load_seconds'],
+        'warmup_seconds': _load_status['warmup_seconds'],
+        'error': _load_status['error'],
+        'last_failed_load': _load_status['last_failed_load'],
+    }
+
+
+def _payload_to_vector(payload, include_loan_amount=True, models=None):
+    """Build feature vector in feature_cols order. If include_loan_amount=False, exclude LoanAmount."""
+    models = models or _load_artifacts()
+    X = models['encoder'].encode(payload)
+    if not include_loan_amount:
+        return X[:, models['encoder'].amount_columns]
+    return X
+
+
+def _payloads_to_matrix(payloads, models=None):
+    """
+    Stack payloads into one (N, n_features) matrix in feature_cols order.
+    Returns (X, errors) where errors maps row index -> message; rows with an
+    error hold the defaults and must be ignored by the caller.
+    """
+    models = models or _load_artifacts()
+    return models['encoder'].encode_batch(payloads)
+
+
+def synthetic_payloads(n, seed=0):
+    """
+    n random but plausible payloads around DEFAULT_NUMERIC / CATEGORICAL_OPTIONS,
+    for benchmarks and parity checks. About 1 in 10 fields is left out so the
+    default-filling path is exercised too.
+    """
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(n):
+        payload = {}
+        for col, default in DEFAULT_NUMERIC.items():
+            if rng.random() < 0.1:
+                continue
+            value = default * rng.uniform(0.4, 1.6)
+            payload[col] = round(value) if isinstance(default, int) else value
+        for col, options in CATEGORICAL_OPTIONS.items():
+            if rng.random() < 0.1:
+                continue
+            payload[col] = rng.choice(options)
+        payloads.append(payload)
+    return payloads
+
+
+def _checked_matrix(payloads, models):
+    X, errors = _payloads_to_matrix(payloads, models)
+    if errors:
+        i = min(errors)
+        raise TypeError(f"Row {i}: {errors[i]}")
+    return X
+
+
+def _estimators(models, n_rows):
+    """Estimators (classifier, risk_regressor, amount_regressor) to score n_rows rows with."""
+    return _batch_estimators(models, n_rows) or models
+
+
+def predict_eligibility_batch(payloads):
+    """Model 1 on many payloads at once. Returns a bool array (True = Approved)."""
+    models = _load_artifacts()
+    X_scaled = _scale(models, _checked_matrix(payloads, models))
+    return np.asarray(_estimators(models, len(X_scaled))['classifier'].predict(X_scaled)).astype(int) == 1
+
+
+def predict_risk_batch(payloads):
+    """Model 2 on many payloads at once. Returns a float array of risk scores."""
+    models = _load_artifacts()
+    X_scaled = _scale(models, _checked_matrix(payloads, models))
+    return np.asarray(_estimators(models, len(X_scaled))['risk_regressor'].predict(X_scaled), dtype=np.float64)
+
+
+def recommend_amount_batch(payloads):
+    """Model 3 on many payloads at once. Returns a float array of amounts."""
+    models = _load_artifacts()
+    X_scaled = _scale(models, _checked_matrix(payloads, models))
+    estimator = _estimators(models, len(X_scaled))['amount_regressor']
+    return np.asarray(estimator.predict(X_scaled[:, models['encoder'].amount_columns]), dtype=np.float64)
+
+
+def _predict_all(models, X_scaled):
+    """Run the three models on an already-scaled matrix. Returns (approved, risk, amount) arrays."""
+    estimators = _batch_estimators(models, len(X_scaled))
+    if estimators is None:
+        if 'forest' in models:
+            # numpy engine: one traversal covers all three models
+            return models['forest'].predict_all(X_scaled)
+        estimators = models
+    approved = np.asarray(estimators['classifier'].predict(X_scaled)).astype(int) == 1
+    risk = np.asarray(estimators['risk_regressor'].predict(X_scaled), dtype=np.float64)
+    amount = np.asarray(estimators['amount_regressor'].predict(X_scaled[:, models['encoder'].amount_columns]), dtype=np.float64)
+    return approved, risk, amount
+
+
+def assess(payload):
+    """
+    All three models for one payload with a single vector build and scaler
+    transform. Returns {'approved', 'risk_score', 'recommended_amount',
+    'model_version'} with the raw (uncapped, USD-scale) amount; callers apply
+    the DTI cap.
+    """
+    return predict(payload, ('approved', 'risk_score', 'recommended_amount'))
+
+
+def score_batch(payloads):
+    """
+    Run all three models over a list of payloads with one scaler transform and
+    one call per model. Returns one dict per input row, either
+    {'approved', 'risk_score', 'recommended_amount', 'model_version'} or
+    {'error': message}; a bad row never fails the rest of the batch.
+    """
+    models = _load_artifacts()
+    X, errors = _payloads_to_matrix(payloads, models)
+    valid = [i for i in range(len(payloads)) if i not in errors]
+    results = [{'error': errors[i]} if i in errors else None for i in range(len(payloads))]
+    if not valid:
+        return results
+    approved, risk, amount = _predict_all(models, _scale(models, X[valid]))
+    for j, i in enumerate(valid):
+        results[i] = {
+            'approved': bool(approved[j]),
+            'risk_score': float(risk[j]),
+            'recommended_amount': float(amount[j]),
+            'model_version': models['version'],
+        }
+    return results
+
+
+def sweep_loan_terms(profile, amounts_rwf, durations):
+    """
+    What-if grid: score every (loan amount, duration) combination for one
+    applicant in a single batched model call.
+
+    profile: build_ml_payload() arguments other than loan_amount_rwf /
+    loan_duration_months (RWF income, age, credit score, categoricals).
+    The profile row is encoded once; only the amount/duration-dependent
+    columns are filled per candidate, with the same ratio logic as
+    build_ml_payload().
+
+    Returns {'amounts', 'durations', 'approved' and 'risk_score' as
+    [duration][amount] grids, 'max_affordable_amount' per duration (MAX_DTI
+    cap, RWF), 'frontier' (largest approved and affordable amount per
+    duration), 'best', 'model_version'}.
+    """
+    models = _load_artifacts()
+    amounts = np.unique(np.asarray(amounts_rwf, dtype=np.float64))
+    durations = np.unique(np.asarray(durations, dtype=np.int64))
+    base, income_usd_raw, _, monthly_income_usd = build_ml_payload(
+        loan_amount_rwf=amounts[0], loan_duration_months=durations[0], **profile,
+    )
+    grid_d, grid_a = np.meshgrid(durations, amounts, indexing='ij')
+    terms = _loan_term_features(
+        grid_a.ravel() / RWF_TO_USD, grid_d.ravel().astype(np.float64),
+        income_usd_raw, _income_scale(income_usd_raw),
+    )
+    X = np.tile(models['encoder'].encode(base), (grid_a.size, 1))
+    column = {c: i for i, c in enumerate(models['feature_cols'])}
+    for name, values in terms.items():
+        if name in column:
+            X[:, column[name]] = values
+    approved, risk, _ = _predict_all(models, _scale(models, X))
+    approved = approved.reshape(grid_a.shape)
+    risk = risk.reshape(grid_a.shape)
+
+    caps = monthly_income_usd * MAX_DTI * durations * RWF_TO_USD
+    frontier = []
+    for i, duration in enumerate(durations):
+        ok = np.flatnonzero(approved[i] & (amounts <= caps[i]))
+        j = ok[-1] if len(ok) else None
+        frontier.append({
+            'loan_duration_months': int(duration),
+            'max_approved_amount': float(amounts[j]) if j is not None else None,
+            'risk_score': float(risk[i, j]) if j is not None else None,
+            'max_affordable_amount': float(caps[i]),
+            'approved_count': int(approved[i].sum()),
+        })
+    candidates = [f for f in frontier if f['max_approved_amount'] is not None]
+    best = max(candidates, key=lambda f: (f['max_approved_amount'], -f['risk_score'])) if candidates else None
+    return {
+        'amounts': amounts.tolist(),
+        'durations': durations.tolist(),
+        'approved': approved.tolist(),
+        'risk_score': risk.tolist(),
+        'max_affordable_amount': caps.tolist(),
+        'frontier': frontier,
+        'best': best,
+        'model_version': models['version'],
+    }
+
+
+# Output name -> function of (models, scaled (1, n_features) row)
+_PREDICTORS = {
+    # label_encoder: typically 0=Denied, 1=Approved
+    'approved': lambda models, X_scaled: int(models['classifier'].predict(X_scaled)[0]) == 1,
+    'risk_score': lambda models, X_scaled: float(models['risk_regressor'].predict(X_scaled)[0]),
+    'recommended_amount': lambda models, X_scaled: float(
+        models['amount_regressor'].predict(X_scaled[:, models['encoder'].amount_columns])[0]
+    ),
+}
+
+
+# Output name -> function of (models, scaled (N, n_features) matrix) returning N values
+_BATCH_PREDICTORS = {
+    'approved': lambda models, X_scaled: np.asarray(models['classifier'].predict(X_scaled)).astype(int) == 1,
+    'risk_score': lambda models, X_scaled: np.asarray(models['risk_regressor'].predict(X_scaled), dtype=np.float64),
+    'recommended_amount': lambda models, X_scaled: np.asarray(
+        models['amount_regressor'].predict(X_scaled[:, models['encoder'].amount_columns]), dtype=np.float64,
+    ),
+}
+_OUTPUT_TYPES = {'approved': bool, 'risk_score': float, 'recommended_amount': float}
+
+
+def _run_microbatch(items):
+    """
+    MicroBatcher callback. items: (models, (1, n_features) row, output names).
+    Rows scored by the same model set are stacked, scaled once and run through
+    each needed model once.
+    """
+    results = [None] * len(items)
+    groups = {}
+    for i, (models, _, _) in enumerate(items):
+        groups.setdefault(id(models), []).append(i)
+    for indices in groups.values():
+        models = items[indices[0]][0]
+        X_scaled = _scale(models, np.vstack([items[i][1] for i in indices]))
+        names = set().union(*(items[i][2] for i in indices))
+        if 'forest' in models:
+            columns = dict(zip(('approved', 'risk_score', 'recommended_amount'), _predict_all(models, X_scaled)))
+        else:
+            columns = {name: _BATCH_PREDICTORS[name](models, X_scaled) for name in names}
+        for j, i in enumerate(indices):
+            results[i] = {name: _OUTPUT_TYPES[name](columns[name][j]) for name in items[i][2]}
+    return results
+
+
+# Opt-in (ML_MICROBATCH=1): concurrent single-payload cache misses are queued for up to
+# ML_MICROBATCH_WINDOW_MS and scored together as one matrix.
+_batcher = MicroBatcher(
+    _run_microbatch,
+    window_ms=getattr(settings, 'ML_MICROBATCH_WINDOW_MS', 3),
+    max_batch=getattr(settings, 'ML_MICROBATCH_MAX_SIZE', 64),
+    name='ml-microbatch',
+) if getattr(settings, 'ML_MICROBATCH', False) else None
+
+
+def microbatch_stats():
+    """Batch-size and queue-wait metrics of the micro-batcher, or None when it is disabled."""
+    return _batcher.stats() if _batcher is not None else None
+
+
+def predict(payload, outputs):
+    """
+    Predict the named outputs ('approved', 'risk_score', 'recommended_amount')
+    for one payload. Returns a dict of those outputs plus 'model_version'.
+    Each output is served from the prediction cache when the same encoded
+    vector was scored by the same model version; the scaler runs at most once,
+    and only when something was not cached. With the micro-batcher enabled the
+    uncached outputs are scored together with other threads' concurrent calls.
+    """
+    models = _load_artifacts()
+    X = _payload_to_vector(payload, include_loan_amount=True, models=models)
+    vector_key = (hashlib.blake2b(X.tobytes(), digest_size=16).digest(), models['version'])
+    result = {}
+    missing = []
+    for name in outputs:
+        value = _prediction_cache.get(vector_key + (name,))
+        if value is None:
+            missing.append(name)
         else:
-            raw = payload.get(col, DEFAULT_NUMERIC.get(col, 0))
-            try:
-                vec.append(float(raw))
-            except (TypeError, ValueError):
-                vec.append(DEFAULT_NUMERIC.get(col, 0))
-    return np.array(vec, dtype=np.float64).reshape(1, -1)
+            result[name] = value
+    if missing:
+        if _batcher is not None:
+            result.update(_batcher((models, X, tuple(missing))))
+        else:
+            X_scaled = _scale(models, X)
+            for name in missing:
+                result[name] = _PREDICTORS[name](models, X_scaled)
+        for name in missing:
+            _prediction_cache.set(vector_key + (name,), result[name])
+    result['model_version'] = models['version']
+    return result
 
 
 def predict_eligibility(payload):
     """Model 1: loan approval (0 = Denied, 1 = Approved)."""
-    _load_artifacts()
-    X = _payload_to_vector(payload, include_loan_amount=True)
-    X_scaled = _models['scaler'].transform(X)
-    pred = _models['classifier'].predict(X_scaled)[0]
-    # label_encoder: typically 0=Denied, 1=Approved
-    return int(pred) == 1
+    return predict(payload, ('approved',))['approved']
 
 
 def predict_risk(payload):
     """Model 2: default risk score."""
-    _load_artifacts()
-    X = _payload_to_vector(payload, include_loan_amount=True)
-    X_scaled = _models['scaler'].transform(X)
-    score = _models['risk_regressor'].predict(X_scaled)[0]
-    return float(score)
+    return predict(payload, ('risk_score',))['risk_score']
 
 
 def recommend_amount(payload):
     """Model 3: recommended loan amount (trained on approved-only, 32 features)."""
-    _load_artifacts()
-    X = _payload_to_vector(payload, include_loan_amount=True)  # 33 cols
-    X_scaled = _models['scaler'].transform(X)
-    feature_cols = _models['feature_cols']
-    idx_no_loan = [i for i, c in enumerate(feature_cols) if c != 'LoanAmount']
-    X_amt = X_scaled[:, idx_no_loan]
-    amount = _models['amount_regressor'].predict(X_amt)[0]
-    return float(amount)
+    return predict(payload, ('recommended_amount',))['recommended_amount']
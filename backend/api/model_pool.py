@@ -0,0 +1,124 @@
+"""
+Memory-capped pool of loaded models with least-recently-used eviction.
+
+Used for the MarianMT translation pairs: each worker used to keep every pair
+it had ever loaded next to T5. A pool holds models up to a budget of
+parameter bytes (weights, buffers and int8 packed weights, as counted by
+model_bytes()); loading one more evicts the pairs used longest ago, and an
+evicted pair is reloaded on its next use. The most recently loaded model is
+never evicted, so a budget smaller than one model still works (one at a time).
+Evicted models are freed once requests still using them finish.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+
+
+def _tensors(value):
+    if hasattr(value, 'element_size') and hasattr(value, 'numel'):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        # Packed int8 Linear weights are stored as a (weight, bias) tuple
+        for item in value:
+            yield from _tensors(item)
+
+
+def model_bytes(model):
+    """Bytes of a torch module's state (parameters, buffers, quantized packed weights); tied weights count once."""
+    seen = set()
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in _tensors(value):
+            try:
+                ptr = tensor.data_ptr()
+            except (RuntimeError, NotImplementedError):
+                ptr = id(tensor)
+            if ptr not in seen:
+                seen.add(ptr)
+                total += tensor.element_size() * tensor.numel()
+    return total
+
+
+class ModelPool:
+    """
+    get(key, loader) returns the pooled value for key, calling loader() on a
+    miss. size(value) gives its bytes. budget_bytes <= 0 means no cap.
+    """
+
+    def __init__(self, name, budget_bytes=0, size=model_bytes):
+        self.name = name
+        self.budget_bytes = int(budget_bytes or 0)
+        self._size = size
+        self._entries = OrderedDict()  # key -> (value, bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._evicted = set()
+        self.hits = 0
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+        _pools[name] = self
+
+    def get(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # One load per key at a time; other keys keep loading / serving
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+            value = loader()
+            nbytes = self._size(value)
+            with self._lock:
+                self.loads += 1
+                if key in self._evicted:
+                    self.reloads += 1
+                    self._evicted.discard(key)
+                self._entries[key] = (value, nbytes)
+                self._evict()
+        return value
+
+    def _evict(self):
+        """Drop least recently used entries until within budget (caller holds the lock)."""
+        if self.budget_bytes <= 0:
+            return
+        while len(self._entries) > 1 and self._total() > self.budget_bytes:
+            key, (_, nbytes) = self._entries.popitem(last=False)
+            self._evicted.add(key)
+            self.evictions += 1
+            logger.info(
+                "Model pool %s: evicted %s (%.0f MB) to stay within %.0f MB",
+                self.name, key, nbytes / 2**20, self.budget_bytes / 2**20,
+            )
+
+    def _total(self):
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget_mb': round(self.budget_bytes / 2**20, 1) if self.budget_bytes > 0 else None,
+                'size_mb': round(self._total() / 2**20, 1),
+                'models': {str(key): round(nbytes / 2**20, 1) for key, (_, nbytes) in self._entries.items()},
+                'hits': self.hits,
+                'loads': self.loads,
+                'reloads': self.reloads,
+                'evictions': self.evictions,
+            }
+
+
+def stats():
+    """Stats of every pool in this process by name, or None when none was created."""
+    return {name: pool.stats() for name, pool in _pools.items()} or None
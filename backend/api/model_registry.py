@@ -0,0 +1,147 @@
+"""
+Versioned registry for the loan ML artifacts.
+
+    <ML_REGISTRY_DIR>/
+        versions/<version>/    artifact files + manifest.json (checksums, feature columns, created_at)
+        ACTIVE                 name of the version workers should serve
+
+Versions are immutable once published. activate() swaps ACTIVE atomically
+(write + os.replace); ml_service polls it and switches workers to the new
+version without a restart.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+REGISTRY_DIR = Path(
+    getattr(settings, 'ML_REGISTRY_DIR', None)
+    or Path(__file__).resolve().parent.parent.parent / 'model_registry'
+)
+MANIFEST_FILE = 'manifest.json'
+ACTIVE_FILE = 'ACTIVE'
+
+_VERSION_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+class RegistryError(Exception):
+    """Invalid version name, missing version, or checksum mismatch."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def version_dir(version):
+    if not version or not _VERSION_RE.match(version):
+        raise RegistryError(f"Invalid model version name: {version!r}")
+    return REGISTRY_DIR / 'versions' / version
+
+
+def read_manifest(version):
+    path = version_dir(version) / MANIFEST_FILE
+    if not path.exists():
+        raise RegistryError(f"Model version not found: {version}")
+    return json.loads(path.read_text())
+
+
+def list_versions():
+    """Manifests of all published versions, oldest first."""
+    root = REGISTRY_DIR / 'versions'
+    if not root.exists():
+        return []
+    manifests = []
+    for path in root.iterdir():
+        if (path / MANIFEST_FILE).exists():
+            manifests.append(json.loads((path / MANIFEST_FILE).read_text()))
+    return sorted(manifests, key=lambda m: m.get('created_at', ''))
+
+
+def active_version():
+    """Name of the active version, or None when nothing has been activated."""
+    try:
+        version = (REGISTRY_DIR / ACTIVE_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def verify(version):
+    """List of problems with a version's files (empty when every checksum matches)."""
+    manifest = read_manifest(version)
+    folder = version_dir(version)
+    problems = []
+    for filename, expected in manifest['files'].items():
+        path = folder / filename
+        if not path.exists():
+            problems.append(f"{filename}: missing")
+        elif _sha256(path) != expected:
+            problems.append(f"{filename}: checksum mismatch")
+    return problems
+
+
+def publish(source_dir, filenames, version=None, feature_columns=None, note=''):
+    """
+    Copy artifact files from source_dir into a new immutable version and write
+    its manifest. Returns the manifest. The version directory appears atomically.
+    """
+    source_dir = Path(source_dir)
+    files = {}
+    for filename in filenames:
+        if not (source_dir / filename).exists():
+            raise RegistryError(f"Artifact not found: {source_dir / filename}")
+        files[filename] = _sha256(source_dir / filename)
+    if version is None:
+        combined = hashlib.sha256(''.join(files[f] for f in sorted(files)).encode()).hexdigest()
+        version = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S') + '-' + combined[:8]
+    target = version_dir(version)
+    if target.exists():
+        raise RegistryError(f"Model version already exists: {version}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f'.{version}-', dir=target.parent))
+    try:
+        for filename in files:
+            shutil.copy2(source_dir / filename, staging / filename)
+        manifest = {
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'source': str(source_dir),
+            'feature_columns': list(feature_columns or []),
+            'files': files,
+            'note': note,
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        os.rename(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def activate(version):
+    """Point ACTIVE at version (after verifying its checksums). Workers pick it up on their next poll."""
+    problems = verify(version)
+    if problems:
+        raise RegistryError(f"Refusing to activate {version}: " + '; '.join(problems))
+    REGISTRY_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix='.ACTIVE-', dir=REGISTRY_DIR)
+    try:
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(version + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, REGISTRY_DIR / ACTIVE_FILE)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
@@ -0,0 +1,311 @@
+"""
+Local model server for the chatbot (T5) and translation (MarianMT) models.
+
+`manage.py run_model_server` starts one process that owns the models and
+listens on a Unix domain socket. With MODEL_SERVER_SOCKET set, web workers
+send chat generation and translation requests there instead of loading the
+models themselves; without it, everything runs in-process as before.
+
+Protocol: each message is a 4-byte big-endian length followed by that many
+bytes of UTF-8 JSON. Request {"op", "args", "timeout"}; response
+{"ok": true, "result"} or {"ok": false, "code": "busy"|"timeout"|"error"|
+"bad_request", "error"}. A connection may carry several requests in turn.
+
+At most `concurrency` requests run at once; up to `max_queue` more wait.
+Beyond that a request is refused with "busy" right away. A request still
+queued after its timeout is dropped unrun.
+"""
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from . import model_pool
+
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_SOCKET = getattr(settings, 'MODEL_SERVER_SOCKET', '')
+MODEL_SERVER_TIMEOUT = getattr(settings, 'MODEL_SERVER_TIMEOUT', 30.0)
+
+_HEADER = struct.Struct('>I')
+MAX_MESSAGE_BYTES = 1 << 20
+# Ops answered directly by the connection thread, never queued
+_CONTROL_OPS = ('ping', 'stats')
+
+# Set by run_model_server: inside the server the services run their models in-process
+_serving = False
+
+
+class ModelServerError(Exception):
+    """The model server answered with an error (code: busy, timeout, error, bad_request)."""
+
+    def __init__(self, message, code='error'):
+        super().__init__(message)
+        self.code = code
+
+
+class ModelServerUnavailable(ModelServerError):
+    """The socket could not be reached, or the connection broke / timed out."""
+
+    def __init__(self, message):
+        super().__init__(message, code='unavailable')
+
+
+def remote_enabled():
+    """True when chat / translation calls should go to the model server."""
+    return bool(MODEL_SERVER_SOCKET) and not _serving
+
+
+def _recv_exact(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 65536))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_message(sock, obj):
+    data = json.dumps(obj).encode('utf-8')
+    if len(data) > MAX_MESSAGE_BYTES:
+        raise ValueError(f"message of {len(data)} bytes exceeds {MAX_MESSAGE_BYTES}")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if length > MAX_MESSAGE_BYTES:
+        raise ValueError(f"message of {length} bytes exceeds {MAX_MESSAGE_BYTES}")
+    return json.loads(_recv_exact(sock, length).decode('utf-8'))
+
+
+class ModelServerClient:
+    """One connection per call (cheap on a Unix socket); safe to share between threads."""
+
+    def __init__(self, socket_path, timeout=MODEL_SERVER_TIMEOUT):
+        self.socket_path = str(socket_path)
+        self.timeout = float(timeout)
+
+    def call(self, op, timeout=None, **args):
+        timeout = self.timeout if timeout is None else float(timeout)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                # The server gives up at `timeout`; allow a little longer for its answer
+                sock.settimeout(timeout + 2.0)
+                sock.connect(self.socket_path)
+                send_message(sock, {'op': op, 'args': args, 'timeout': timeout})
+                response = recv_message(sock)
+        except (OSError, ConnectionError, ValueError) as e:
+            raise ModelServerUnavailable(f"Model server at {self.socket_path}: {e}") from e
+        if not response.get('ok'):
+            raise ModelServerError(response.get('error', 'unknown error'), response.get('code', 'error'))
+        return response.get('result')
+
+
+_client = None
+
+
+def call(op, timeout=None, **args):
+    """Send one request to the configured model server."""
+    global _client
+    if _client is None:
+        _client = ModelServerClient(MODEL_SERVER_SOCKET)
+    return _client.call(op, timeout=timeout, **args)
+
+
+def server_stats():
+    """Stats of the configured model server for /api/health/metrics/; None when not in use."""
+    if not remote_enabled():
+        return None
+    try:
+        return call('stats', timeout=2)
+    except ModelServerError as e:
+        return {'error': str(e), 'code': e.code}
+
+
+class _Expired(Exception):
+    pass
+
+
+class ModelServer:
+    """
+    handlers: {op: callable(args dict) -> JSON-serialisable result}, run on
+    a pool of `concurrency` threads behind a queue of `max_queue` slots.
+    """
+
+    def __init__(self, socket_path, handlers, concurrency=1, max_queue=16):
+        self.socket_path = str(socket_path)
+        self.handlers = dict(handlers)
+        self.concurrency = max(int(concurrency), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self._slots = threading.BoundedSemaphore(self.concurrency + self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='model-server')
+        self._stop = threading.Event()
+        self._sock = None
+        self._lock = threading.Lock()
+        # Accepted requests not finished yet (queued + in flight)
+        self._pending = 0
+        self._in_flight = 0
+        self._counters = {'requests': 0, 'ok': 0, 'busy': 0, 'timeout': 0, 'error': 0}
+        self._seconds = {}
+        self.started_at = time.time()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            # Stale socket from a previous run (bind would fail)
+            os.unlink(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        self._sock.listen(128)
+        logger.info("Model server listening on %s (concurrency %d, queue %d)",
+                    self.socket_path, self.concurrency, self.max_queue)
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except OSError:
+                    if self._stop.is_set():
+                        break
+                    raise
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self._cleanup()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+
+    def _cleanup(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _serve_connection(self, conn):
+        with conn:
+            conn.settimeout(300)
+            while not self._stop.is_set():
+                try:
+                    request = recv_message(conn)
+                except (ConnectionError, OSError):
+                    return
+                except ValueError as e:
+                    send_message(conn, {'ok': False, 'code': 'bad_request', 'error': str(e)})
+                    return
+                try:
+                    send_message(conn, self.dispatch(request))
+                except (ConnectionError, OSError):
+                    return
+
+    def dispatch(self, request):
+        """Run one request dict and return the response dict."""
+        if not isinstance(request, dict):
+            return {'ok': False, 'code': 'bad_request', 'error': 'request must be a JSON object'}
+        op = request.get('op')
+        args = request.get('args') or {}
+        if op == 'ping':
+            return {'ok': True, 'result': {'pid': os.getpid(), 'ops': sorted(self.handlers)}}
+        if op == 'stats':
+            return {'ok': True, 'result': self.stats()}
+        handler = self.handlers.get(op)
+        if handler is None or not isinstance(args, dict):
+            return {'ok': False, 'code': 'bad_request', 'error': f"unknown op {op!r}" if handler is None else 'args must be an object'}
+        try:
+            timeout = float(request.get('timeout') or MODEL_SERVER_TIMEOUT)
+        except (TypeError, ValueError):
+            return {'ok': False, 'code': 'bad_request', 'error': 'timeout must be a number'}
+        deadline = time.monotonic() + timeout
+        self._count('requests')
+        if not self._slots.acquire(blocking=False):
+            self._count('busy')
+            return {'ok': False, 'code': 'busy', 'error': 'model server queue is full'}
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(self._run, op, handler, args, deadline)
+        # The slot is freed when the work really ends (or is cancelled), not when the caller gives up
+        future.add_done_callback(self._release)
+        try:
+            result = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except (FutureTimeout, _Expired):
+            future.cancel()
+            self._count('timeout')
+            return {'ok': False, 'code': 'timeout', 'error': f"no result within {timeout:g}s"}
+        except Exception as e:
+            logger.exception("Model server op %s failed", op)
+            self._count('error')
+            return {'ok': False, 'code': 'error', 'error': f"{type(e).__name__}: {e}"}
+        self._count('ok')
+        return {'ok': True, 'result': result}
+
+    def _run(self, op, handler, args, deadline):
+        if time.monotonic() >= deadline:
+            # Waited in the queue longer than the caller is willing to wait
+            raise _Expired()
+        with self._lock:
+            self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            return handler(args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                total, count = self._seconds.get(op, (0.0, 0))
+                self._seconds[op] = (total + elapsed, count + 1)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'concurrency': self.concurrency,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'queued': self._pending - self._in_flight,
+                **self._counters,
+                'mean_ms': {op: round(total / count * 1000, 2) for op, (total, count) in self._seconds.items() if count},
+                'model_pools': model_pool.stats(),
+            }
+
+
+def default_handlers():
+    """The ops served by run_model_server: T5 generation and MarianMT translation."""
+    from . import chatbot_service, translation_service
+
+    return {
+        'generate': lambda args: chatbot_service.generate_reply(
+            args.get('message'),
+            max_new_tokens=args.get('max_new_tokens'),
+            temperature=args.get('temperature'),
+        ),
+        'translate': lambda args: translation_service.translate(
+            args.get('text', ''), args.get('source', 'en'), args.get('target', 'en'),
+        ),
+        'chatbot_status': lambda args: {
+            'available': chatbot_service.is_available(),
+            'load_error': chatbot_service.get_load_error(),
+            'batching': chatbot_service.batch_stats(),
+        },
+    }
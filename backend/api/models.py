@@ -330,6 +330,8 @@ class LoanApplication(models.Model):
     eligibility_reason = models.TextField(blank=True)
     risk_score = models.FloatField(null=True, blank=True)
     recommended_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    model_version = models.CharField(max_length=64, blank=True)  # ML artifacts that produced the outputs above
+    language = models.CharField(max_length=5, default='en')  # language of eligibility_reason
     # Status and review
     status = models.CharField(max_length=30, choices=LOAN_STATUS_CHOICES, default='pending')
     reviewed_by = models.ForeignKey(
@@ -439,6 +441,8 @@ class ChatInteraction(models.Model):
     message = models.TextField()
     reply = models.TextField()
     language = models.CharField(max_length=5, default='en')
+    source = models.CharField(max_length=10, blank=True)  # model, cache, faq or fallback
+    latency_ms = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -447,3 +451,49 @@ class ChatInteraction(models.Model):
 
     def __str__(self):
         return f"Chat {self.id}"
+
+
+class ChatAnswerCache(models.Model):
+    """
+    Cached chatbot answers (second tier behind the per-worker LRU, see chat_cache.py).
+    One row per normalized question, language and chat model version.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    normalized_question = models.TextField()
+    question = models.TextField()  # first wording seen, for display
+    language = models.CharField(max_length=5, default='en')
+    model_version = models.CharField(max_length=64)
+    reply = models.TextField()
+    reply_en = models.TextField(blank=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_chatanswercache'
+        ordering = ['-hit_count']
+
+    def __str__(self):
+        return f"{self.language}: {self.normalized_question[:50]} ({self.hit_count} hits)"
+
+
+class TranslationCache(models.Model):
+    """
+    Cached MarianMT translations (second tier behind the per-worker LRU, see translation_cache.py).
+    One row per direction (e.g. 'fr-en'), normalized source text and translation model.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    direction = models.CharField(max_length=11)
+    model_name = models.CharField(max_length=200)
+    source_text = models.TextField()
+    translation = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_translationcache'
+        ordering = ['-hit_count']
+
+    def __str__(self):
+        return f"{self.direction}: {self.source_text[:50]} ({self.hit_count} hits)"
@@ -0,0 +1,65 @@
+"""
+Model preloading for forking servers (gunicorn with preload_app, see
+backend/gunicorn.conf.py).
+
+preload_models() runs once in the master after Django is set up: it loads the
+ML artifacts (memory-mapped), the chatbot tokenizer and the MarianMT
+translation models, then freezes the garbage collector so the loaded objects
+are never touched by collections in the workers and their pages stay shared.
+after_fork() runs in every worker and starts whatever cannot cross a fork
+(TensorFlow runtime, torch thread pool, database connections).
+With MODEL_SERVER_SOCKET set, the chatbot and translation models live in the
+model server instead and are not preloaded here.
+"""
+import gc
+import logging
+import sys
+
+from django.conf import settings
+from django.db import connections
+
+from . import model_server
+from .procmem import process_memory
+
+logger = logging.getLogger(__name__)
+
+CHATBOT_PRELOAD = getattr(settings, 'CHATBOT_PRELOAD', True)
+TRANSLATION_PRELOAD_LANGUAGES = getattr(settings, 'TRANSLATION_PRELOAD_LANGUAGES', ('fr', 'rw'))
+
+
+def preload_models():
+    """Load every model in this (master) process and gc.freeze() the result."""
+    from . import ml_service
+
+    try:
+        ml_service.warm_up()
+    except Exception:
+        logger.exception("ML preload failed; workers will load the models on first use")
+    remote = model_server.remote_enabled()
+    if CHATBOT_PRELOAD and not remote:
+        from . import chatbot_service
+        chatbot_service.preload()
+    if TRANSLATION_PRELOAD_LANGUAGES and not remote:
+        try:
+            from . import translation_service
+        except ImportError as e:
+            logger.warning("Translation models not preloaded: %s", e)
+        else:
+            translation_service.preload(TRANSLATION_PRELOAD_LANGUAGES)
+    gc.collect()
+    # Move everything allocated so far out of the collector's reach: no gc header
+    # writes in the workers, so these pages are not copied on write.
+    gc.freeze()
+    logger.info("Models preloaded; %d objects frozen; master memory %s", gc.get_freeze_count(), process_memory())
+
+
+def after_fork():
+    """Per-worker initialisation after a preload fork."""
+    gc.enable()
+    # Never share the master's database sockets
+    connections.close_all()
+    if 'api.translation_service' in sys.modules:
+        sys.modules['api.translation_service'].after_fork()
+    if CHATBOT_PRELOAD and not model_server.remote_enabled():
+        from . import chatbot_service
+        chatbot_service.after_fork()
@@ -0,0 +1,65 @@
+"""
+Resident / shared memory of processes, read from /proc (Linux only).
+Used to check that models preloaded in the gunicorn master stay shared
+copy-on-write between the workers.
+"""
+import os
+from pathlib import Path
+
+_FIELDS = {
+    'Rss': 'rss_mb',
+    'Pss': 'pss_mb',
+    'Shared_Clean': 'shared_clean_mb',
+    'Shared_Dirty': 'shared_dirty_mb',
+    'Private_Clean': 'private_clean_mb',
+    'Private_Dirty': 'private_dirty_mb',
+    'Swap': 'swap_mb',
+}
+
+
+def process_memory(pid='self'):
+    """
+    {'pid', 'rss_mb', 'pss_mb', 'shared_mb', 'private_mb', ...} for a process,
+    or None where /proc is not available. PSS splits shared pages between the
+    processes that map them, so summing pss_mb over workers gives the real total.
+    """
+    proc = Path('/proc') / str(pid)
+    values = {}
+    try:
+        with open(proc / 'smaps_rollup') as fh:
+            for line in fh:
+                key, _, rest = line.partition(':')
+                if key in _FIELDS:
+                    values[_FIELDS[key]] = round(int(rest.split()[0]) / 1024, 1)
+    except FileNotFoundError:
+        # Older kernels: statm has resident and shared pages only
+        try:
+            resident, shared = (int(v) for v in (proc / 'statm').read_text().split()[1:3])
+        except (FileNotFoundError, ValueError):
+            return None
+        page_mb = os.sysconf('SC_PAGE_SIZE') / 2**20
+        values = {'rss_mb': round(resident * page_mb, 1), 'shared_mb': round(shared * page_mb, 1),
+                  'private_mb': round((resident - shared) * page_mb, 1)}
+    except (PermissionError, ProcessLookupError):
+        return None
+    if 'shared_clean_mb' in values:
+        values['shared_mb'] = round(values['shared_clean_mb'] + values['shared_dirty_mb'], 1)
+        values['private_mb'] = round(values['private_clean_mb'] + values['private_dirty_mb'], 1)
+    values['pid'] = os.getpid() if pid == 'self' else int(pid)
+    return values
+
+
+def child_pids(pid):
+    """PIDs whose parent is pid (e.g. the workers of a gunicorn master)."""
+    children = []
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+        except (FileNotFoundError, PermissionError, ProcessLookupError):
+            continue
+        # Field 4 is the parent pid; the command name (field 2) may contain spaces
+        if int(stat.rsplit(')', 1)[1].split()[1]) == int(pid):
+            children.append(int(entry.name))
+    return sorted(children)
@@ -0,0 +1,131 @@
+"""
+Two-tier cache of MarianMT translations: a per-worker LRU in front of the
+TranslationCache table (shared by all workers and restarts).
+
+Keys are the direction ('fr-en'), the normalized source text (Unicode NFKC,
+whitespace collapsed; case and punctuation are kept, they change the
+translation) and the translation model, including its quantization. The same
+FR/RW questions and English answers recur constantly, so a repeated message
+costs no generation at all. Hit counts are kept in memory and written back
+in batches (caching.HitCounter): a memory hit touches no database at all.
+Database errors (e.g. before `migrate`) turn the database tier off for that
+call instead of failing the chat.
+"""
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import HitCounter, LRUCache
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_CACHE = getattr(settings, 'TRANSLATION_CACHE', True)
+
+_lru = LRUCache(maxsize=getattr(settings, 'TRANSLATION_CACHE_SIZE', 4096))
+_lock = threading.Lock()
+_stats = {'db_hits': 0, 'misses': 0}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """NFKC and collapsed whitespace: '  Bonjour,  monde ' -> 'Bonjour, monde'."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', str(text or ''))).strip()
+
+
+def _key(normalized, direction, model_name):
+    raw = '|'.join((direction, normalized, model_name))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _flush_hits(counts):
+    """Add batched hit counts ({key: hits}) to their rows: one UPDATE per distinct count."""
+    from .models import TranslationCache
+
+    by_count = defaultdict(list)
+    for key, hits in counts.items():
+        by_count[hits].append(key)
+    now = timezone.now()
+    try:
+        for hits, keys in by_count.items():
+            TranslationCache.objects.filter(key__in=keys).update(hit_count=F('hit_count') + hits, last_hit_at=now)
+    except DatabaseError:
+        logger.exception("Translation cache hit count update failed")
+
+
+_hits = HitCounter(_flush_hits)
+atexit.register(_hits.flush)
+
+
+def lookup(text, source, target, model_name):
+    """Cached translation of text for this direction and model, or None."""
+    normalized = normalize_text(text)
+    if not TRANSLATION_CACHE or not normalized:
+        return None
+    from .models import TranslationCache
+
+    key = _key(normalized, f'{source}-{target}', model_name)
+    translation = _lru.get(key)
+    if translation is None:
+        try:
+            translation = TranslationCache.objects.filter(key=key).values_list('translation', flat=True).first()
+        except DatabaseError:
+            logger.exception("Translation cache lookup failed")
+            return None
+        with _lock:
+            _stats['db_hits' if translation is not None else 'misses'] += 1
+        if translation is None:
+            return None
+        _lru.set(key, translation)
+    _hits.add(key)
+    return translation
+
+
+def store(text, source, target, model_name, translation):
+    """Cache a translation (no-op when caching is off or either side is empty)."""
+    normalized = normalize_text(text)
+    if not TRANSLATION_CACHE or not normalized or not translation:
+        return
+    from .models import TranslationCache
+
+    key = _key(normalized, f'{source}-{target}', model_name)
+    _lru.set(key, translation)
+    try:
+        TranslationCache.objects.get_or_create(key=key, defaults={
+            'direction': f'{source}-{target}',
+            'model_name': model_name,
+            'source_text': normalized[:4000],
+            'translation': translation,
+        })
+    except IntegrityError:
+        # Another worker stored the same translation first
+        pass
+    except DatabaseError:
+        logger.exception("Translation cache store failed")
+
+
+def stats():
+    """Hits per tier and misses of this worker, or None when caching is off."""
+    if not TRANSLATION_CACHE:
+        return None
+    lru = _lru.stats()
+    with _lock:
+        db_hits, misses = _stats['db_hits'], _stats['misses']
+    lookups = lru['hits'] + db_hits + misses
+    return {
+        'memory_hits': lru['hits'],
+        'db_hits': db_hits,
+        'misses': misses,
+        'hit_rate': round((lru['hits'] + db_hits) / lookups, 4) if lookups else None,
+        'size': lru['size'],
+        'maxsize': lru['maxsize'],
+    }
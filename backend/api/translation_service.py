@@ -8,50 +8,180 @@ and use small MarianMT models to translate:
 
 This gives more reliable non-English answers than relying on the
 financial model itself to translate.
+
+With MODEL_SERVER_SOCKET set, translation runs in the model server process
+(see model_server.py) and the MarianMT models are never loaded here.
+
+Every translation goes through translation_cache first, so a message seen
+before (by any worker) costs no MarianMT call.
 """
 import logging
-from functools import lru_cache
+import re
+import time
+from pathlib import Path
 
+from django.conf import settings
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 
+from . import model_pool, model_server, translation_cache
+
 logger = logging.getLogger(__name__)
 
+# Torch intra-op threads per worker after a preload fork (0 = keep torch's default)
+TORCH_NUM_THREADS = getattr(settings, 'TORCH_NUM_THREADS', 0)
+# Int8 dynamic quantization of each MarianMT model (see quantization.py)
+TRANSLATION_QUANTIZE_INT8 = getattr(settings, 'TRANSLATION_QUANTIZE_INT8', False)
+# Local directory of each pair ('fr-en' -> path), filled by manage.py fetch_translation_models
+TRANSLATION_MODEL_PATHS = getattr(settings, 'TRANSLATION_MODEL_PATHS', {})
+# Never contact the Hugging Face hub: a pair without its local directory fails to load
+TRANSLATION_LOCAL_FILES_ONLY = getattr(settings, 'TRANSLATION_LOCAL_FILES_ONLY', False)
+# Weight budget of the loaded pairs in MB (0 = keep every pair loaded)
+TRANSLATION_POOL_MAX_MB = getattr(settings, 'TRANSLATION_POOL_MAX_MB', 0)
+# Translate multi-sentence texts sentence by sentence, as one padded batch
+TRANSLATION_SENTENCE_BATCH = getattr(settings, 'TRANSLATION_SENTENCE_BATCH', False)
 
-def _load_marian(model_name: str):
-    """Load a MarianMT tokenizer + model pair."""
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+def _load_marian(model_name: str, quantize=None, local_files_only: bool = False):
+    """Load a MarianMT tokenizer + model pair (model_name: hub id or local directory)."""
+    quantize = TRANSLATION_QUANTIZE_INT8 if quantize is None else quantize
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local_files_only)
+    if quantize:
+        from .quantization import load_quantized
+        model = load_quantized(
+            model_name, lambda: AutoModelForSeq2SeqLM.from_pretrained(model_name, local_files_only=local_files_only)
+        )
+    else:
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, local_files_only=local_files_only)
     return tokenizer, model
 
 
-@lru_cache(maxsize=None)
+def _hub_name(source: str, target: str) -> str:
+    return f"Helsinki-NLP/opus-mt-{source}-{target}"
+
+
+def model_location(source: str, target: str):
+    """
+    Where the source->target pair loads from: (local directory, True) when it
+    has been fetched (see manage.py fetch_translation_models), else
+    (hub id, False). Raises FileNotFoundError under TRANSLATION_LOCAL_FILES_ONLY
+    when the local directory is missing.
+    """
+    path = TRANSLATION_MODEL_PATHS.get(f"{source}-{target}")
+    if path and (Path(path) / "config.json").exists():
+        return str(path), True
+    if TRANSLATION_LOCAL_FILES_ONLY:
+        raise FileNotFoundError(
+            f"No local translation model for {source}->{target} at {path}: "
+            f"run `manage.py fetch_translation_models --languages {source if target == 'en' else target}`"
+        )
+    return _hub_name(source, target), False
+
+
+def _load_pair(source: str, target: str, quantize=None):
+    """Load the source->target pair from its local directory (or the hub when allowed), logging the load time."""
+    location, local = model_location(source, target)
+    start = time.perf_counter()
+    pair = _load_marian(location, quantize=quantize, local_files_only=local)
+    logger.info(
+        "Loaded translation model %s->%s from %s in %.1fs", source, target, location, time.perf_counter() - start
+    )
+    return pair
+
+
+# Loaded pairs, keyed 'src-tgt', within TRANSLATION_POOL_MAX_MB of weights (least recently used evicted)
+_pool = model_pool.ModelPool('translation', TRANSLATION_POOL_MAX_MB * 2**20, size=lambda pair: model_pool.model_bytes(pair[1]))
+
+
+def _pooled(source: str, target: str):
+    return _pool.get(f"{source}-{target}", lambda: _load_pair(source, target))
+
+
 def _en_fr():
-    return _load_marian("Helsinki-NLP/opus-mt-en-fr")
+    return _pooled("en", "fr")
 
 
-@lru_cache(maxsize=None)
 def _fr_en():
-    return _load_marian("Helsinki-NLP/opus-mt-fr-en")
+    return _pooled("fr", "en")
 
 
-@lru_cache(maxsize=None)
 def _en_rw():
-    return _load_marian("Helsinki-NLP/opus-mt-en-rw")
+    return _pooled("en", "rw")
 
 
-@lru_cache(maxsize=None)
 def _rw_en():
-    return _load_marian("Helsinki-NLP/opus-mt-rw-en")
+    return _pooled("rw", "en")
 
 
-def _translate(text: str, pair_loader, max_length: int = 512) -> str:
-    """Translate text using a cached (tokenizer, model) loader."""
-    if not text:
-        return text
+# language -> (to-English loader, from-English loader)
+_LOADERS = {
+    "fr": (_fr_en, _en_fr),
+    "rw": (_rw_en, _en_rw),
+}
+
+# (source, target) -> loader
+_PAIRS = {
+    ("fr", "en"): _fr_en,
+    ("en", "fr"): _en_fr,
+    ("rw", "en"): _rw_en,
+    ("en", "rw"): _en_rw,
+}
+
+_default_num_threads = None
+
+
+def preload(languages=("fr", "rw")) -> None:
+    """
+    Pre-fork step (gunicorn preload): load the MarianMT pairs for these
+    languages in the master so workers share the weight pages copy-on-write.
+    Torch is kept to one thread while loading, so no OpenMP pool exists in
+    the master at fork time; after_fork() restores the thread count.
+    """
+    global _default_num_threads
+    import torch
+
+    _default_num_threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    for lang in languages:
+        for loader in _LOADERS.get(lang, ()):
+            # _load_pair logs where each pair came from and its load time
+            try:
+                _, model = loader()
+                model.eval()
+            except Exception as exc:
+                logger.exception("Preloading %s failed: %s", loader.__name__, exc)
+
+
+def after_fork() -> None:
+    """Post-fork step: give this worker its own torch thread pool."""
+    import torch
+
+    threads = TORCH_NUM_THREADS or _default_num_threads
+    if threads:
+        torch.set_num_threads(threads)
+
+
+def _model_name(source: str, target: str) -> str:
+    """Translation model of a pair, as used in translation cache keys."""
+    name = _hub_name(source, target)
+    return f"{name}:int8" if TRANSLATION_QUANTIZE_INT8 else name
+
+
+# A sentence ends at . ! or ? followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Same, keeping the whitespace: [sentence, whitespace, sentence, ...]
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])(\s+)")
+
+
+def _translate_batch(texts, pair_loader, max_length: int = 512):
+    """
+    Translate several texts as one padded batch (a single generate call);
+    list of translations (None where one came out empty), or None when
+    translation failed.
+    """
     try:
         tokenizer, model = pair_loader()
         inputs = tokenizer(
-            [text],
+            list(texts),
             return_tensors="pt",
             padding=True,
             truncation=True,
@@ -61,31 +191,108 @@ def _translate(text: str, pair_loader, max_length: int = 512) -> str:
             **inputs,
             max_length=max_length,
         )
-        out = tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
-        return out.strip() if out else text
+        return [out.strip() or None for out in tokenizer.batch_decode(outputs, skip_special_tokens=True)]
     except Exception as exc:  # pragma: no cover - fail soft
         logger.exception("Translation failed: %s", exc)
+        return None
+
+
+def _translate(text: str, pair_loader, max_length: int = 512):
+    """Translate text using a cached (tokenizer, model) loader; None when translation failed."""
+    outputs = _translate_batch([text], pair_loader, max_length=max_length)
+    return outputs[0] if outputs else None
+
+
+def _translate_sentences(parts, source: str, target: str, pair_loader, model_name: str):
+    """
+    Translate text split by _split_sentences() (sentences and the whitespace
+    between them): each distinct sentence once, cached ones from the
+    translation cache and the rest in one batch, then reassembled with the
+    original whitespace. None when translation failed or a sentence came out
+    empty.
+    """
+    sentences, separators = parts[0::2], parts[1::2] + [""]
+    translations = {}
+    for sentence in dict.fromkeys(s for s in sentences if s.strip()):
+        cached = translation_cache.lookup(sentence, source, target, model_name)
+        if cached is not None:
+            translations[sentence] = cached
+    missing = [s for s in dict.fromkeys(sentences) if s.strip() and s not in translations]
+    if missing:
+        outputs = _translate_batch(missing, pair_loader)
+        if outputs is None:
+            return None
+        for sentence, out in zip(missing, outputs):
+            if out:
+                translations[sentence] = out
+                translation_cache.store(sentence, source, target, model_name, out)
+        if not all(outputs):
+            # Same as a failed batch: the caller returns the source text and caches nothing for it
+            return None
+    return "".join(translations.get(s, s) + sep for s, sep in zip(sentences, separators)).strip()
+
+
+def translate(text: str, source_lang: str, target_lang: str) -> str:
+    """Translate between a supported pair; unsupported pairs return the text unchanged."""
+    if not text:
         return text
+    source = (source_lang or "en").lower()
+    target = (target_lang or "en").lower()
+    loader = _PAIRS.get((source, target))
+    if loader is None:
+        # Same language or unsupported code
+        return text
+    model_name = _model_name(source, target)
+    cached = translation_cache.lookup(text, source, target, model_name)
+    if cached is not None:
+        return cached
+    if model_server.remote_enabled():
+        try:
+            out = model_server.call("translate", text=text, source=source, target=target)
+        except model_server.ModelServerError as exc:
+            logger.warning("Translation %s->%s on the model server failed: %s", source, target, exc)
+            return text
+        if out == text:
+            # The server hands the text back unchanged when its translation fails
+            return text
+    else:
+        parts = _SENTENCE_SPLIT.split(text.strip()) if TRANSLATION_SENTENCE_BATCH else [text]
+        if len(parts) > 1:
+            out = _translate_sentences(parts, source, target, loader, model_name)
+        else:
+            out = _translate(text, loader)
+        if out is None:
+            return text
+    translation_cache.store(text, source, target, model_name, out)
+    return out
 
 
 def to_english(text: str, source_lang: str) -> str:
     """Translate user message from FR/RW to English for the chatbot."""
-    lang = (source_lang or "en").lower()
-    if lang == "fr":
-        return _translate(text, _fr_en)
-    if lang == "rw":
-        return _translate(text, _rw_en)
-    # Already English or unsupported code
-    return text
+    return translate(text, source_lang, "en")
 
 
 def from_english(text: str, target_lang: str) -> str:
     """Translate chatbot answer from English to FR/RW (best-effort)."""
-    lang = (target_lang or "en").lower()
-    if lang == "fr":
-        return _translate(text, _en_fr)
-    if lang == "rw":
-        return _translate(text, _en_rw)
-    # Default: English / unsupported code
-    return text
+    return translate(text, "en", target_lang)
+
 
+def translate_stream(pieces, target_lang: str):
+    """
+    Translate streamed English text pieces (see chatbot_service.stream_reply)
+    to target_lang one sentence at a time: yields each translated sentence
+    as soon as the next one starts, then the translated remainder. English
+    (or an unsupported code) passes the pieces through unchanged.
+    """
+    if ("en", (target_lang or "en").lower()) not in _PAIRS:
+        yield from pieces
+        return
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        *complete, buffer = _SENTENCE_END.split(buffer)
+        for sentence in complete:
+            if sentence.strip():
+                yield from_english(sentence.strip(), target_lang) + " "
+    if buffer.strip():
+        yield from_english(buffer.strip(), target_lang)
@@ -0,0 +1,246 @@
+"""
+Dependency-free inference for the gradient-boosted tree models.
+
+export_models() flattens the XGBoost boosters (and the StandardScaler) into
+plain NumPy arrays, one entry per node across all trees of all models:
+
+    feature, threshold, left, right, missing, value
+
+Leaves point to themselves, so a fixed number of vectorised steps (the
+deepest tree's depth) walks every row down every tree at once. At prediction
+time only NumPy is needed; XGBoost / scikit-learn are only imported by the
+export step (through the unpickled estimators it receives).
+"""
+import json
+import math
+
+import numpy as np
+
+COMPILED_FORMAT = 1
+
+# ml_service model key -> output kind
+MODEL_KEYS = ('classifier', 'risk_regressor', 'amount_regressor')
+
+# Rows traversed together by CompiledForest.leaf_values
+LEAF_BLOCK_ROWS = 64
+
+
+def _parse_base_score(learner_model_param):
+    # Stored as e.g. "5E-1" or "[5E-1]" depending on the XGBoost version
+    raw = str(learner_model_param.get('base_score', '0.5')).strip('[]')
+    return float(raw.split(',')[0])
+
+
+def _booster_trees(estimator):
+    """(objective, base_margin, trees) from a fitted XGBClassifier / XGBRegressor."""
+    model = json.loads(estimator.get_booster().save_raw(raw_format='json'))
+    learner = model['learner']
+    objective = learner['objective']['name']
+    base_score = _parse_base_score(learner['learner_model_param'])
+    if objective == 'binary:logistic':
+        base_margin = math.log(base_score / (1.0 - base_score))
+    elif objective.startswith('reg:squarederror') or objective == 'reg:linear':
+        base_margin = base_score
+    else:
+        raise ValueError(f"Unsupported objective for tree export: {objective}")
+    booster = learner['gradient_booster']
+    if booster.get('name') != 'gbtree':
+        raise ValueError(f"Unsupported booster: {booster.get('name')}")
+    return objective, base_margin, booster['model']['trees']
+
+
+def _tree_depth(left, right):
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        if left[node] == -1:
+            depth = max(depth, d)
+        else:
+            stack.append((left[node], d + 1))
+            stack.append((right[node], d + 1))
+    return depth
+
+
+def export_models(feature_cols, scaler, models, column_maps=None):
+    """
+    Compile fitted estimators into a dict of NumPy arrays (see module docstring).
+    models: {key: estimator} for the keys in MODEL_KEYS.
+    column_maps: {key: index array} for models trained on a subset of
+    feature_cols; their split features are remapped into feature_cols space.
+    """
+    column_maps = column_maps or {}
+    feature, threshold, left, right, missing, value, roots = [], [], [], [], [], [], []
+    meta = {}
+    max_depth = 0
+    for key in MODEL_KEYS:
+        objective, base_margin, trees = _booster_trees(models[key])
+        colmap = column_maps.get(key)
+        first_tree = len(roots)
+        for tree in trees:
+            offset = len(feature)
+            t_left = tree['left_children']
+            t_right = tree['right_children']
+            if any(tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported")
+            max_depth = max(max_depth, _tree_depth(t_left, t_right))
+            roots.append(offset)
+            for i, (lc, rc) in enumerate(zip(t_left, t_right)):
+                if lc == -1:
+                    # Leaf: loops to itself; leaf value is stored in split_conditions
+                    feature.append(0)
+                    threshold.append(0.0)
+                    left.append(offset + i)
+                    right.append(offset + i)
+                    missing.append(offset + i)
+                    value.append(tree['split_conditions'][i])
+                else:
+                    idx = tree['split_indices'][i]
+                    feature.append(int(colmap[idx]) if colmap is not None else idx)
+                    threshold.append(tree['split_conditions'][i])
+                    left.append(offset + lc)
+                    right.append(offset + rc)
+                    missing.append(offset + (lc if tree['default_left'][i] else rc))
+                    value.append(0.0)
+        meta[key] = {
+            'objective': objective,
+            'base_margin': base_margin,
+            'tree_start': first_tree,
+            'tree_stop': len(roots),
+            'n_features_in': int(len(colmap) if colmap is not None else len(feature_cols)),
+        }
+    return {
+        'format': COMPILED_FORMAT,
+        'feature_cols': list(feature_cols),
+        'scaler_mean': np.asarray(scaler.mean_ if scaler.mean_ is not None else np.zeros(len(feature_cols)), dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_ if scaler.scale_ is not None else np.ones(len(feature_cols)), dtype=np.float64),
+        'feature': np.asarray(feature, dtype=np.intp),
+        'threshold': np.asarray(threshold, dtype=np.float32),
+        'left': np.asarray(left, dtype=np.intp),
+        'right': np.asarray(right, dtype=np.intp),
+        'missing': np.asarray(missing, dtype=np.intp),
+        'value': np.asarray(value, dtype=np.float32),
+        'roots': np.asarray(roots, dtype=np.intp),
+        'max_depth': max_depth,
+        'models': meta,
+    }
+
+
+class NumpyScaler:
+    """StandardScaler.transform with the exported mean_/scale_."""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class CompiledForest:
+    """All trees of all exported models, traversed together."""
+
+    def __init__(self, compiled):
+        if compiled.get('format') != COMPILED_FORMAT:
+            raise ValueError(f"Unsupported compiled model format: {compiled.get('format')}")
+        self.feature = compiled['feature']
+        self.threshold = compiled['threshold']
+        self.left = compiled['left']
+        self.right = compiled['right']
+        self.missing = compiled['missing']
+        self.value = compiled['value']
+        self.roots = compiled['roots']
+        self.max_depth = int(compiled['max_depth'])
+        self.models = compiled['models']
+        # Traversal runs on doubled node ids (2 * node): slot 2n and 2n + 1 of the
+        # split arrays both describe node n, so children2[n2 + (x >= threshold)]
+        # picks the next (doubled) node without a multiply per step.
+        self._feature2 = np.repeat(self.feature, 2)
+        self._threshold2 = np.repeat(self.threshold, 2)
+        self._missing2 = np.repeat(2 * self.missing, 2)
+        self._children2 = 2 * np.stack([self.left, self.right], axis=1).ravel()
+        # predict_all sums each model's contiguous tree range with one reduceat
+        keys = sorted(self.models, key=lambda k: self.models[k]['tree_start'])
+        self._model_order = {key: i for i, key in enumerate(keys)}
+        self._model_starts = np.array([self.models[k]['tree_start'] for k in keys], dtype=np.intp)
+        self._base_margins = np.array([self.models[k]['base_margin'] for k in keys], dtype=np.float64)
+
+    def leaf_values(self, X, roots):
+        """(N, len(roots)) leaf values reached by each row in each tree."""
+        # XGBoost compares features as float32
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        check_missing = bool(np.isnan(X32).any())
+        n_rows, n_features = X32.shape
+        roots2 = 2 * roots
+        if n_rows == 1:
+            # Single row: plain 1-D gathers, no row offsets
+            x_row = X32[0]
+            node2 = roots2
+            for _ in range(self.max_depth):
+                x = x_row.take(self._feature2.take(node2))
+                nxt = self._children2.take(node2 + (x >= self._threshold2.take(node2)))
+                if check_missing:
+                    nxt = np.where(np.isnan(x), self._missing2.take(node2), nxt)
+                node2 = nxt
+            return self.value.take(node2 >> 1)[None, :]
+        # Blocks of LEAF_BLOCK_ROWS rows keep the (rows, trees) index arrays in
+        # cache; one big (N, trees) pass is slower per row from ~1000 rows on.
+        out = np.empty((n_rows, len(roots)), dtype=self.value.dtype)
+        flat = X32.ravel()
+        for start in range(0, n_rows, LEAF_BLOCK_ROWS):
+            stop = min(start + LEAF_BLOCK_ROWS, n_rows)
+            offsets = np.arange(start * n_features, stop * n_features, n_features, dtype=np.intp)[:, None]
+            node2 = np.broadcast_to(roots2, (stop - start, len(roots)))
+            for _ in range(self.max_depth):
+                x = flat.take(offsets + self._feature2.take(node2))
+                nxt = self._children2.take(node2 + (x >= self._threshold2.take(node2)))
+                if check_missing:
+                    nxt = np.where(np.isnan(x), self._missing2.take(node2), nxt)
+                node2 = nxt
+            out[start:stop] = self.value.take(node2 >> 1)
+        return out
+
+    def _margin(self, leaves, key, start=0):
+        m = self.models[key]
+        cols = slice(m['tree_start'] - start, m['tree_stop'] - start)
+        return leaves[:, cols].sum(axis=1, dtype=np.float64) + m['base_margin']
+
+    def margin(self, X, key):
+        m = self.models[key]
+        leaves = self.leaf_values(X, self.roots[m['tree_start']:m['tree_stop']])
+        return self._margin(leaves, key, start=m['tree_start'])
+
+    def predict_all(self, X):
+        """(approved, risk, amount) arrays for scaled full-width rows in one traversal."""
+        leaves = self.leaf_values(X, self.roots)
+        margins = np.add.reduceat(leaves, self._model_starts, axis=1, dtype=np.float64) + self._base_margins
+        approved = margins[:, self._model_order['classifier']] > 0
+        risk = margins[:, self._model_order['risk_regressor']].astype(np.float32).astype(np.float64)
+        amount = margins[:, self._model_order['amount_regressor']].astype(np.float32).astype(np.float64)
+        return approved, risk, amount
+
+
+class CompiledModel:
+    """
+    Estimator-like wrapper (predict(X)) around one model of a CompiledForest,
+    taking the same input columns the original estimator took.
+    """
+
+    def __init__(self, forest, key, input_columns=None):
+        self.forest = forest
+        self.key = key
+        self.input_columns = input_columns
+        self.objective = forest.models[key]['objective']
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if self.input_columns is not None:
+            # Splits were remapped to full-width columns at export
+            width = int(self.input_columns.max()) + 1
+            full = np.zeros((X.shape[0], width), dtype=X.dtype)
+            full[:, self.input_columns] = X
+            X = full
+        margin = self.forest.margin(X, self.key)
+        if self.objective == 'binary:logistic':
+            return (margin > 0).astype(np.int64)
+        return margin.astype(np.float32)
@@ -2,6 +2,9 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    # Health
+    path('health/ready/', views.health_ready),
+    path('health/metrics/', views.health_metrics),
     # Auth (admin is backend-created; login only for admin)
     path('auth/register/', views.auth_register),
     path('auth/login/', views.auth_login),
@@ -12,6 +15,7 @@ urlpatterns = [
     path('admin/activity/', views.admin_activity_list),
     path('admin/users/', views.admin_users_list),
     path('admin/stats/', views.admin_stats),
+    path('admin/chat-cache/', views.admin_chat_cache),
     # Farmer dashboard APIs
     path('farmer/profile/', views.farmer_profile),
     path('farmer/required-documents/', views.required_documents),
@@ -31,5 +35,9 @@ urlpatterns = [
     path('eligibility/', views.eligibility),
     path('risk/', views.risk),
     path('recommend-amount/', views.recommend_amount),
+    path('assess/', views.assess),
+    path('score-batch/', views.score_batch),
+    path('what-if/', views.what_if),
     path('chat/', views.chat),
+    path('chat/stream/', views.chat_stream),
 ]
@@ -1,22 +1,39 @@
+import asyncio
 import json
 import re
+import threading
+import time
 import zipfile
 from collections.abc import Mapping
 from io import BytesIO
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
-from django.http import HttpResponse
+from django.db import close_old_connections
+from django.db.models import Avg
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from .explanations import eligibility_reason, eligibility_description, recommend_amount_explanation, risk_score_description
-from .ml_service import predict_eligibility, predict_risk, recommend_amount as recommend_loan_amount
+from .ml_service import (
+    MAX_DTI as _MAX_DTI,
+    RWF_TO_USD as _RWF_TO_USD,
+    assess as assess_ml,
+    build_ml_payload as _build_ml_payload,
+    microbatch_stats,
+    predict as predict_ml,
+    prediction_cache_stats,
+    readiness as ml_readiness,
+    score_batch as score_ml_batch,
+    sweep_loan_terms,
+)
 from .models import (
     GetStartedEvent,
     PasswordResetToken,
@@ -30,7 +47,13 @@ from .models import (
     Loan,
     Repayment,
     LoanApplicationMessage,
+    ChatInteraction,
+    ChatAnswerCache,
 )
+from . import chat_cache, chat_pipeline, faq_index, model_pool, translation_cache
+from .chatbot_service import batch_stats as chat_batch_stats
+from .model_server import server_stats as model_server_stats
+from .procmem import process_memory
 from .serializers import LoginSerializer, RegisterSerializer
 
 User = get_user_model()
@@ -43,8 +66,15 @@ _ml_request_body = openapi.Schema(
 _eligibility_response = openapi.Response('approved (bool), prediction (0/1)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'approved': openapi.Schema(type=openapi.TYPE_BOOLEAN), 'prediction': openapi.Schema(type=openapi.TYPE_INTEGER)}))
 _risk_response = openapi.Response('risk_score (float)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'risk_score': openapi.Schema(type=openapi.TYPE_NUMBER)}))
 _amount_response = openapi.Response('recommended_amount (float)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'recommended_amount': openapi.Schema(type=openapi.TYPE_NUMBER)}))
+_batch_request_body = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    required=['rows'],
+    properties={'rows': openapi.Schema(type=openapi.TYPE_ARRAY, items=_ml_request_body, description='One feature object per applicant (same keys as the single-row ML endpoints).')},
+)
+_batch_response = openapi.Response('results (one per row: approved, prediction, risk_score, recommended_amount — or error)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)), 'count': openapi.Schema(type=openapi.TYPE_INTEGER), 'error_count': openapi.Schema(type=openapi.TYPE_INTEGER)}))
+_assess_response = openapi.Response('eligibility, risk and recommendation blocks (same fields as the three single-model endpoints)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'eligibility': openapi.Schema(type=openapi.TYPE_OBJECT), 'risk': openapi.Schema(type=openapi.TYPE_OBJECT), 'recommendation': openapi.Schema(type=openapi.TYPE_OBJECT)}))
+_chat_response = openapi.Response('reply (string) and the answer path in source (cache, faq, model, fallback)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'reply': openapi.Schema(type=openapi.TYPE_STRING), 'source': openapi.Schema(type=openapi.TYPE_STRING)}))
 _chat_request = openapi.Schema(type=openapi.TYPE_OBJECT, required=['message'], properties={'message': openapi.Schema(type=openapi.TYPE_STRING), 'language': openapi.Schema(type=openapi.TYPE_STRING, enum=['en', 'fr', 'rw'])})
-_chat_response = openapi.Response('reply (string)', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'reply': openapi.Schema(type=openapi.TYPE_STRING)}))
 
 
 def _get_payload(request):
@@ -57,6 +87,43 @@ def _get_payload(request):
         return {}
 
 
+def _eligibility_body(payload, approved, language):
+    """Response fields for Model 1 (shared by /eligibility/ and /assess/)."""
+    return {
+        'approved': approved,
+        'prediction': 1 if approved else 0,
+        'reason': eligibility_reason(payload, approved, language),
+        'description': eligibility_description(language),
+    }
+
+
+def _risk_body(risk_score, language):
+    """Response fields for Model 2 (shared by /risk/ and /assess/)."""
+    risk_info = risk_score_description(risk_score, language)
+    return {
+        'risk_score': risk_score,
+        'score': risk_score,
+        'interpretation': risk_info['interpretation'],
+        'description': risk_info['description'],
+        'score_meaning': risk_info['score_meaning'],
+    }
+
+
+def _amount_body(payload, amount_usd, language):
+    """Response fields for Model 3 from a DTI-capped USD amount (shared by /recommend-amount/ and /assess/)."""
+    # Convert USD-scale model output back to RWF for display
+    amount = amount_usd * _RWF_TO_USD
+    amount_info = recommend_amount_explanation(payload, amount_usd, language)
+    return {
+        'recommended_amount': amount,
+        'recommendedAmount': amount,
+        'amount': amount,
+        'prediction': amount,
+        'explanation': amount_info['explanation'],
+        'basis': amount_info['basis'],
+    }
+
+
 @swagger_auto_schema(method='post', operation_description='Model 1: Loan eligibility (approval/denial) prediction. POST JSON with features.', request_body=_ml_request_body, responses={200: _eligibility_response, 400: 'Error', 503: 'Models not loaded'}, tags=['ML Models'])
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -68,14 +135,10 @@ def eligibility(request):
     if language not in ('en', 'fr', 'rw'):
         language = 'en'
     try:
-        approved = predict_eligibility(payload)
-        reason = eligibility_reason(payload, approved, language)
-        return Response({
-            'approved': approved,
-            'prediction': 1 if approved else 0,
-            'reason': reason,
-            'description': eligibility_description(language),
-        })
+        result = predict_ml(payload, ('approved',))
+        body = _eligibility_body(payload, result['approved'], language)
+        body['model_version'] = result['model_version']
+        return Response(body)
     except FileNotFoundError as e:
         return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
@@ -93,15 +156,10 @@ def risk(request):
     if language not in ('en', 'fr', 'rw'):
         language = 'en'
     try:
-        risk_score = predict_risk(payload)
-        risk_info = risk_score_description(risk_score, language)
-        return Response({
-            'risk_score': risk_score,
-            'score': risk_score,
-            'interpretation': risk_info['interpretation'],
-            'description': risk_info['description'],
-            'score_meaning': risk_info['score_meaning'],
-        })
+        result = predict_ml(payload, ('risk_score',))
+        body = _risk_body(result['risk_score'], language)
+        body['model_version'] = result['model_version']
+        return Response(body)
     except FileNotFoundError as e:
         return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
@@ -119,77 +177,398 @@ def recommend_amount(request):
     if language not in ('en', 'fr', 'rw'):
         language = 'en'
     try:
-        amount_usd = recommend_loan_amount(payload)
-        # Cap at what the income can actually afford (35% DTI ceiling).
-        # payload has AnnualIncome in USD already (converted by frontend formToMlPayload).
-        monthly_income_usd = float(payload.get('AnnualIncome', 1)) / 12
-        duration = int(payload.get('LoanDuration') or 24)
-        max_affordable_usd = monthly_income_usd * _MAX_DTI * duration
-        amount_usd = min(amount_usd, max_affordable_usd)
-        # Convert USD-scale model output back to RWF for display
-        amount = amount_usd * _RWF_TO_USD
-        amount_info = recommend_amount_explanation(payload, amount_usd, language)
+        result = predict_ml(payload, ('recommended_amount',))
+        amount_usd = _cap_to_affordable_usd(payload, result['recommended_amount'])
+        body = _amount_body(payload, amount_usd, language)
+        body['model_version'] = result['model_version']
+        return Response(body)
+    except FileNotFoundError as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _cap_to_affordable_usd(payload, amount_usd):
+    """Cap a USD-scale recommended amount at what the income can afford (35% DTI ceiling).
+    payload has AnnualIncome in USD already (converted by frontend formToMlPayload)."""
+    monthly_income_usd = float(payload.get('AnnualIncome', 1)) / 12
+    duration = int(payload.get('LoanDuration') or 24)
+    max_affordable_usd = monthly_income_usd * _MAX_DTI * duration
+    return min(amount_usd, max_affordable_usd)
+
+
+@swagger_auto_schema(method='post', operation_description='All three models in one call: eligibility, risk score and recommended amount (DTI-capped) with explanations. Features are encoded and scaled once. POST JSON with features.', request_body=_ml_request_body, responses={200: _assess_response, 400: 'Error', 503: 'Models not loaded'}, tags=['ML Models'])
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def assess(request):
+    """POST /api/assess/ — Models 1–3 in a single pass. Accepts optional 'language' (en|fr|rw)."""
+    payload = _get_payload(request)
+    language = (payload.get('language') or payload.get('lang') or 'en')
+    language = str(language).strip().lower()[:2]
+    if language not in ('en', 'fr', 'rw'):
+        language = 'en'
+    try:
+        result = assess_ml(payload)
+        amount_usd = _cap_to_affordable_usd(payload, result['recommended_amount'])
         return Response({
+            'eligibility': _eligibility_body(payload, result['approved'], language),
+            'risk': _risk_body(result['risk_score'], language),
+            'recommendation': _amount_body(payload, amount_usd, language),
+            'model_version': result['model_version'],
+        })
+    except FileNotFoundError as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Upper bound on rows per /api/score-batch/ request (keeps one request from pinning a worker).
+_SCORE_BATCH_MAX_ROWS = getattr(settings, 'ML_SCORE_BATCH_MAX_ROWS', 10000)
+
+
+@swagger_auto_schema(method='post', operation_description='Score many applicants in one call: runs eligibility, risk and recommended amount on the whole batch at once. Bad rows are reported per row and do not fail the batch.', request_body=_batch_request_body, responses={200: _batch_response, 400: 'Error', 503: 'Models not loaded'}, tags=['ML Models'])
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def score_batch(request):
+    """POST /api/score-batch/ — All three models over a list of rows ({"rows": [...]}, or a bare JSON list)."""
+    data = request.data
+    rows = data.get('rows') if isinstance(data, Mapping) else data
+    if not isinstance(rows, list) or not rows:
+        return Response({'error': 'rows must be a non-empty list of feature objects.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > _SCORE_BATCH_MAX_ROWS:
+        return Response({'error': f'At most {_SCORE_BATCH_MAX_ROWS} rows per request.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        scored = score_ml_batch(rows)
+    except FileNotFoundError as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    results = []
+    for row, result in zip(rows, scored):
+        if 'error' in result:
+            results.append(result)
+            continue
+        try:
+            amount_usd = _cap_to_affordable_usd(row, result['recommended_amount'])
+        except (TypeError, ValueError):
+            results.append({'error': 'AnnualIncome and LoanDuration must be numeric.'})
+            continue
+        amount = amount_usd * _RWF_TO_USD
+        results.append({
+            'approved': result['approved'],
+            'prediction': 1 if result['approved'] else 0,
+            'risk_score': result['risk_score'],
             'recommended_amount': amount,
-            'recommendedAmount': amount,
-            'amount': amount,
-            'prediction': amount,
-            'explanation': amount_info['explanation'],
-            'basis': amount_info['basis'],
+            'model_version': result['model_version'],
         })
+    return Response({
+        'results': results,
+        'count': len(results),
+        'error_count': sum(1 for r in results if 'error' in r),
+    })
+
+
+# Upper bound on amount x duration candidates per /api/what-if/ request.
+_SWEEP_MAX_CANDIDATES = getattr(settings, 'ML_SWEEP_MAX_CANDIDATES', 2000)
+_SWEEP_DEFAULT_AMOUNT_STEPS = 25
+_SWEEP_DEFAULT_DURATIONS = {'min': 6, 'max': 60, 'step': 6}
+
+
+def _sweep_axis(spec, name, integer):
+    """Expand a what-if axis: an explicit list, or {min, max, steps} (amounts) / {min, max, step} (months)."""
+    if isinstance(spec, list):
+        values = [int(v) if integer else float(v) for v in spec]
+    elif isinstance(spec, Mapping):
+        low, high = float(spec['min']), float(spec['max'])
+        if high < low:
+            raise ValueError(f'{name}: max must be >= min.')
+        if integer:
+            step = int(spec.get('step', 1))
+            if step < 1:
+                raise ValueError(f'{name}: step must be >= 1.')
+            values = list(range(int(low), int(high) + 1, step))
+        else:
+            steps = int(spec.get('steps', _SWEEP_DEFAULT_AMOUNT_STEPS))
+            if steps < 1:
+                raise ValueError(f'{name}: steps must be >= 1.')
+            values = [low + (high - low) * i / max(steps - 1, 1) for i in range(steps)]
+    else:
+        raise ValueError(f'{name} must be a list or an object with min and max.')
+    if not values:
+        raise ValueError(f'{name} is empty.')
+    if min(values) < (1 if integer else 0):
+        raise ValueError(f'{name} values must be positive.')
+    return values
+
+
+_sweep_request_body = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    required=['annual_income'],
+    description='Base profile (same fields as a farmer application, RWF) plus the ranges to sweep.',
+    properties={
+        'annual_income': openapi.Schema(type=openapi.TYPE_NUMBER, description='RWF'),
+        'age': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'credit_score': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'employment_status': openapi.Schema(type=openapi.TYPE_STRING),
+        'education_level': openapi.Schema(type=openapi.TYPE_STRING),
+        'marital_status': openapi.Schema(type=openapi.TYPE_STRING),
+        'loan_purpose': openapi.Schema(type=openapi.TYPE_STRING),
+        'loan_amount': openapi.Schema(type=openapi.TYPE_OBJECT, description='RWF: {min, max, steps} or a list. Default 10%–200% of annual income in 25 steps.'),
+        'loan_duration_months': openapi.Schema(type=openapi.TYPE_OBJECT, description='{min, max, step} or a list. Default 6–60 months every 6.'),
+    },
+)
+_sweep_response = openapi.Response('approval / risk grids, per-duration frontier, DTI caps and best option', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'frontier': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)), 'best': openapi.Schema(type=openapi.TYPE_OBJECT), 'approved': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_BOOLEAN))), 'risk_score': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_NUMBER)))}))
+
+
+@swagger_auto_schema(method='post', operation_description='What-if sweep: scores a grid of loan amounts x durations for one profile in a single batched model call. Returns the approval grid, risk surface, the 35% DTI affordability cap per duration and the largest approvable amount per duration.', request_body=_sweep_request_body, responses={200: _sweep_response, 400: 'Error', 503: 'Models not loaded'}, tags=['ML Models'])
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def what_if(request):
+    """POST /api/what-if/ — Largest approvable amount per duration for a farmer profile (amounts in RWF)."""
+    data = _get_payload(request)
+    try:
+        annual_income = float(data.get('annual_income', 0))
+        if annual_income <= 0:
+            raise ValueError('annual_income must be positive.')
+        profile = {
+            'annual_income_rwf': annual_income,
+            'age': int(data.get('age', 35)),
+            'credit_score': int(data.get('credit_score', 600)),
+            'employment_status': data.get('employment_status'),
+            'education_level': data.get('education_level'),
+            'marital_status': data.get('marital_status'),
+            'loan_purpose': data.get('loan_purpose'),
+        }
+        amounts = _sweep_axis(
+            data.get('loan_amount') or {'min': annual_income * 0.1, 'max': annual_income * 2},
+            'loan_amount', integer=False,
+        )
+        durations = _sweep_axis(data.get('loan_duration_months') or _SWEEP_DEFAULT_DURATIONS, 'loan_duration_months', integer=True)
+    except (KeyError, TypeError, ValueError) as e:
+        message = f'Missing {e} in range.' if isinstance(e, KeyError) else str(e)
+        return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+    if len(amounts) * len(durations) > _SWEEP_MAX_CANDIDATES:
+        return Response({'error': f'At most {_SWEEP_MAX_CANDIDATES} amount x duration combinations per request.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(sweep_loan_terms(profile, amounts, durations))
     except FileNotFoundError as e:
         return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-@swagger_auto_schema(method='post', operation_description='Multilingual chatbot (Kinyarwanda, English, French). POST message + language. Uses saved T5 model when available, with separate translation models for FR/RW.', request_body=_chat_request, responses={200: _chat_response}, tags=['Chatbot'])
+def _chat_busy(e):
+    """429 for a full chat queue (chat_pipeline.QueueFull e)."""
+    response = JsonResponse({'error': 'The chatbot is busy, please try again shortly.', 'retry_after': e.retry_after}, status=429)
+    response['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def _chat_answer(request, raw_message, language, started):
+    """chat_pipeline.answer() for one request; runs on a chat executor thread."""
+    close_old_connections()
+    try:
+        user = chat_pipeline.request_user(request)
+        return chat_pipeline.answer(raw_message, language, user=user, started=started, debug=getattr(settings, 'DEBUG', False))
+    finally:
+        close_old_connections()
+
+
+@swagger_auto_schema(method='post', operation_description='Multilingual chatbot (Kinyarwanda, English, French). POST message + language. Answers from the chat answer cache or the FAQ index when the question is known, otherwise from the saved T5 model, with separate translation models for FR/RW. `source` says which path answered (cache, faq, model, fallback). Served asynchronously: 429 with Retry-After when the chat queue is full, 504 past CHAT_TIMEOUT.', request_body=_chat_request, responses={200: _chat_response, 403: 'CSRF failed (session auth)', 429: 'Chat queue full', 504: 'Answer timed out'}, tags=['Chatbot'])
 @api_view(['POST'])
 @permission_classes([AllowAny])
-def chat(request):
-    """POST /api/chat/ — Chatbot using saved T5 model (saved-model/); falls back to placeholder if unavailable."""
-    from api.chatbot_service import generate_reply
-    from api.translation_service import to_english, from_english
+def chat_schema(request):
+    """Schema stand-in for the async chat view below, which drf_yasg cannot inspect; used by api.schema, not routed."""
+    return Response(status=status.HTTP_404_NOT_FOUND)
+
+
+# CSRF is checked by chat_pipeline.request_user() for session users only, as DRF views do
+@csrf_exempt
+async def chat(request):
+    """
+    POST /api/chat/ — Multilingual chatbot (Kinyarwanda, English, French).
+    Answers from the chat answer cache or the FAQ index when the question is
+    known, otherwise from the saved T5 model, with separate translation models
+    for FR/RW; `source` says which path answered (cache, faq, model, fallback).
+
+    Async: the answer is computed on the bounded chat executor (CHAT_CONCURRENCY
+    threads, CHAT_QUEUE_DEPTH waiting requests), so slow generations never hold
+    a server worker. When the queue is full the request gets 429 with a
+    Retry-After header; past CHAT_TIMEOUT seconds it gets 504.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    started = time.perf_counter()
     payload = _get_payload(request)
     raw_message = (payload.get('message') or '').strip()
     language = (payload.get('language') or 'en').lower()
     if not raw_message:
-        return Response({'reply': 'Please send a message.', 'response': 'Please send a message.'})
-    # If user is not in English, first translate question to English for the
-    # financial chatbot model, then translate the answer back.
-    question_for_model = to_english(raw_message, source_lang=language)
-    reply_en = generate_reply(question_for_model, language='en')
-    reply = reply_en
-    if reply is None:
-        # Fallback when model not loaded or generation failed
-        from api.chatbot_service import get_load_error
-        err_msg = get_load_error()
-        replies = {
-            'en': (
-                "Thank you for your message. The chatbot model is not available right now. "
-                "To apply for a loan, use the Loan Eligibility and Loan Amount Recommendation tools. "
-                "We support Kinyarwanda, English, and French."
-            ),
-            'fr': (
-                "Merci pour votre message. Le modèle du chatbot n'est pas disponible. "
-                "Pour demander un prêt, utilisez les outils d'éligibilité et de recommandation ci-dessus."
-            ),
-            'rw': (
-                "Murakoze kubutumwa. Modèle y'ikibazo ntabwo iri. "
-                "Kugira ngo usabe inguzanyo, koresha ibikoresho by'emera no gutoranya inguzanyo hejuru."
-            ),
-        }
-        reply = replies.get(language, replies['en'])
-        payload = {'reply': reply, 'response': reply}
-        if getattr(settings, 'DEBUG', False) and err_msg:
-            payload['chatbot_load_error'] = err_msg
-        return Response(payload)
-    # Translate final answer back to requested language (FR/RW) when needed.
-    final_reply = from_english(reply_en, target_lang=language)
-    resp = {'reply': final_reply, 'response': final_reply}
-    if getattr(settings, 'DEBUG', False) and language != 'en':
-        resp['source_reply_en'] = reply_en
-    return Response(resp)
+        return JsonResponse({'reply': 'Please send a message.', 'response': 'Please send a message.'})
+    try:
+        future = chat_pipeline.executor.submit(_chat_answer, request, raw_message, language, started)
+    except chat_pipeline.QueueFull as e:
+        return _chat_busy(e)
+    try:
+        # Cancelling the wrapper also drops the task if it is still waiting for a thread
+        body = await asyncio.wait_for(asyncio.wrap_future(future), chat_pipeline.CHAT_TIMEOUT)
+    except asyncio.TimeoutError:
+        return JsonResponse({'error': 'The chatbot took too long to answer, please try again.'}, status=504)
+    except APIException as e:
+        # Bad token or failed CSRF check, raised by request_user()
+        return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+    return JsonResponse(body)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@swagger_auto_schema(method='post', operation_description='Streaming chatbot (server-sent events). Same body as /api/chat/. Emits `token` events ({"text"}) as the reply is generated — tokens for English, whole translated sentences for FR/RW — then one `done` event ({"reply", "source"}). Cached and FAQ answers arrive as a single token event. Closing the connection stops generation. Shares the /api/chat/ queue: 429 with Retry-After when it is full.', request_body=_chat_request, responses={200: 'text/event-stream', 400: 'Empty message', 403: 'CSRF failed (session auth)', 429: 'Chat queue full', 504: 'No chat thread free in time'}, tags=['Chatbot'])
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def chat_stream_schema(request):
+    """Schema stand-in for the async chat_stream view below (see chat_schema)."""
+    return Response(status=status.HTTP_404_NOT_FOUND)
+
+
+def _chat_stream_answer(request, raw_message, language, started, emit, stop):
+    """
+    chat_pipeline.stream_answer() for one request; runs on a chat executor
+    thread. emit() gets ('rejected', APIException) or ('start', None) once the
+    user is known, then each (event, data) pair, then None. Setting stop
+    (client gone) closes the stream, which stops decoding.
+    """
+    if stop.is_set():
+        # Client left while the request was queued
+        emit(None)
+        return
+    close_old_connections()
+    try:
+        try:
+            user = chat_pipeline.request_user(request)
+        except APIException as e:
+            emit(('rejected', e))
+            return
+        emit(('start', None))
+        events = chat_pipeline.stream_answer(raw_message, language, user=user, started=started)
+        try:
+            for item in events:
+                if stop.is_set():
+                    break
+                emit(item)
+        except Exception as e:
+            emit(('error', {'error': str(e)}))
+        finally:
+            events.close()
+    finally:
+        emit(None)
+        close_old_connections()
+
+
+async def _sse_events(items, stop):
+    """SSE text for each (event, data) pair taken from items until None."""
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(items.get(), chat_pipeline.CHAT_TIMEOUT)
+            except asyncio.TimeoutError:
+                yield _sse('error', {'error': 'The chatbot took too long to answer, please try again.'})
+                return
+            if item is None:
+                return
+            yield _sse(*item)
+    finally:
+        # Also on asyncio.CancelledError (client disconnected): tell the chat thread to stop decoding
+        stop.set()
+
+
+# CSRF is checked by chat_pipeline.request_user() for session users only, as DRF views do
+@csrf_exempt
+async def chat_stream(request):
+    """
+    POST /api/chat/stream/ — /api/chat/ as a text/event-stream, so the first
+    words arrive before the reply is complete.
+
+    Generation runs on the chat executor like /api/chat/ (same 429 when it is
+    full) and hands events to this async generator through a queue, so the
+    event loop never waits on the model. The response starts once the request
+    has a chat thread and is authenticated; a disconnect stops decoding.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    started = time.perf_counter()
+    payload = _get_payload(request)
+    raw_message = (payload.get('message') or '').strip()
+    language = (payload.get('language') or 'en').lower()
+    if not raw_message:
+        return JsonResponse({'error': 'Please send a message.'}, status=400)
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    stop = threading.Event()
+
+    def emit(item):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            # Event loop closed: nobody is listening any more
+            stop.set()
+
+    try:
+        future = chat_pipeline.executor.submit(_chat_stream_answer, request, raw_message, language, started, emit, stop)
+    except chat_pipeline.QueueFull as e:
+        return _chat_busy(e)
+    try:
+        first = await asyncio.wait_for(items.get(), chat_pipeline.CHAT_TIMEOUT)
+    except asyncio.TimeoutError:
+        stop.set()
+        future.cancel()
+        return JsonResponse({'error': 'The chatbot took too long to answer, please try again.'}, status=504)
+    except asyncio.CancelledError:
+        # Client disconnected while waiting for a chat thread
+        stop.set()
+        future.cancel()
+        raise
+    if first is None:
+        return JsonResponse({'error': 'The chatbot stopped before answering.'}, status=500)
+    if first[0] == 'rejected':
+        # Bad token or failed CSRF check, raised by request_user()
+        return JsonResponse({'detail': str(first[1].detail)}, status=first[1].status_code)
+    response = StreamingHttpResponse(_sse_events(items, stop), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ----- Health -----
+
+@swagger_auto_schema(method='get', operation_description='Readiness probe: 200 once the ML models are loaded (and warmed when ML_WARMUP_ON_STARTUP=1), else 503. Reports per-model load state and timings.', tags=['Health'])
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def health_ready(request):
+    """GET /api/health/ready/ — ML model load state for load balancer readiness checks."""
+    state = ml_readiness()
+    code = status.HTTP_200_OK if state['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return Response(state, status=code)
+
+
+@swagger_auto_schema(method='get', operation_description='Runtime metrics for this worker: ML prediction cache hit/miss counters and size, micro-batch sizes and queue waits (null when ML_MICROBATCH is off), resident / shared / PSS memory of this worker process, model server queue stats (null when MODEL_SERVER_SOCKET is unset), chat generation batch sizes per length bucket (null when CHATBOT_BATCHING is off), chat answer LRU counters (null unless CHATBOT_TEMPERATURE is 0), FAQ index lookups / hit rate / lookup time (null when no index is built), async chat pipeline occupancy, completed / rejected (429) requests and mean answer time, translation cache hits per tier and misses (null when TRANSLATION_CACHE is off), loaded translation models with their MB, pool budget, loads / reloads / evictions (null until a pair is used).', tags=['Health'])
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def health_metrics(request):
+    """GET /api/health/metrics/ — Per-worker cache and micro-batching counters, process memory, model server."""
+    return Response({
+        'ml_prediction_cache': prediction_cache_stats(),
+        'ml_microbatch': microbatch_stats(),
+        'process_memory': process_memory(),
+        'model_server': model_server_stats(),
+        'chat_batching': chat_batch_stats(),
+        'chat_answer_cache': chat_cache.stats(),
+        'chat_faq': faq_index.stats(),
+        'chat_pipeline': chat_pipeline.stats(),
+        'translation_cache': translation_cache.stats(),
+        'model_pools': model_pool.stats(),
+    })
 
 
 # ----- Auth APIs (documented in Swagger) -----
@@ -352,6 +731,15 @@ def _is_admin(user):
     return role == 'admin'
 
 
+def _query_limit(request, default, maximum):
+    """?limit= as an int clamped to 1..maximum; ValueError when it is not a number."""
+    raw = request.query_params.get('limit', default)
+    try:
+        return max(1, min(int(raw), maximum))
+    except (TypeError, ValueError):
+        raise ValueError(f"limit must be an integer, got {raw!r}")
+
+
 _activity_log_body = openapi.Schema(
     type=openapi.TYPE_OBJECT,
     required=['event_type'],
@@ -421,93 +809,6 @@ def _is_microfinance(user):
     return _user_role(user) == 'microfinance'
 
 
-# 1 USD ≈ 1350 RWF — used to normalise RWF monetary values to the USD scale
-# the ML models were trained on, keeping absolute feature magnitudes sane.
-_RWF_TO_USD = 1350.0
-
-# Maximum debt-to-income ratio allowed for the recommended amount cap.
-# A monthly payment above 35% of monthly income is capped before returning.
-_MAX_DTI = 0.35
-
-# Bring low-income RWF profiles to at least this USD income level before
-# passing to the model, so features land within the training distribution.
-_TARGET_INCOME_USD = 45000.0
-
-def _build_ml_payload(annual_income_rwf, loan_amount_rwf, loan_duration_months,
-                      age, credit_score, employment_status, education_level,
-                      marital_status, loan_purpose):
-    """Build a normalised ML payload from RWF inputs.
-    Converts RWF→USD then scales income+loan UP so the profile sits within
-    the model’s training distribution. All RATIOS (DTI, loan-to-income) are
-    preserved from the original RWF values.
-    """
-    from .ml_service import DEFAULT_NUMERIC, CATEGORICAL_OPTIONS
-
-    income_usd_raw = float(annual_income_rwf) / _RWF_TO_USD
-    loan_usd_raw   = float(loan_amount_rwf)   / _RWF_TO_USD
-    duration       = int(loan_duration_months) or 24
-
-    # Scale both income and loan so income ≥ _TARGET_INCOME_USD (never scale down).
-    scale      = max(_TARGET_INCOME_USD / income_usd_raw, 1.0) if income_usd_raw > 0 else 1.0
-    income_usd = income_usd_raw * scale
-    loan_usd   = loan_usd_raw   * scale   # ratio preserved exactly
-
-    monthly_income  = income_usd / 12
-    monthly_payment = loan_usd   / duration
-    # DTI from original unscaled values so it stays accurate
-    dti = round(min((loan_usd_raw / duration) / (income_usd_raw / 12), 0.95), 4) \
-          if income_usd_raw > 0 else 0.35
-
-    # Derive reasonable financial context from income so the model isn’t
-    # fed contradictory defaults (e.g. $5,000 savings for a $90/month earner).
-    savings      = round(income_usd * 0.15, 2)   # 15% of annual income
-    checking     = round(income_usd * 0.08, 2)   # 8%
-    total_assets = round(income_usd * 1.50, 2)   # 150% (land, equipment)
-    liabilities  = round(income_usd * 0.20, 2)   # 20%
-    net_worth    = round(total_assets - liabilities, 2)
-
-    # Map 'Farming' → 'Other' — the model’s encoder never saw 'Farming'
-    purpose = loan_purpose or 'Other'
-    if purpose not in ('Debt Consolidation', 'Education', 'Home', 'Other'):
-        purpose = 'Other'
-
-    payload = dict(DEFAULT_NUMERIC)
-    payload.update({
-        'Age':                         int(age),
-        'AnnualIncome':                income_usd,
-        'CreditScore':                 int(credit_score),
-        'LoanAmount':                  loan_usd,
-        'LoanDuration':                duration,
-        'EmploymentStatus':            employment_status or 'Self-Employed',
-        'EducationLevel':              education_level  or 'High School',
-        'MaritalStatus':               marital_status   or 'Married',
-        'LoanPurpose':                 purpose,
-        'HomeOwnershipStatus':         'Own',
-        'DebtToIncomeRatio':           dti,
-        'TotalDebtToIncomeRatio':      dti,
-        'MonthlyIncome':               monthly_income,
-        'MonthlyLoanPayment':          monthly_payment,
-        'MonthlyDebtPayments':         round(monthly_payment, 2),
-        'SavingsAccountBalance':       savings,
-        'CheckingAccountBalance':      checking,
-        'TotalAssets':                 total_assets,
-        'TotalLiabilities':            liabilities,
-        'NetWorth':                    net_worth,
-        'PaymentHistory':              25,   # training mean=24, std=4.85
-        'UtilityBillsPaymentHistory':  0.90,
-        'PreviousLoanDefaults':        0,
-        'BankruptcyHistory':           0,
-        'LengthOfCreditHistory':       8,
-        'NumberOfCreditInquiries':     1,
-        'NumberOfOpenCreditLines':     2,
-        'CreditCardUtilizationRate':   0.20,
-    })
-    for k, opts in CATEGORICAL_OPTIONS.items():
-        if payload.get(k) not in opts:
-            payload[k] = opts[0]
-    return payload, income_usd_raw, duration, income_usd_raw / 12
-
-
 def _application_to_ml_payload(app):
     """Build ML model payload from LoanApplication."""
     payload, _, _, _ = _build_ml_payload(
@@ -524,6 +825,25 @@ def _application_to_ml_payload(app):
     return payload
 
 
+def _apply_ml_result(app, payload, result, language='en'):
+    """Set a LoanApplication's ML fields from an assess()/score_batch() result (does not save)."""
+    app.eligibility_approved = result['approved']
+    app.eligibility_reason = eligibility_reason(payload, app.eligibility_approved, language)
+    app.risk_score = result['risk_score']
+    app.model_version = result['model_version']
+    if app.eligibility_approved:
+        raw_rec_usd = result['recommended_amount']
+        # Cap recommended amount to 35% DTI affordable maximum
+        annual_income_usd = float(app.annual_income) / _RWF_TO_USD
+        monthly_income_usd = annual_income_usd / 12
+        duration = int(app.loan_duration_months) or 24
+        max_affordable_usd = monthly_income_usd * _MAX_DTI * duration
+        rec_usd = min(raw_rec_usd, max_affordable_usd)
+        app.recommended_amount = rec_usd * _RWF_TO_USD
+    else:
+        app.recommended_amount = None
+
+
 # ----- Farmer APIs -----
 
 @swagger_auto_schema(method='get', operation_description='Get farmer profile. Farmer only.', tags=['Farmer'])
@@ -798,21 +1118,9 @@ def farmer_applications(request):
         app_lang = str(app_lang).strip().lower()[:2]
         if app_lang not in ('en', 'fr', 'rw'):
             app_lang = 'en'
+        app.language = app_lang
         try:
-            app.eligibility_approved = predict_eligibility(payload)
-            app.eligibility_reason = eligibility_reason(payload, app.eligibility_approved, app_lang)
-            app.risk_score = predict_risk(payload)
-            if app.eligibility_approved:
-                raw_rec_usd = recommend_loan_amount(payload)
-                # Cap recommended amount to 35% DTI affordable maximum
-                annual_income_usd = float(app.annual_income) / _RWF_TO_USD
-                monthly_income_usd = annual_income_usd / 12
-                duration = int(app.loan_duration_months) or 24
-                max_affordable_usd = monthly_income_usd * _MAX_DTI * duration
-                rec_usd = min(raw_rec_usd, max_affordable_usd)
-                app.recommended_amount = rec_usd * _RWF_TO_USD
-            else:
-                app.recommended_amount = None
+            _apply_ml_result(app, payload, assess_ml(payload), app_lang)
         except FileNotFoundError:
             return Response({'error': 'ML models not available'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
@@ -831,6 +1139,7 @@ def farmer_applications(request):
             'eligibility_reason': app.eligibility_reason,
             'risk_score': app.risk_score,
             'recommended_amount': float(app.recommended_amount) if app.recommended_amount else None,
+            'model_version': app.model_version,
             'created_at': app.created_at.isoformat(),
         }, status=status.HTTP_201_CREATED)
     # GET
@@ -1531,6 +1840,37 @@ def mfi_portfolio(request):
 
 # ----- Admin APIs (extended) -----
 
+@swagger_auto_schema(method='get', operation_description='Most frequently answered cached chat questions. Admin only. Query: limit (default 50, max 200), language.', tags=['Admin'])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_chat_cache(request):
+    """GET /api/admin/chat-cache/ — Top cached chatbot questions by hit count."""
+    if not _is_admin(request.user):
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    qs = ChatAnswerCache.objects.all()
+    language = request.query_params.get('language', '')
+    if language:
+        qs = qs.filter(language=language)
+    try:
+        limit = _query_limit(request, 50, 200)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    data = [
+        {
+            'question': e.question,
+            'normalized_question': e.normalized_question,
+            'language': e.language,
+            'reply': e.reply,
+            'hit_count': e.hit_count,
+            'model_version': e.model_version,
+            'created_at': e.created_at.isoformat(),
+            'last_hit_at': e.last_hit_at.isoformat() if e.last_hit_at else None,
+        }
+        for e in qs.order_by('-hit_count', '-last_hit_at')[:limit]
+    ]
+    return Response({'entries': data, 'count': len(data)})
+
+
 @swagger_auto_schema(method='get', operation_description='List users. Admin only.', tags=['Admin'])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1556,7 +1896,7 @@ def admin_users_list(request):
     return Response({'users': data, 'count': len(data)})
 
 
-@swagger_auto_schema(method='get', operation_description='System stats for admin dashboard.', tags=['Admin'])
+@swagger_auto_schema(method='get', operation_description='System stats for admin dashboard, including chat message counts and mean latency per answer path.', tags=['Admin'])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_stats(request):
@@ -1569,9 +1909,15 @@ def admin_stats(request):
     apps_pending = LoanApplication.objects.filter(status='pending').count()
     apps_approved = LoanApplication.objects.filter(status='approved').count()
     apps_rejected = LoanApplication.objects.filter(status='rejected').count()
+    # Which path answered chat messages (cache / faq / model / fallback) and how fast
+    chat_paths = {
+        row['source'] or 'unknown': {'count': row['count'], 'mean_latency_ms': round(row['mean_latency_ms'], 1) if row['mean_latency_ms'] is not None else None}
+        for row in ChatInteraction.objects.values('source').annotate(count=Count('id'), mean_latency_ms=Avg('latency_ms'))
+    }
     return Response({
         'users': {'farmers': farmers, 'microfinance': mfi},
         'applications': {'pending': apps_pending, 'approved': apps_approved, 'rejected': apps_rejected},
+        'chat': chat_paths,
     })
 
 
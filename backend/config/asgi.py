@@ -1,5 +1,7 @@
 """
 ASGI config for AgriFinConnect Rwanda backend.
+Serves the async chat views on an event loop, without tying up a worker per
+waiting request: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn config.asgi
 """
 import os
 from django.core.asgi import get_asgi_application
@@ -111,9 +111,106 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # ML models path (saved .pkl from notebook)
 MODELS_DIR = PROJECT_ROOT / 'loan_default_risk_model'
+# ML inference engine: 'joblib' (scikit-learn/XGBoost estimators) or 'numpy' (arrays from
+# `manage.py export_tree_models`, scored with NumPy only — faster startup and single-row latency).
+ML_INFERENCE_ENGINE = os.environ.get('ML_INFERENCE_ENGINE', 'joblib')
+# With the numpy engine, batches of at least this many rows (score_batch, sweeps, batch predictions) are
+# scored by the XGBoost .pkl estimators, which are faster from ~64 rows on; 0 keeps every batch on NumPy.
+ML_NUMPY_BATCH_MIN_ROWS = int(os.environ.get('ML_NUMPY_BATCH_MIN_ROWS', '64'))
+# Versioned model registry (manage.py ml_registry). When a version is active it is served instead of
+# MODELS_DIR; workers re-check the ACTIVE pointer every ML_REGISTRY_POLL_SECONDS (0 = never).
+ML_REGISTRY_DIR = Path(os.environ.get('ML_REGISTRY_DIR', PROJECT_ROOT / 'model_registry'))
+ML_REGISTRY_POLL_SECONDS = int(os.environ.get('ML_REGISTRY_POLL_SECONDS', '5'))
+# joblib mmap mode for model arrays ('r' shares pages between forked workers; empty disables)
+ML_MMAP_MODE = os.environ.get('ML_MMAP_MODE', 'r')
+# Load and warm the ML models (and map the chat FAQ index) when the app starts (each gunicorn worker)
+# instead of on the first request.
+# Pair with GET /api/health/ready/ as the load balancer readiness check.
+ML_WARMUP_ON_STARTUP = os.environ.get('ML_WARMUP_ON_STARTUP', '0') == '1'
+# In-process LRU cache of predictions per worker (entries; 0 disables) and optional TTL in seconds (0 = none).
+ML_PREDICTION_CACHE_SIZE = int(os.environ.get('ML_PREDICTION_CACHE_SIZE', '4096'))
+ML_PREDICTION_CACHE_TTL = int(os.environ.get('ML_PREDICTION_CACHE_TTL', '0'))
+# 'float32' stores encoded/scaled ML matrices as float32 (half the memory). Only enabled when a
+# parity check at load stays within these limits (risk-score points, share of eligibility flips).
+ML_INFERENCE_DTYPE = os.environ.get('ML_INFERENCE_DTYPE', 'float64')
+ML_FLOAT32_MAX_RISK_DEVIATION = float(os.environ.get('ML_FLOAT32_MAX_RISK_DEVIATION', '0.1'))
+ML_FLOAT32_MAX_FLIP_RATE = float(os.environ.get('ML_FLOAT32_MAX_FLIP_RATE', '0.001'))
+# Micro-batching of concurrent single-row predictions (threaded workers): wait up to
+# WINDOW_MS for more requests, or until MAX_SIZE are queued, then score them as one matrix.
+ML_MICROBATCH = os.environ.get('ML_MICROBATCH', '0') == '1'
+ML_MICROBATCH_WINDOW_MS = float(os.environ.get('ML_MICROBATCH_WINDOW_MS', '3'))
+ML_MICROBATCH_MAX_SIZE = int(os.environ.get('ML_MICROBATCH_MAX_SIZE', '64'))
 
 # Chatbot model directory (overrides default 'saved-model' in chatbot_service)
-CHATBOT_MODEL_DIR = PROJECT_ROOT / 'AI_Chatbot_model'
+CHATBOT_MODEL_DIR = Path(os.environ.get('CHATBOT_MODEL_DIR', PROJECT_ROOT / 'AI_Chatbot_model'))
+# Chatbot framework: 'torch' (model.safetensors; same runtime as the MarianMT translation models) or
+# 'tensorflow' (tf_model.h5). With 'torch', transformers is told not to import TensorFlow at all.
+CHATBOT_BACKEND = os.environ.get('CHATBOT_BACKEND', 'torch')
+if CHATBOT_BACKEND == 'torch':
+    os.environ.setdefault('USE_TF', '0')
+# Sampling temperature for chat replies; 0 = greedy (deterministic), which enables the chat answer cache:
+# a per-worker LRU of CHAT_ANSWER_CACHE_SIZE entries in front of the ChatAnswerCache table.
+CHATBOT_TEMPERATURE = float(os.environ.get('CHATBOT_TEMPERATURE', '0.7'))
+CHAT_ANSWER_CACHE = os.environ.get('CHAT_ANSWER_CACHE', '1') == '1'
+CHAT_ANSWER_CACHE_SIZE = int(os.environ.get('CHAT_ANSWER_CACHE_SIZE', '1024'))
+# Retrieval fast path (manage.py build_faq_index): known questions whose character n-gram TF-IDF cosine
+# similarity to an indexed question reaches CHAT_FAQ_THRESHOLD get the stored answer instead of T5.
+CHAT_FAQ_FILE = Path(os.environ.get('CHAT_FAQ_FILE', BASE_DIR / 'api' / 'data' / 'chat_faq.json'))
+CHAT_FAQ_INDEX_DIR = Path(os.environ.get('CHAT_FAQ_INDEX_DIR', PROJECT_ROOT / 'chat_faq_index'))
+CHAT_FAQ_THRESHOLD = float(os.environ.get('CHAT_FAQ_THRESHOLD', '0.8'))
+# Dynamic batching of concurrent chat generations (threaded workers or the model server): wait up to
+# WINDOW_MS for more messages of a similar token length (BUCKETS), or until MAX_SIZE are queued.
+CHATBOT_BATCHING = os.environ.get('CHATBOT_BATCHING', '0') == '1'
+CHATBOT_BATCH_WINDOW_MS = float(os.environ.get('CHATBOT_BATCH_WINDOW_MS', '20'))
+CHATBOT_BATCH_MAX_SIZE = int(os.environ.get('CHATBOT_BATCH_MAX_SIZE', '8'))
+CHATBOT_BATCH_BUCKETS = tuple(
+    int(b) for b in os.environ.get('CHATBOT_BATCH_BUCKETS', '32,64,128,256').split(',') if b.strip()
+)
+# Async /api/chat/ (serve with config.asgi): answers run on CHAT_CONCURRENCY threads per worker process,
+# at most CHAT_QUEUE_DEPTH more wait; beyond that the endpoint answers 429 with Retry-After.
+CHAT_CONCURRENCY = int(os.environ.get('CHAT_CONCURRENCY', '2'))
+CHAT_QUEUE_DEPTH = int(os.environ.get('CHAT_QUEUE_DEPTH', '8'))
+CHAT_TIMEOUT = float(os.environ.get('CHAT_TIMEOUT', '60'))
+
+# Preloading under gunicorn (GUNICORN_PRELOAD=1, see gunicorn.conf.py): what the master loads before fork.
+CHATBOT_PRELOAD = os.environ.get('CHATBOT_PRELOAD', '1') == '1'
+TRANSLATION_PRELOAD_LANGUAGES = tuple(
+    lang.strip() for lang in os.environ.get('TRANSLATION_PRELOAD_LANGUAGES', 'fr,rw').split(',') if lang.strip()
+)
+# Translation cache (translation_cache.py): per-worker LRU of TRANSLATION_CACHE_SIZE entries in front of
+# the TranslationCache table, keyed by direction, normalized text and translation model.
+TRANSLATION_CACHE = os.environ.get('TRANSLATION_CACHE', '1') == '1'
+TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', '4096'))
+# Local MarianMT models (manage.py fetch_translation_models): one directory per pair, by default
+# TRANSLATION_MODEL_DIR/opus-mt-<src>-<tgt>, overridable per pair (TRANSLATION_MODEL_FR_EN=/path, ...).
+# With TRANSLATION_LOCAL_FILES_ONLY (default when DEBUG is off) the Hugging Face hub is never contacted.
+TRANSLATION_MODEL_DIR = Path(os.environ.get('TRANSLATION_MODEL_DIR', PROJECT_ROOT / 'translation_models'))
+TRANSLATION_MODEL_PATHS = {
+    f'{src}-{tgt}': Path(os.environ.get(f'TRANSLATION_MODEL_{src.upper()}_{tgt.upper()}', TRANSLATION_MODEL_DIR / f'opus-mt-{src}-{tgt}'))
+    for src, tgt in (('fr', 'en'), ('en', 'fr'), ('rw', 'en'), ('en', 'rw'))
+}
+TRANSLATION_LOCAL_FILES_ONLY = os.environ.get('TRANSLATION_LOCAL_FILES_ONLY', '0' if DEBUG else '1') == '1'
+# Memory budget (MB of weights) for the loaded MarianMT pairs of a process; past it the least recently
+# used pair is unloaded and reloaded on demand. 0 = no cap (every pair used stays loaded).
+TRANSLATION_POOL_MAX_MB = float(os.environ.get('TRANSLATION_POOL_MAX_MB', '0'))
+# Translate multi-sentence texts (long chatbot replies) as one padded batch of distinct sentences,
+# each sentence served from the translation cache when present.
+TRANSLATION_SENTENCE_BATCH = os.environ.get('TRANSLATION_SENTENCE_BATCH', '0') == '1'
+# Int8 dynamic quantization (CPU) of the torch chatbot and the MarianMT models. Converted models are
+# cached in QUANTIZED_MODEL_DIR after the first load; check drift with `manage.py bench_quantized`.
+CHATBOT_QUANTIZE_INT8 = os.environ.get('CHATBOT_QUANTIZE_INT8', '0') == '1'
+TRANSLATION_QUANTIZE_INT8 = os.environ.get('TRANSLATION_QUANTIZE_INT8', '0') == '1'
+QUANTIZED_MODEL_DIR = Path(os.environ.get('QUANTIZED_MODEL_DIR', PROJECT_ROOT / 'quantized_models'))
+# Torch intra-op threads per worker (0 = torch default). Keep workers x threads <= CPU cores.
+TORCH_NUM_THREADS = int(os.environ.get('TORCH_NUM_THREADS', '0'))
+
+# Out-of-process model server (manage.py run_model_server): with a socket path set, chat generation and
+# translation are sent to that process over a Unix socket and web workers never load T5 / MarianMT.
+MODEL_SERVER_SOCKET = os.environ.get('MODEL_SERVER_SOCKET', '')
+MODEL_SERVER_TIMEOUT = float(os.environ.get('MODEL_SERVER_TIMEOUT', '30'))
+# Requests the server runs at once, and how many more may wait before it answers "busy"
+MODEL_SERVER_CONCURRENCY = int(os.environ.get('MODEL_SERVER_CONCURRENCY', '1'))
+MODEL_SERVER_MAX_QUEUE = int(os.environ.get('MODEL_SERVER_MAX_QUEUE', '16'))
 
 # Email (for password reset). Console backend prints to terminal in dev.
 EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
@@ -8,6 +8,7 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from api.schema import SchemaGenerator
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -21,6 +22,7 @@ schema_view = get_schema_view(
     public=True,
     permission_classes=[permissions.AllowAny],
     urlconf='config.urls',
+    generator_class=SchemaGenerator,
 )
 
 urlpatterns = [
@@ -0,0 +1,51 @@
+"""
+Gunicorn settings (picked up automatically when started from backend/):
+
+    gunicorn config.wsgi
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn config.asgi
+
+The ASGI form serves the async /api/chat/ and /api/chat/stream/ views on an
+event loop, so waiting chat requests do not hold a worker and a chat burst
+only fills the chat executor (see api/chat_pipeline.py). Under WSGI (the
+default) they still work, but every waiting or streaming chat request
+occupies a worker. Under ASGI the sync DRF views of a worker run one at a time on its single
+thread_sensitive thread; add workers (WEB_CONCURRENCY) for loan-endpoint
+throughput, and check with `manage.py loadtest_chat`.
+GUNICORN_PRELOAD=1 loads the ML artifacts, chatbot tokenizer and translation
+models once in the master before forking (see api/preload.py). Workers then
+share those pages copy-on-write instead of each loading its own copy, so more
+workers fit in the same RAM. Command-line flags override everything here.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# App used when none is given on the command line
+wsgi_app = os.environ.get('GUNICORN_APP', 'config.wsgi:application')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+if preload_app:
+    # Hugging Face tokenizers must not start their thread pool before the fork
+    os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+    # Keep the collector off while the app and models load; frozen in when_ready,
+    # re-enabled in each worker.
+    gc.disable()
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked
+    if preload_app:
+        from api.preload import preload_models
+        preload_models()
+
+
+def post_worker_init(worker):
+    if preload_app:
+        from api.preload import after_fork
+        after_fork()
+    from api.procmem import process_memory
+    worker.log.info("Worker %s ready, memory %s", worker.pid, process_memory())
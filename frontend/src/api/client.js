@@ -61,6 +61,12 @@ export async function recommendLoanAmount(payload, language = 'en') {
   return request('/recommend-amount/', { method: 'POST', body });
 }
 
+/** POST /api/assess — eligibility, risk and recommended amount in one round trip. Optional language: en | fr | rw */
+export async function assessLoan(payload, language = 'en') {
+  const body = { ...payload, language: language || 'en' };
+  return request('/assess/', { method: 'POST', body });
+}
+
 /** POST /api/chat — chatbot (multilingual) */
 export async function chat(message, language = 'en') {
   return request('/chat/', { method: 'POST', body: { message, language } });
@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { useLanguage } from '../context/LanguageContext';
-import { predictEligibility } from '../api/client';
+import { assessLoan } from '../api/client';
 import './Card.css';
 
 const INITIAL = {
@@ -34,8 +34,8 @@ export default function LoanEligibilityCard() {
     setResult(null);
     setError(null);
     try {
-      const data = await predictEligibility(form, language);
-      setResult(data);
+      const data = await assessLoan(form, language);
+      setResult(data.eligibility);
     } catch (err) {
       setError(err.status ? `API error ${err.status}` : t('apiError'));
     } finally {
@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { useLanguage } from '../context/LanguageContext';
-import { recommendLoanAmount } from '../api/client';
+import { assessLoan } from '../api/client';
 import './Card.css';
 
 const INITIAL = {
@@ -33,8 +33,8 @@ export default function LoanRecommendationCard() {
     setResult(null);
     setError(null);
     try {
-      const data = await recommendLoanAmount(form, language);
-      setResult(data);
+      const data = await assessLoan(form, language);
+      setResult(data.recommendation);
     } catch (err) {
       setError(err.status ? `API error ${err.status}` : t('apiError'));
     } finally {
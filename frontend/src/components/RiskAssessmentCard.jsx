@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { useLanguage } from '../context/LanguageContext';
-import { predictRisk } from '../api/client';
+import { assessLoan } from '../api/client';
 import './Card.css';
 
 const INITIAL = {
@@ -34,8 +34,8 @@ export default function RiskAssessmentCard() {
     setResult(null);
     setError(null);
     try {
-      const data = await predictRisk(form, language);
-      setResult(data);
+      const data = await assessLoan(form, language);
+      setResult(data.risk);
     } catch (err) {
       setError(err.status ? `API error ${err.status}` : t('apiError'));
     } finally {
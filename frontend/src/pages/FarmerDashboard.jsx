@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useSearchParams } from 'react-router-dom';
 import { useLanguage } from '../context/LanguageContext';
 import {
@@ -11,9 +11,7 @@ import {
   downloadFarmerApplicationPackage,
   getFarmerLoans,
   getFarmerRepayments,
-  predictEligibility,
-  predictRisk,
-  recommendLoanAmount,
+  assessLoan,
   forgotPassword,
 } from '../api/client';
 import FloatingChatbot from '../components/FloatingChatbot';
@@ -563,45 +561,36 @@ export default function FarmerDashboard() {
     }
   };
 
-  const handleCheckEligibility = async () => {
-    setModelLoading('eligibility');
-    setModelResults((r) => ({ ...r, eligibility: null }));
-    try {
-      const data = await predictEligibility(formToMlPayload(form), language);
-      setModelResults((r) => ({ ...r, eligibility: data }));
-    } catch (err) {
-      setModelResults((r) => ({ ...r, eligibility: { error: err.body?.error || err.message || 'Model unavailable' } }));
-    } finally {
-      setModelLoading(null);
-    }
-  };
+  // One /api/assess/ call answers all three model buttons for the same form and language
+  const lastAssessment = useRef({ key: null, data: null });
 
-  const handleCheckRisk = async () => {
-    setModelLoading('risk');
-    setModelResults((r) => ({ ...r, risk: null }));
-    try {
-      const data = await predictRisk(formToMlPayload(form), language);
-      setModelResults((r) => ({ ...r, risk: data }));
-    } catch (err) {
-      setModelResults((r) => ({ ...r, risk: { error: err.body?.error || err.message || 'Model unavailable' } }));
-    } finally {
-      setModelLoading(null);
+  const assessForm = async () => {
+    const payload = formToMlPayload(form);
+    const key = JSON.stringify([payload, language]);
+    if (lastAssessment.current.key !== key) {
+      const data = await assessLoan(payload, language);
+      lastAssessment.current = { key, data };
     }
+    return lastAssessment.current.data;
   };
 
-  const handleGetRecommendation = async () => {
-    setModelLoading('recommend');
-    setModelResults((r) => ({ ...r, recommend: null }));
+  const runModel = async (name, block) => {
+    setModelLoading(name);
+    setModelResults((r) => ({ ...r, [name]: null }));
     try {
-      const data = await recommendLoanAmount(formToMlPayload(form), language);
-      setModelResults((r) => ({ ...r, recommend: data }));
+      const data = await assessForm();
+      setModelResults((r) => ({ ...r, [name]: data[block] }));
     } catch (err) {
-      setModelResults((r) => ({ ...r, recommend: { error: err.body?.error || err.message || 'Model unavailable' } }));
+      setModelResults((r) => ({ ...r, [name]: { error: err.body?.error || err.message || 'Model unavailable' } }));
     } finally {
       setModelLoading(null);
     }
   };
 
+  const handleCheckEligibility = () => runModel('eligibility', 'eligibility');
+  const handleCheckRisk = () => runModel('risk', 'risk');
+  const handleGetRecommendation = () => runModel('recommend', 'recommendation');
+
   const handleProfileFieldChange = (e) => {
     const { name, value } = e.target;
     setProfileForm((prev) => ({ ...prev, [name]: value }));